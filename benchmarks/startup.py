@@ -0,0 +1,69 @@
+"""
+Measures the startup time of the command line and fails when it regresses.
+
+    python benchmarks/startup.py [--runs 20] [--budget-ms 50]
+
+The time of `python main.py --help` is compared with a bare interpreter start, so the result does
+not depend on the speed of the machine. The command also fails when `--help` imports one of the
+heavy modules which must only be loaded by the commands that need them.
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('requests', 'packaging', 'dotenv', 'sqlite3', 'modrinth_updater.config', 'modrinth_updater.services')
+
+
+def _median_ms(command, runs):
+    """
+    Returns the median wall time of a command in milliseconds.
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def _imported_modules(command):
+    """
+    Returns the names of the modules imported by a Python command, using `-X importtime`.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', *command], cwd=ROOT,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True
+    )
+    return {line.rsplit('|', 1)[-1].strip() for line in result.stderr.splitlines() if line.startswith('import time:')}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the startup time of the command line.')
+    parser.add_argument('--runs', type=int, default=20, help='number of measured starts')
+    parser.add_argument('--budget-ms', type=float, default=50, help='allowed time on top of a bare interpreter start')
+    args = parser.parse_args(argv)
+
+    baseline = _median_ms([sys.executable, '-c', 'pass'], args.runs)
+    cli = _median_ms([sys.executable, 'main.py', '--help'], args.runs)
+    print(f'interpreter: {baseline:.1f} ms')
+    print(f'main.py --help: {cli:.1f} ms (+{cli - baseline:.1f} ms)')
+
+    failed = False
+    heavy = sorted(m for m in _imported_modules(['main.py', '--help']) if m.startswith(HEAVY_MODULES))
+    if heavy:
+        print(f'❌ --help imports heavy modules: {", ".join(heavy)}')
+        failed = True
+    if cli - baseline > args.budget_ms:
+        print(f'❌ The startup takes more than {args.budget_ms:.0f} ms on top of the interpreter.')
+        failed = True
+    if not failed:
+        print('✅ The startup is within the budget.')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,4 @@
+import sys
+from modrinth_updater.cli import main
+
+sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+An asyncio client for the Modrinth API built on requests.
+
+The client is not asyncio-native: every request is a blocking `requests` call run in a worker
+thread of the default executor with `asyncio.to_thread`, so the event loop is never blocked but
+each request in flight holds a thread. `requests.Session` is not guaranteed to be thread-safe, so
+every worker thread uses a session of its own.
+"""
+import os
+import json
+import asyncio
+import threading
+import requests
+from http import HTTPStatus
+from requests.adapters import HTTPAdapter
+from modrinth_updater.config import MODRINTH_API_BASE
+from modrinth_updater.models import Project, Version
+
+USER_AGENT = 'Allen0246/modrinth_updater'
+
+
+class ModrinthAPIError(Exception):
+    """
+    Raised when the Modrinth API answers with an unexpected status code.
+    """
+
+    def __init__(self, status_code, text):
+        super().__init__(f'Modrinth API error {status_code}: {text}')
+        self.status_code = status_code
+        self.text = text
+
+
+class AsyncModrinthClient:
+    """
+    An asyncio client for the Modrinth API which never blocks the event loop.
+
+    The requests are sent from worker threads, each with its own session and connection pool, and
+    at most `max_concurrency` requests run at the same time. Results are returned as `Version` and
+    `Project` records, errors are raised as `ModrinthAPIError` and nothing is printed.
+
+    Usage:
+        async with AsyncModrinthClient() as client:
+            version = await client.get_version_by_hash(sha1_hash)
+    """
+
+    def __init__(self, api_base=MODRINTH_API_BASE, max_concurrency=8, timeout=15):
+        self.api_base = api_base
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    def _session(self):
+        """
+        Returns the session of the current worker thread, creating it on the first request of the thread.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers['User-Agent'] = USER_AGENT
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=1)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def _send(self, method, url, **kwargs):
+        return self._session().request(method, url, timeout=self.timeout, **kwargs)
+
+    async def close(self):
+        """
+        Closes the sessions of every worker thread.
+        """
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+
+    async def _request(self, method, path, allow_not_found=False, **kwargs):
+        """
+        Sends one API request from a worker thread.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The path after the API base, for example '/version_file/<hash>'.
+            allow_not_found (bool, optional): If True, a 404 answer returns None instead of raising. Defaults to False.
+
+        Returns:
+            object: The decoded JSON answer, or None for an allowed 404 answer.
+
+        Raises:
+            ModrinthAPIError: If the answer has an unexpected status code.
+        """
+        async with self._semaphore:
+            response = await asyncio.to_thread(self._send, method, f'{self.api_base}{path}', **kwargs)
+        if response.status_code == HTTPStatus.NOT_FOUND and allow_not_found:
+            return None
+        if response.status_code != HTTPStatus.OK:
+            raise ModrinthAPIError(response.status_code, response.text)
+        return response.json()
+
+    @staticmethod
+    def _update_body(game_versions, loaders):
+        body = {}
+        if game_versions:
+            body['game_versions'] = list(game_versions)
+        if loaders:
+            body['loaders'] = list(loaders)
+        return body
+
+    async def get_version_by_hash(self, sha1_hash):
+        """
+        Returns the version a file belongs to.
+
+        Args:
+            sha1_hash (str): The SHA1 hash of the file.
+
+        Returns:
+            Version or None: The version, or None if Modrinth does not know the file.
+        """
+        data = await self._request('GET', f'/version_file/{sha1_hash}', allow_not_found=True)
+        return Version.from_json(data) if data is not None else None
+
+    async def get_versions_by_hashes(self, hashes):
+        """
+        Returns the versions many files belong to with one request.
+
+        Args:
+            hashes (list): The SHA1 hashes of the files.
+
+        Returns:
+            dict: The version by SHA1 hash, unknown files are left out.
+        """
+        data = await self._request('POST', '/version_files', json={'hashes': list(hashes), 'algorithm': 'sha1'})
+        return {sha1_hash: Version.from_json(version) for sha1_hash, version in data.items()}
+
+    async def check_update(self, sha1_hash, game_versions=None, loaders=None):
+        """
+        Returns the newest compatible version of the project a file belongs to.
+
+        Args:
+            sha1_hash (str): The SHA1 hash of the file.
+            game_versions (list, optional): The game versions the update has to support. Defaults to None.
+            loaders (list, optional): The loaders the update has to support. Defaults to None.
+
+        Returns:
+            Version or None: The newest compatible version, or None if there is none.
+        """
+        data = await self._request(
+            'POST', f'/version_file/{sha1_hash}/update', allow_not_found=True,
+            json=self._update_body(game_versions, loaders)
+        )
+        return Version.from_json(data) if data is not None else None
+
+    async def check_updates(self, hashes, game_versions=None, loaders=None):
+        """
+        Returns the newest compatible version for many files with one request.
+
+        Args:
+            hashes (list): The SHA1 hashes of the files.
+            game_versions (list, optional): The game versions the updates have to support. Defaults to None.
+            loaders (list, optional): The loaders the updates have to support. Defaults to None.
+
+        Returns:
+            dict: The newest compatible version by SHA1 hash, files without one are left out.
+        """
+        body = self._update_body(game_versions, loaders)
+        body.update({'hashes': list(hashes), 'algorithm': 'sha1'})
+        data = await self._request('POST', '/version_files/update', json=body)
+        return {sha1_hash: Version.from_json(version) for sha1_hash, version in data.items()}
+
+    async def get_project(self, project_id):
+        """
+        Returns a project by id or slug.
+
+        Args:
+            project_id (str): The project id or slug.
+
+        Returns:
+            Project or None: The project, or None if it does not exist.
+        """
+        data = await self._request('GET', f'/project/{project_id}', allow_not_found=True)
+        return Project.from_json(data) if data is not None else None
+
+    async def get_projects(self, project_ids):
+        """
+        Returns many projects with one request.
+
+        Args:
+            project_ids (list): The project ids or slugs.
+
+        Returns:
+            list: The projects which exist.
+        """
+        data = await self._request('GET', '/projects', params={'ids': json.dumps(list(project_ids))})
+        return [Project.from_json(project) for project in data]
+
+    async def download(self, url, destination, chunk_size=1024 * 1024):
+        """
+        Streams a download to a file without holding it in memory.
+
+        The file is written next to the destination first and renamed when it is complete.
+
+        Args:
+            url (str): The download URL.
+            destination (str): The path of the downloaded file.
+            chunk_size (int, optional): The size of the streamed chunks. Defaults to 1 MiB.
+
+        Returns:
+            int: The number of downloaded bytes.
+
+        Raises:
+            ModrinthAPIError: If the download answers with an unexpected status code.
+        """
+        def stream():
+            temp_path = f'{destination}.part'
+            with self._session().get(url, stream=True, timeout=self.timeout) as response:
+                if response.status_code != HTTPStatus.OK:
+                    raise ModrinthAPIError(response.status_code, response.reason)
+                size = 0
+                with open(temp_path, 'wb') as file:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        file.write(chunk)
+                        size += len(chunk)
+            os.replace(temp_path, destination)
+            return size
+
+        async with self._semaphore:
+            return await asyncio.to_thread(stream)
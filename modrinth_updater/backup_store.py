@@ -0,0 +1,218 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+from modrinth_updater.config import (
+    default_minecraft_path,
+    env_backup_keep_generations,
+    env_backup_max_age_days,
+    env_backup_max_size_mb
+)
+
+BACKUP_FOLDER = os.path.join(default_minecraft_path, 'modrinth_updater', 'backups')
+OBJECTS_FOLDER = os.path.join(BACKUP_FOLDER, 'objects')
+GENERATIONS_FOLDER = os.path.join(BACKUP_FOLDER, 'generations')
+
+
+def object_path(sha1_hash):
+    """
+    Returns the path of a file in the backup store, which is addressed by its SHA1 hash.
+
+    Args:
+        sha1_hash (str): The SHA1 hash of the file.
+
+    Returns:
+        str: The path of the stored object.
+    """
+    return os.path.join(OBJECTS_FOLDER, sha1_hash[:2], sha1_hash)
+
+
+def store_file(file_path, sha1_hash):
+    """
+    Moves a file into the backup store with a rename. A file which is already stored is only removed.
+
+    Args:
+        file_path (str): The path to the file to back up.
+        sha1_hash (str): The SHA1 hash of the file.
+
+    Returns:
+        str: The path of the stored object.
+    """
+    stored_path = object_path(sha1_hash)
+    if os.path.exists(stored_path):
+        os.remove(file_path)
+    else:
+        os.makedirs(os.path.dirname(stored_path), exist_ok=True)
+        os.replace(file_path, stored_path)
+    return stored_path
+
+
+def restore_file(sha1_hash, file_path):
+    """
+    Places a stored file back at its path with a hardlink, so the object stays in the store.
+
+    Args:
+        sha1_hash (str): The SHA1 hash of the stored file.
+        file_path (str): The path the file is restored to.
+    """
+    stored_path = object_path(sha1_hash)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    try:
+        os.link(stored_path, file_path)
+    except OSError:
+        shutil.copy2(stored_path, file_path)
+
+
+def write_generation(generation_id, files):
+    """
+    Writes the manifest of a backup generation.
+
+    Args:
+        generation_id (str): The id of the generation, the run id of the update run.
+        files (list): One dict per backed up file with 'category', 'original_path', 'replaced_by', 'sha1' and 'size'.
+    """
+    os.makedirs(GENERATIONS_FOLDER, exist_ok=True)
+    manifest_path = os.path.join(GENERATIONS_FOLDER, f'{generation_id}.json')
+    temp_path = f'{manifest_path}.tmp'
+    with open(temp_path, 'w') as file:
+        json.dump({'id': generation_id, 'created': time.time(), 'files': files}, file, indent=2)
+    os.replace(temp_path, manifest_path)
+
+
+def list_generations():
+    """
+    Returns the manifest of every backup generation, from the newest to the oldest.
+
+    Returns:
+        list: The generation manifests.
+    """
+    if not os.path.exists(GENERATIONS_FOLDER):
+        return []
+    generations = []
+    for name in os.listdir(GENERATIONS_FOLDER):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(GENERATIONS_FOLDER, name), 'r') as file:
+                generations.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return sorted(generations, key=lambda generation: generation['created'], reverse=True)
+
+
+def restore_generation(generation_id):
+    """
+    Restores every file of a backup generation and removes the files which replaced them.
+
+    Args:
+        generation_id (str): The id of the generation to restore.
+
+    Returns:
+        int or None: The number of restored files, or None if the generation does not exist.
+    """
+    generation = next((g for g in list_generations() if g['id'] == generation_id), None)
+    if generation is None:
+        return None
+    for file in generation['files']:
+        replaced_by = file.get('replaced_by')
+        if replaced_by and replaced_by != file['original_path'] and os.path.exists(replaced_by):
+            os.remove(replaced_by)
+        restore_file(file['sha1'], file['original_path'])
+    return len(generation['files'])
+
+
+def _parse_limit(value):
+    """
+    Parses a retention limit from the configuration.
+
+    Args:
+        value (str): The configured value.
+
+    Returns:
+        float or None: The limit, or None if there is no limit.
+    """
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def prune_generations(keep=None, max_age_days=None, max_size_mb=None):
+    """
+    Removes the backup generations outside the retention policy and the objects no generation uses.
+
+    The newest generations are kept while they are within the count, the age and the total size
+    limits. The newest generation is always kept, so the last update can be rolled back even
+    when its files alone are over the size limit. Objects shared by several generations are counted once.
+
+    Args:
+        keep (float, optional): The number of generations to keep. Defaults to `BACKUP_KEEP_GENERATIONS`.
+        max_age_days (float, optional): The maximum age of a generation. Defaults to `BACKUP_MAX_AGE_DAYS`.
+        max_size_mb (float, optional): The maximum size of the store. Defaults to `BACKUP_MAX_SIZE_MB`.
+
+    Returns:
+        list: The ids of the removed generations.
+    """
+    keep = _parse_limit(env_backup_keep_generations) if keep is None else keep
+    max_age_days = _parse_limit(env_backup_max_age_days) if max_age_days is None else max_age_days
+    max_size_mb = _parse_limit(env_backup_max_size_mb) if max_size_mb is None else max_size_mb
+    now = time.time()
+    kept_objects = set()
+    kept_size = 0
+    removed = []
+    for index, generation in enumerate(list_generations()):
+        new_objects = {f['sha1']: f.get('size', 0) for f in generation['files'] if f['sha1'] not in kept_objects}
+        expired = index > 0 and (
+            (keep is not None and index >= keep)
+            or (max_age_days is not None and now - generation['created'] > max_age_days * 86400)
+            or (max_size_mb is not None and kept_size + sum(new_objects.values()) > max_size_mb * 1024 * 1024)
+        )
+        if expired:
+            os.remove(os.path.join(GENERATIONS_FOLDER, f"{generation['id']}.json"))
+            removed.append(generation['id'])
+        else:
+            kept_objects.update(new_objects)
+            kept_size += sum(new_objects.values())
+    if os.path.exists(OBJECTS_FOLDER):
+        with os.scandir(OBJECTS_FOLDER) as prefixes:
+            for prefix in prefixes:
+                with os.scandir(prefix.path) as objects:
+                    for stored in objects:
+                        if stored.name not in kept_objects:
+                            os.remove(stored.path)
+    return removed
+
+
+def main(argv=None):
+    """
+    Command line entry point of the backup store: `python -m modrinth_updater.backup_store`.
+    """
+    parser = argparse.ArgumentParser(prog='python -m modrinth_updater.backup_store', description='Manage the backups of replaced files.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='list the backup generations')
+    restore_parser = subparsers.add_parser('restore', help='restore every file of a backup generation')
+    restore_parser.add_argument('generation_id')
+    subparsers.add_parser('prune', help='remove the backups outside the retention policy')
+    args = parser.parse_args(argv)
+    if args.command == 'list':
+        for generation in list_generations():
+            created = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(generation['created']))
+            print(f"{generation['id']}  {created}  {len(generation['files'])} files")
+    elif args.command == 'restore':
+        restored = restore_generation(args.generation_id)
+        if restored is None:
+            print(f'⚠️  There is no backup generation {args.generation_id}.')
+            return 1
+        print(f'✅ {restored} files have been restored from the backup generation {args.generation_id}.')
+    elif args.command == 'prune':
+        removed = prune_generations()
+        print(f'✅ {len(removed)} backup generations have been removed.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
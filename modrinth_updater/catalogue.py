@@ -0,0 +1,410 @@
+import os
+import re
+import json
+import time
+import requests
+from http import HTTPStatus
+from packaging.version import Version, InvalidVersion
+from modrinth_updater.config import default_minecraft_path, MODRINTH_API_BASE, env_catalogue_max_age_hours, env_offline_mode
+from modrinth_updater import mirror, metrics
+
+CATALOGUE_FOLDER = os.path.join(default_minecraft_path, 'modrinth_updater', 'cache')
+GAME_VERSIONS_FILE = os.path.join(CATALOGUE_FOLDER, 'game_versions.json')
+PROJECTS_FILE = os.path.join(CATALOGUE_FOLDER, 'projects.json')
+
+RELEASE_PATTERN = re.compile(r'^\d+(\.\d+)+$')
+
+# the most project ids sent in one bulk request, so the URL stays short enough for every server
+PROJECTS_CHUNK_SIZE = 100
+
+_game_versions = None
+_version_order = None
+_version_types = None
+_projects = None
+# the project id by slug of the cached projects, so slugs are answered from the cache too
+_project_slugs = None
+# project ids Modrinth did not know during this run, so they are not asked for again
+_unknown_projects = set()
+
+
+def _max_age():
+    """
+    Returns the maximum age of the catalogue in seconds.
+
+    Returns:
+        float: The configured maximum age, or 24 hours if the configuration is invalid.
+    """
+    try:
+        return float(env_catalogue_max_age_hours) * 3600
+    except (TypeError, ValueError):
+        return 24 * 3600
+
+
+def _read_json(path):
+    """
+    Reads a catalogue file from the disk.
+
+    Args:
+        path (str): The path to the catalogue file.
+
+    Returns:
+        dict or None: The content of the file, or None if the file does not exist or cannot be read.
+    """
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    """
+    Writes a catalogue file atomically, so a crash never leaves a half written catalogue behind.
+
+    Args:
+        path (str): The path to the catalogue file.
+        data (dict): The content to write.
+    """
+    if not os.path.exists(CATALOGUE_FOLDER):
+        os.makedirs(CATALOGUE_FOLDER)
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w') as file:
+        json.dump(data, file)
+    os.replace(temp_path, path)
+
+
+def refresh_game_versions():
+    """
+    Downloads the list of every Minecraft game version from Modrinth and stores it on the disk.
+
+    The list is ordered from the newest to the oldest version and every entry keeps its
+    version type (release, snapshot, alpha or beta), so pre-releases and snapshots can be
+    told apart from releases without guessing from the version string. In offline mode the
+    list is read from the local mirror.
+
+    Returns:
+        list or None: The list of game versions, or None if the request failed.
+    """
+    global _game_versions, _version_order, _version_types
+    # modrinth_api imports the catalogue, so its request helper is imported on use
+    from modrinth_updater.modrinth_api import _send
+
+    url = f'{MODRINTH_API_BASE}/tag/game_version'
+    try:
+        if env_offline_mode == 'true':
+            versions = mirror.get_game_versions()
+        else:
+            response = _send('GET', url, 'game_version', timeout=15)
+            if response.status_code != HTTPStatus.OK:
+                print(f'⚠️  Cannot refresh the game version catalogue: {response.status_code}')
+                return None
+            versions = [
+                {'version': v['version'], 'version_type': v['version_type'], 'date': v.get('date')}
+                for v in response.json()
+            ]
+    except requests.exceptions.Timeout:
+        print('⚠️ The request timed out!')
+        return None
+    except requests.exceptions.RequestException as e:
+        print(f'⚠️ An error occurred: {e}')
+        return None
+    _write_json(GAME_VERSIONS_FILE, {'fetched': time.time(), 'versions': versions})
+    _game_versions = versions
+    _version_order = None
+    _version_types = None
+    return versions
+
+
+def load_game_versions(refresh=True):
+    """
+    Returns the game version catalogue, refreshing it from Modrinth when it is missing or too old.
+
+    If the refresh fails the stale catalogue is still used, so the updater keeps working offline.
+
+    Args:
+        refresh (bool, optional): If False, the catalogue is never downloaded. Defaults to True.
+
+    Returns:
+        list: The list of game versions from the newest to the oldest, or an empty list if there is no catalogue.
+    """
+    global _game_versions
+    if _game_versions is not None:
+        return _game_versions
+    stored = _read_json(GAME_VERSIONS_FILE)
+    if refresh and (stored is None or time.time() - stored.get('fetched', 0) > _max_age()):
+        versions = refresh_game_versions()
+        if versions is not None:
+            return versions
+    _game_versions = stored['versions'] if stored else []
+    return _game_versions
+
+
+def _get_version_order():
+    """
+    Returns a mapping from game version to its position, where a higher number means a newer version.
+
+    Returns:
+        dict: The position of every known game version.
+    """
+    global _version_order
+    if _version_order is None:
+        versions = load_game_versions()
+        _version_order = {v['version']: len(versions) - i for i, v in enumerate(versions)}
+    return _version_order
+
+
+def get_version_type(game_version):
+    """
+    Returns the version type of a game version from the catalogue.
+
+    Args:
+        game_version (str): The game version, for example '1.21.4' or '25w14a'.
+
+    Returns:
+        str or None: 'release', 'snapshot', 'alpha' or 'beta', or None if the version is not in the catalogue.
+    """
+    global _version_types
+    if _version_types is None:
+        _version_types = {v['version']: v['version_type'] for v in load_game_versions()}
+    return _version_types.get(game_version)
+
+
+def is_release(game_version):
+    """
+    Checks if a game version is a full release (not a snapshot, pre-release or release candidate).
+
+    The catalogue is used when it knows the version. Unknown versions fall back to the
+    release number format, for example '1.21.4'.
+
+    Args:
+        game_version (str): The game version to check.
+
+    Returns:
+        bool: True if the game version is a release.
+    """
+    version_type = get_version_type(game_version)
+    if version_type is not None:
+        return version_type == 'release'
+    return bool(RELEASE_PATTERN.match(game_version))
+
+
+def _loose_version(game_version):
+    """
+    Parses a game version for ordering, treating unparseable versions as the oldest.
+
+    Args:
+        game_version (str): The game version to parse.
+
+    Returns:
+        Version: The parsed version.
+    """
+    try:
+        return Version(game_version)
+    except InvalidVersion:
+        return Version('0')
+
+
+def newest_release(game_versions):
+    """
+    Returns the newest release from a list of game versions.
+
+    Args:
+        game_versions (list): A list of game versions, which can contain snapshots and pre-releases.
+
+    Returns:
+        str or None: The newest release, or None if the list contains no release.
+    """
+    releases = [v for v in game_versions if is_release(v)]
+    if not releases:
+        return None
+    order = _get_version_order()
+    if all(v in order for v in releases):
+        return max(releases, key=order.get)
+    return max(releases, key=_loose_version)
+
+
+def latest_release():
+    """
+    Returns the newest Minecraft release known by the catalogue.
+
+    Returns:
+        str or None: The newest release, or None if the catalogue is empty.
+    """
+    for version in load_game_versions():
+        if version['version_type'] == 'release':
+            return version['version']
+    return None
+
+
+def _load_projects():
+    """
+    Returns the project metadata catalogue loaded from the disk.
+
+    Returns:
+        dict: The cached projects by project id.
+    """
+    global _projects
+    if _projects is None:
+        _projects = _read_json(PROJECTS_FILE) or {}
+    return _projects
+
+
+def _cached_project(project_id):
+    """
+    Returns a cached project by its id or slug.
+
+    Returns:
+        dict or None: The project metadata, or None if the project is not cached.
+    """
+    global _project_slugs
+    projects = _load_projects()
+    if project_id in projects:
+        return projects[project_id]
+    if _project_slugs is None:
+        _project_slugs = {project['slug']: key for key, project in projects.items() if project.get('slug')}
+    return projects.get(_project_slugs.get(project_id))
+
+
+def _fetch_projects(project_ids):
+    """
+    Downloads the metadata of up to `PROJECTS_CHUNK_SIZE` projects with one request.
+
+    Returns:
+        list or None: The project documents, or None if the request failed.
+    """
+    from modrinth_updater.modrinth_api import _send
+
+    url = f'{MODRINTH_API_BASE}/projects'
+    try:
+        if env_offline_mode == 'true':
+            return mirror.get_projects(project_ids)
+        response = _send('GET', url, 'projects', params={'ids': json.dumps(project_ids)}, timeout=15)
+        if response.status_code != HTTPStatus.OK:
+            print(f'⚠️  Cannot refresh the project catalogue: {response.status_code}')
+            return None
+        return response.json()
+    except requests.exceptions.Timeout:
+        print('⚠️ The request timed out!')
+        return None
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f'⚠️ An error occurred: {e}')
+        return None
+
+
+def refresh_projects(project_ids):
+    """
+    Downloads the metadata of many projects with bulk requests and stores it in the catalogue.
+
+    The ids are sent in chunks of `PROJECTS_CHUNK_SIZE`, so a whole fleet takes a handful of requests.
+
+    Args:
+        project_ids (list): The project ids or slugs to refresh.
+
+    Returns:
+        dict: The refreshed projects by project id. Projects which could not be fetched are left out.
+    """
+    project_ids = list(dict.fromkeys(project_ids))
+    if not project_ids:
+        return {}
+    fetched = time.time()
+    refreshed = {}
+    for start in range(0, len(project_ids), PROJECTS_CHUNK_SIZE):
+        chunk = project_ids[start:start + PROJECTS_CHUNK_SIZE]
+        data = _fetch_projects(chunk)
+        if data is None:
+            break
+        found = {project['id'] for project in data} | {project.get('slug') for project in data}
+        _unknown_projects.update(project_id for project_id in chunk if project_id not in found)
+        for project in data:
+            refreshed[project['id']] = {
+                'slug': project.get('slug'),
+                'title': project.get('title'),
+                'project_type': project.get('project_type'),
+                'game_versions': project.get('game_versions', []),
+                'loaders': project.get('loaders', []),
+                'fetched': fetched,
+            }
+    if refreshed:
+        projects = _load_projects()
+        projects.update(refreshed)
+        if _project_slugs is not None:
+            _project_slugs.update((project['slug'], project_id) for project_id, project in refreshed.items() if project['slug'])
+        _write_json(PROJECTS_FILE, projects)
+    return refreshed
+
+
+def refresh_stale_projects():
+    """
+    Refreshes every cached project which is older than the configured maximum age with one bulk request.
+
+    Returns:
+        dict: The refreshed projects by project id.
+    """
+    limit = time.time() - _max_age()
+    stale = [project_id for project_id, project in _load_projects().items() if project['fetched'] < limit]
+    return refresh_projects(stale)
+
+
+def get_project(project_id, refresh=True):
+    """
+    Returns the cached metadata of a project, downloading it only when it is missing or too old.
+
+    Args:
+        project_id (str): The project id or slug.
+        refresh (bool, optional): If False, the project is never downloaded. Defaults to True.
+
+    Returns:
+        dict or None: The project metadata, or None if the project is unknown.
+    """
+    project = _cached_project(project_id)
+    if refresh and (project is None or time.time() - project['fetched'] > _max_age()):
+        metrics.CACHE_MISSES.inc(cache='projects')
+        refresh_projects([project_id])
+        project = _cached_project(project_id) or project
+    else:
+        metrics.CACHE_HITS.inc(cache='projects')
+    return project
+
+
+def get_projects(project_ids, refresh=True):
+    """
+    Returns the cached metadata of many projects, downloading the missing and too old ones with bulk requests.
+
+    Args:
+        project_ids (list): The project ids or slugs.
+        refresh (bool, optional): If False, nothing is downloaded. Defaults to True.
+
+    Returns:
+        dict: The project metadata by the requested id or slug, unknown projects are left out.
+    """
+    limit = time.time() - _max_age()
+    project_ids = list(dict.fromkeys(project_ids))
+    cached = {project_id: _cached_project(project_id) for project_id in project_ids}
+    stale = [project_id for project_id in project_ids if project_id not in _unknown_projects
+             and (cached[project_id] is None or cached[project_id]['fetched'] < limit)]
+    metrics.CACHE_HITS.inc(len(project_ids) - len(stale), cache='projects')
+    if refresh and stale:
+        metrics.CACHE_MISSES.inc(len(stale), cache='projects')
+        refresh_projects(stale)
+        cached.update((project_id, _cached_project(project_id)) for project_id in stale)
+    return {project_id: project for project_id, project in cached.items() if project is not None}
+
+
+def is_compatible(project_id, game_version, loader=None):
+    """
+    Checks from the catalogue if a project has any version for the given game version and loader.
+
+    Args:
+        project_id (str): The project id.
+        game_version (str): The game version to check.
+        loader (str, optional): The loader to check. Defaults to None, which matches every loader.
+
+    Returns:
+        bool or None: True or False, or None if the project is unknown.
+    """
+    project = get_project(project_id)
+    if project is None:
+        return None
+    if game_version not in project['game_versions']:
+        return False
+    return loader is None or loader in project['loaders']
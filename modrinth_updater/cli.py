@@ -0,0 +1,103 @@
+import sys
+import argparse
+import importlib
+
+# Every command imports its subsystem when it runs, so `--help` and the light commands do not pay
+# for requests, packaging or the services. benchmarks/startup.py guards the startup time.
+
+
+def _update(args):
+    from modrinth_updater.updater import update
+    update()
+    return 0
+
+
+def _check(args):
+    from modrinth_updater.updater import check
+    return 1 if check() is None else 0
+
+
+def _rollback(args):
+    from modrinth_updater.transaction import rollback
+    try:
+        transaction = rollback(args.run_id)
+    except ValueError as e:
+        print(f'⚠️  {e}')
+        return 1
+    if transaction is None:
+        print('⚠️  There is no update run to roll back.')
+        return 1
+    print(f'✅ The update run {transaction.run_id} has been rolled back.')
+    return 0
+
+
+def _history(args):
+    from modrinth_updater.state_db import main
+    return main(['last-run'])
+
+
+def _delegate(module_name):
+    """
+    Returns a command which hands the remaining arguments to the command line of another module.
+    """
+    def run(args):
+        return importlib.import_module(f'modrinth_updater.{module_name}').main(args.arguments)
+    return run
+
+
+def build_parser():
+    """
+    Returns the parser of the command line.
+
+    Returns:
+        argparse.ArgumentParser: The parser with one sub command per action.
+    """
+    parser = argparse.ArgumentParser(prog='modrinth_updater', description='Keep the mods, resource packs and shaderpacks of a Minecraft instance up to date.')
+    parser.add_argument('--profile', action='store_true', help='profile the command and write a hot-path report with the peak memory')
+    parser.add_argument('--profile-output', metavar='FOLDER', help="folder of the profile reports, defaults to 'modrinth_updater/profiles'")
+    subparsers = parser.add_subparsers(dest='command')
+
+    subparsers.add_parser('update', help='update every enabled category (the default command)').set_defaults(run=_update)
+    subparsers.add_parser('check', help='list the available updates without changing anything').set_defaults(run=_check)
+    rollback_parser = subparsers.add_parser('rollback', help='restore the files replaced by the last update run')
+    rollback_parser.add_argument('run_id', nargs='?', help='the run to roll back, defaults to the last one')
+    rollback_parser.set_defaults(run=_rollback)
+    subparsers.add_parser('history', help='show what the last update run did').set_defaults(run=_history)
+
+    for name, module_name, help_text in (
+        ('status', 'status', 'report outdated, parked and unknown files without network access'),
+        ('plan', 'planner', 'show which projects are ready for another game version'),
+        ('backups', 'backup_store', 'manage the backups of replaced files'),
+        ('mirror', 'mirror', 'manage the offline metadata mirror'),
+        ('proxy', 'proxy', 'run the caching proxy'),
+        ('fleet', 'fleet', 'update many instances from a shared job queue'),
+    ):
+        subparsers.add_parser(name, help=help_text, add_help=False).set_defaults(run=_delegate(module_name), delegated=True)
+    return parser
+
+
+def main(argv=None):
+    """
+    Command line entry point: `python main.py <command>` or `python -m modrinth_updater <command>`.
+
+    Without a command the instance is updated, like older versions did.
+    """
+    parser = build_parser()
+    args, arguments = parser.parse_known_args(argv)
+    if getattr(args, 'delegated', False):
+        args.arguments = arguments
+    elif arguments:
+        parser.error(f"unrecognized arguments: {' '.join(arguments)}")
+    run = args.run if args.command is not None else _update
+    if not args.profile:
+        return run(args)
+    import os
+    from modrinth_updater.config import default_minecraft_path
+    from modrinth_updater.profiling import profile_run
+    output_folder = args.profile_output or os.path.join(default_minecraft_path, 'modrinth_updater', 'profiles')
+    result, _ = profile_run(lambda: run(args), output_folder)
+    return result
+
+
+if __name__ == '__main__':
+    sys.exit(main())
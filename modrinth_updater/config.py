@@ -1,43 +1,114 @@
 import os
-import platform
-from dotenv import load_dotenv
-
-load_dotenv(override=True)
-system = platform.system()
-
-# If your system is Windows, then the default path is C:\Users\%USERNAME%\AppData\Roaming\.minecraft
-if system == 'Windows':
-    env_mc_path = os.getenv('DEFAULT_WINDOWS_MC_FOLDER')
-    if env_mc_path:
-        default_minecraft_path = env_mc_path
-    else:
-        appdata_path = os.getenv('APPDATA')
-        default_minecraft_path = os.path.join(appdata_path, '.minecraft')
-# If your system is macOS, then the default path is ~/Library/Application Support/minecraft
-elif system == 'Darwin':
-    env_mc_path = os.getenv('DEFAULT_MACOS_MC_FOLDER')
-    if env_mc_path:
-        default_minecraft_path = env_mc_path
-    else:
-        default_minecraft_path = os.path.expanduser('~/Library/Application Support/minecraft')
-# If your system is Linux, then the default path is ~/.minecraft
-elif system == 'Linux':
-    env_mc_path = os.getenv('DEFAULT_LINUX_MC_FOLDER')
-    if env_mc_path:
-        default_minecraft_path = env_mc_path
-    else:
-        default_minecraft_path = os.path.expanduser('~/.minecraft')
-
-# updaters turn on/off configuration
-env_run_mods_update = os.getenv('RUN_MODS_UPDATER')
-env_run_resourepacks_update = os.getenv('RUN_RESOUREPACKS_UPDATER')
-env_run_shaderpacks_update = os.getenv('RUN_SHADERPACKS_UPDATER')
-env_run_datapacks_update = os.getenv('RUN_DATAPACKS_UPDATER')
-
-# moving to wait for update folder configuration
-env_move_mods_to_wait_for_update_folder = os.getenv('WAIT_FOR_UPDATE_MODS')
-env_move_resourcepacks_to_wait_for_update_folder = os.getenv('WAIT_FOR_UPDATE_RESOURCEPAKCS')
-env_move_datapacks_to_wait_for_update_folder = os.getenv('WAIT_FOR_UPDATE_DATAPACKS')
-env_move_shaderpacks_to_wait_for_update_folder = os.getenv('WAIT_FOR_UPDATE_SHADERPACKS')
-
-env_dry_run = os.getenv('DRY_RUN')
\ No newline at end of file
+import sys
+
+# Modrinth API configuration, point MODRINTH_API_BASE at a caching proxy to share one upstream fetch
+MODRINTH_UPSTREAM_API_BASE = "https://api.modrinth.com/v2"
+MODRINTH_UPSTREAM_CDN_BASE = "https://cdn.modrinth.com"
+
+
+class Config:
+    """
+    The settings of the updater, read from the environment once.
+
+    The settings are also available as attributes of this module, for example
+    `from modrinth_updater.config import default_minecraft_path`, which loads them on first use.
+    """
+
+    def __init__(self, environ=os.environ):
+        getenv = environ.get
+        self.system = {'win32': 'Windows', 'darwin': 'Darwin'}.get(sys.platform, 'Linux')
+
+        # If your system is Windows, then the default path is C:\Users\%USERNAME%\AppData\Roaming\.minecraft
+        if self.system == 'Windows':
+            self.default_minecraft_path = getenv('DEFAULT_WINDOWS_MC_FOLDER') or os.path.join(getenv('APPDATA', ''), '.minecraft')
+        # If your system is macOS, then the default path is ~/Library/Application Support/minecraft
+        elif self.system == 'Darwin':
+            self.default_minecraft_path = getenv('DEFAULT_MACOS_MC_FOLDER') or os.path.expanduser('~/Library/Application Support/minecraft')
+        # If your system is Linux, then the default path is ~/.minecraft
+        else:
+            self.default_minecraft_path = getenv('DEFAULT_LINUX_MC_FOLDER') or os.path.expanduser('~/.minecraft')
+
+        # updaters turn on/off configuration
+        self.env_run_mods_update = getenv('RUN_MODS_UPDATER')
+        self.env_run_resourepacks_update = getenv('RUN_RESOUREPACKS_UPDATER')
+        self.env_run_shaderpacks_update = getenv('RUN_SHADERPACKS_UPDATER')
+        self.env_run_datapacks_update = getenv('RUN_DATAPACKS_UPDATER')
+
+        # moving to wait for update folder configuration
+        self.env_move_mods_to_wait_for_update_folder = getenv('WAIT_FOR_UPDATE_MODS')
+        self.env_move_resourcepacks_to_wait_for_update_folder = getenv('WAIT_FOR_UPDATE_RESOURCEPAKCS')
+        self.env_move_datapacks_to_wait_for_update_folder = getenv('WAIT_FOR_UPDATE_DATAPACKS')
+        self.env_move_shaderpacks_to_wait_for_update_folder = getenv('WAIT_FOR_UPDATE_SHADERPACKS')
+
+        self.env_dry_run = getenv('DRY_RUN')
+
+        # wait_for_update re-check schedule, the wait between re-checks doubles after every incompatible answer
+        self.env_recheck_base_hours = getenv('RECHECK_BASE_HOURS', '6')
+        self.env_recheck_max_days = getenv('RECHECK_MAX_DAYS', '14')
+
+        # backup retention configuration, an empty value means no limit
+        self.env_backup_keep_generations = getenv('BACKUP_KEEP_GENERATIONS', '10')
+        self.env_backup_max_age_days = getenv('BACKUP_MAX_AGE_DAYS')
+        self.env_backup_max_size_mb = getenv('BACKUP_MAX_SIZE_MB')
+
+        self.MODRINTH_API_BASE = getenv('MODRINTH_API_BASE') or MODRINTH_UPSTREAM_API_BASE
+
+        # caching proxy configuration
+        self.env_proxy_host = getenv('PROXY_HOST') or '0.0.0.0'
+        self.env_proxy_port = getenv('PROXY_PORT') or '8080'
+        self.env_proxy_cache_path = getenv('PROXY_CACHE_PATH') or os.path.join(self.default_minecraft_path, 'modrinth_updater', 'proxy')
+        self.env_proxy_cache_ttl_seconds = getenv('PROXY_CACHE_TTL_SECONDS') or '600'
+
+        # local catalogue of game versions and project metadata, refreshed after this many hours
+        self.env_catalogue_max_age_hours = getenv('CATALOGUE_MAX_AGE_HOURS', '24')
+
+        # files unknown to Modrinth are not looked up again for this many days
+        self.env_negative_cache_days = getenv('NEGATIVE_CACHE_DAYS', '7')
+
+        # download scheduler configuration, an empty rate means no limit
+        self.env_download_max_kb_per_second = getenv('DOWNLOAD_MAX_KB_PER_SECOND')
+        self.env_download_workers = getenv('DOWNLOAD_WORKERS') or '4'
+        self.env_download_connections_per_host = getenv('DOWNLOAD_CONNECTIONS_PER_HOST') or '2'
+
+        # fleet runner configuration, the queue can be shared by several machines
+        self.env_fleet_queue_path = getenv('FLEET_QUEUE_PATH') or os.path.join(self.default_minecraft_path, 'modrinth_updater', 'fleet.db')
+        self.env_fleet_workers = getenv('FLEET_WORKERS') or '2'
+
+        # Prometheus textfile written after every run, for example for the node_exporter textfile collector
+        self.env_metrics_textfile = getenv('METRICS_TEXTFILE')
+
+        # offline mode configuration, answers every request from the local metadata mirror
+        self.env_offline_mode = getenv('OFFLINE_MODE')
+        self.env_offline_mirror_path = getenv('OFFLINE_MIRROR_PATH') or os.path.join(self.default_minecraft_path, 'modrinth_updater', 'mirror')
+
+
+_config = None
+
+
+def load_config(overrides=None):
+    """
+    Returns the settings of the updater, loading the .env file on the first call.
+
+    Args:
+        overrides (dict, optional): Settings which take precedence over the .env file and the environment,
+            for example the Minecraft folder of a fleet job. Only used by the first call. Defaults to None.
+
+    Returns:
+        Config: The settings.
+    """
+    global _config
+    if _config is None:
+        from dotenv import load_dotenv
+        load_dotenv(override=True)
+        _config = Config(dict(os.environ, **overrides) if overrides else os.environ)
+    return _config
+
+
+def __getattr__(name):
+    # the settings are loaded when a module first asks for one, so importing the CLI stays cheap
+    if name.startswith('_'):
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    try:
+        return getattr(load_config(), name)
+    except AttributeError:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}') from None
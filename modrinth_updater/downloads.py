@@ -0,0 +1,183 @@
+import os
+import time
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from modrinth_updater.config import env_download_max_kb_per_second, env_download_workers, env_download_connections_per_host
+from modrinth_updater.file_utils import download_mod
+from modrinth_updater.hash_utils import hash_file
+from modrinth_updater.profiling import format_bytes
+
+# lower values are downloaded first: mods make the instance runnable, big packs can come last
+CATEGORY_PRIORITY = {'mods': 0, 'datapacks': 1, 'resourcepacks': 2, 'shaderpacks': 2}
+
+# the progress is printed at most this often in seconds
+PROGRESS_INTERVAL = 2
+
+
+def _setting(value, default, minimum=1):
+    """
+    Returns a numeric setting from the .env file, or the default if it is empty or invalid.
+    """
+    try:
+        return max(minimum, float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+class RateLimiter:
+    """
+    Limits the bytes per second of all downloads together with a token bucket.
+
+    Every thread reports its chunks with `consume` and sleeps until its share of the budget is
+    available again, so the sum of all downloads stays below the limit with bursts of one second.
+    """
+
+    def __init__(self, bytes_per_second=None):
+        self.bytes_per_second = bytes_per_second
+        self._allowance = bytes_per_second or 0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, size):
+        if not self.bytes_per_second:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self.bytes_per_second, self._allowance + (now - self._last) * self.bytes_per_second)
+            self._last = now
+            self._allowance -= size
+            wait = -self._allowance / self.bytes_per_second if self._allowance < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class DownloadProgress:
+    """
+    Counts the downloaded files and bytes and prints the progress with an estimated time left.
+    """
+
+    def __init__(self, files, total_bytes):
+        self.files = files
+        self.total_bytes = total_bytes
+        self.done_files = 0
+        self.done_bytes = 0
+        self._start = time.monotonic()
+        self._printed = self._start
+        self._lock = threading.Lock()
+
+    def advance(self, size=0, files=0):
+        with self._lock:
+            self.done_bytes += size
+            self.done_files += files
+            now = time.monotonic()
+            if now - self._printed < PROGRESS_INTERVAL and self.done_files < self.files:
+                return
+            self._printed = now
+            line = self._format(now)
+        print(line)
+
+    def _format(self, now):
+        elapsed = max(now - self._start, 1e-6)
+        rate = self.done_bytes / elapsed
+        line = f'⬇️  {self.done_files}/{self.files} files, {format_bytes(self.done_bytes)} of {format_bytes(self.total_bytes)}, {format_bytes(rate)}/s'
+        remaining = self.total_bytes - self.done_bytes
+        if self.done_files < self.files and rate > 0 and remaining > 0:
+            line += f', about {remaining / rate:.0f} s left'
+        return line
+
+
+class DownloadScheduler:
+    """
+    Downloads many files in parallel under a global byte-rate limit and a limit of connections per host.
+
+    The downloads are started by priority and then by size, so small mod jars are in place before
+    big shaderpacks and resource packs are fetched.
+
+    Usage:
+        scheduler = DownloadScheduler()
+        scheduler.add(url, folder, 'sodium.jar', size=1024, category='mods')
+        results = scheduler.run()
+    """
+
+    def __init__(self, max_bytes_per_second=None, workers=None, connections_per_host=None):
+        if max_bytes_per_second is None:
+            max_kb = _setting(env_download_max_kb_per_second, None)
+            max_bytes_per_second = max_kb * 1024 if max_kb else None
+        self.limiter = RateLimiter(max_bytes_per_second)
+        self.workers = int(workers or _setting(env_download_workers, 4))
+        self.connections_per_host = int(connections_per_host or _setting(env_download_connections_per_host, 2))
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+        self.jobs = []
+
+    def add(self, url, save_folder, file_name, size=None, category=None, sha1_hash=None):
+        """
+        Queues a download.
+
+        A download with a known SHA1 hash is checked against it, and a file which does not match is
+        removed and reported as failed, so a truncated or corrupted file is never installed.
+
+        Args:
+            url (str): The URL of the file.
+            save_folder (str): The folder the file is saved in.
+            file_name (str): The name of the saved file.
+            size (int, optional): The expected size in bytes, used for the order and the progress. Defaults to None.
+            category (str, optional): The category of the file, for example 'mods'. Defaults to None.
+            sha1_hash (str, optional): The SHA1 hash Modrinth announced for the file. Defaults to None.
+
+        Returns:
+            dict: The queued job, the key of its result in `run`.
+        """
+        job = {'url': url, 'save_folder': save_folder, 'file_name': file_name, 'size': size, 'category': category, 'sha1': sha1_hash}
+        self.jobs.append(job)
+        return job
+
+    def _host_slot(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        with self._hosts_lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.connections_per_host)
+            return self._hosts[host]
+
+    def _download(self, job, progress):
+        save_path = os.path.join(job['save_folder'], job['file_name'])
+
+        def on_chunk(size):
+            self.limiter.consume(size)
+            progress.advance(size)
+
+        with self._host_slot(job['url']):
+            saved_path = download_mod(job['url'], job['save_folder'], job['file_name'], on_chunk)
+        progress.advance(files=1)
+        if saved_path != save_path:
+            raise OSError(saved_path or 'The request timed out!')
+        # the hash is checked in the worker thread, so the files are verified in parallel
+        if job['sha1'] and hash_file(saved_path)['sha1'] != job['sha1']:
+            os.remove(saved_path)
+            raise OSError(f"The downloaded file does not match its SHA1 hash {job['sha1']}")
+        return saved_path
+
+    def run(self):
+        """
+        Downloads every queued file and empties the queue.
+
+        Returns:
+            list: One (job, error) tuple per job in the order they were added, the error is None for a finished download.
+        """
+        jobs, self.jobs = self.jobs, []
+        if not jobs:
+            return []
+        order = sorted(jobs, key=lambda job: (CATEGORY_PRIORITY.get(job['category'], 1), job['size'] is None, job['size'] or 0))
+        progress = DownloadProgress(len(jobs), sum(job['size'] or 0 for job in jobs))
+        results = {}
+        # the pool takes the jobs in submission order, so the priority order is kept
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [(job, executor.submit(self._download, job, progress)) for job in order]
+            for job, future in futures:
+                try:
+                    future.result()
+                    results[id(job)] = None
+                except Exception as e:
+                    results[id(job)] = e
+        return [(job, results[id(job)]) for job in jobs]
@@ -2,19 +2,25 @@ import os
 import re
 import urllib.parse
 import json
-from packaging.version import Version
 import requests
-from modrinth_updater.config import default_minecraft_path
+from modrinth_updater.config import default_minecraft_path, env_offline_mode
+from modrinth_updater.catalogue import newest_release
+from modrinth_updater import mirror, metrics
+from modrinth_updater.scanner import MANAGED_EXTENSIONS, scan_folder
 
-def download_mod(url, save_folder, mod_name=None):
+def download_mod(url, save_folder, mod_name=None, on_chunk=None):
     """
     Downloads a file from the given URL and saves it to the given folder.
+
+    In offline mode the file is linked or copied from the local mirror instead.
     
     Args:
         url (str): The URL of the file to download.
         save_folder (str): The folder to save the file in.
         mod_name (str, optional): The name to give the downloaded file. If None, the filename
             will be determined from the URL. Defaults to None.
+        on_chunk (callable, optional): Called with the size of every downloaded chunk, for example to
+            limit the download rate or to report the progress. Defaults to None.
     
     Returns:
         str: The path to the saved file, or an error message if the file could not be downloaded.
@@ -23,11 +29,22 @@ def download_mod(url, save_folder, mod_name=None):
         mod_name = os.path.basename(url)
         mod_name = urllib.parse.unquote(mod_name)
     save_path = os.path.join(save_folder, mod_name)
+    if env_offline_mode == 'true':
+        source_path = mirror.find_file(url)
+        if source_path is None:
+            raise FileNotFoundError(f'{mod_name} is not in the offline mirror')
+        mirror.link_or_copy(source_path, save_path)
+        return save_path
     try:
         response = requests.get(url, stream=True, timeout=15)
+        response.raise_for_status()
         with open(save_path, 'wb') as file:
             for chunk in response.iter_content(chunk_size=8192):
                 file.write(chunk)
+                metrics.BYTES_DOWNLOADED.inc(len(chunk))
+                if on_chunk is not None:
+                    on_chunk(len(chunk))
+        metrics.DOWNLOADS.inc()
         return save_path
     except requests.exceptions.Timeout:
         print("The request timed out!")
@@ -60,7 +77,7 @@ def fix_version_number(version):
 
 def fix_game_version_number(game_versions):
     """
-    Removes any snapshot versions from a list of game versions and returns the highest version number.
+    Removes any snapshot and pre-release versions from a list of game versions and returns the newest release.
 
     Args:
         game_versions (list): A list of game versions to filter.
@@ -71,11 +88,40 @@ def fix_game_version_number(game_versions):
     try:
         if isinstance(game_versions, str):
             game_versions = [game_versions]
-        with_out_snapshot = [v for v in game_versions if 'w' not in v.lower()]
-        return max(with_out_snapshot, key=Version)
+        return newest_release(game_versions)
     except Exception as e:
         print(f'An error occurred with versioning: {e}')
 
+# the parsed launcher_profiles.json by path with its modification time, it is read once per change
+_launcher_profiles = {}
+
+# the file names of the mods which load shaderpacks, with the Modrinth loader of their shaderpacks
+SHADER_LOADER_MODS = (('iris', 'iris'), ('oculus', 'iris'), ('canvas', 'canvas'), ('optifine', 'optifine'), ('optifabric', 'optifine'))
+
+# the Modrinth loaders of the content types which are not mods, every shader loader is used if none is installed
+CONTENT_LOADERS = {
+    'resourcepacks': ('minecraft',),
+    'shaderpacks': ('iris', 'optifine', 'canvas'),
+    'datapacks': ('datapack',),
+}
+
+def _load_launcher_profiles(path):
+    """
+    Returns the parsed launcher_profiles.json, parsing it again only when the file changed.
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If the file is not valid JSON.
+    """
+    json_path = os.path.join(path, 'launcher_profiles.json')
+    mtime_ns = os.stat(json_path).st_mtime_ns
+    cached = _launcher_profiles.get(json_path)
+    if cached is None or cached[0] != mtime_ns:
+        with open(json_path, 'r') as file:
+            cached = (mtime_ns, json.load(file))
+        _launcher_profiles[json_path] = cached
+    return cached[1]
+
 def get_current_fabric_version(path = default_minecraft_path):
     """
     Retrieves the current version of the Fabric loader by reading the launcher_profiles.json file.
@@ -86,28 +132,24 @@ def get_current_fabric_version(path = default_minecraft_path):
     Returns:
         str: The version of the Fabric loader, or an error message if the file could not be read.
     """
-    json_path = os.path.join(path, 'launcher_profiles.json')
     try:
-        with open(json_path, 'r') as file:
-            data = json.load(file)
-            loader_name=[]
-            versions =[]
-            for loaders in data['profiles']:
-                if 'fabric' in loaders:
-                    loader_name.append(loaders)
-            if len(loader_name) < 2:
-                fabric_version = loader_name[0].split('-')[-1]
-                return fabric_version
-            elif len(loader_name) >= 2:
-                for vers in loader_name:
-                    versions.append(vers.split('-')[-1])
-                fabric_version = [v for v in versions if 'w' not in v.lower()]
-                fabric_version = (max(fabric_version, key=Version))
-                return fabric_version
-            else:
-                if not loader_name:
-                    print('No fabric version found.')
-                    return loader_name
+        data = _load_launcher_profiles(path)
+        loader_name=[]
+        versions =[]
+        for loaders in data['profiles']:
+            if 'fabric' in loaders:
+                loader_name.append(loaders)
+        if len(loader_name) < 2:
+            fabric_version = loader_name[0].split('-')[-1]
+            return fabric_version
+        elif len(loader_name) >= 2:
+            for vers in loader_name:
+                versions.append(vers.split('-')[-1])
+            return newest_release(versions)
+        else:
+            if not loader_name:
+                print('No fabric version found.')
+                return loader_name
     except Exception as e:
         error = (f'Error reading launcher_profiles.json: {e}')
         return error
@@ -122,27 +164,81 @@ def get_current_loader(path = default_minecraft_path):
     Returns:
         str: The name of the current Minecraft loader, or an error message if the file could not be read.
     """
-    json_path = os.path.join(path, 'launcher_profiles.json')
     try:
-        with open(json_path, 'r') as file:
-            data = json.load(file)
-            for loaders in data['profiles']:
-                try:
-                    if 'fabric' in loaders:
-                        return 'fabric'
-                    elif 'forge' in loaders:
-                        return 'forge'
-                    elif 'neoforge' in loaders:
-                        return 'neoforge'
-                    elif 'quilt' in loaders:
-                        return 'quilt'
-                except Exception as e:
-                    error = (f'Error reading launcher_profiles.json: {e}')
-                    return error
+        data = _load_launcher_profiles(path)
+        for loaders in data['profiles']:
+            try:
+                if 'fabric' in loaders:
+                    return 'fabric'
+                elif 'forge' in loaders:
+                    return 'forge'
+                elif 'neoforge' in loaders:
+                    return 'neoforge'
+                elif 'quilt' in loaders:
+                    return 'quilt'
+            except Exception as e:
+                error = (f'Error reading launcher_profiles.json: {e}')
+                return error
     except Exception as e:
         error = (f'Error reading launcher_profiles.json: {e}')
         return error
-    
+
+def get_shader_loaders(path = default_minecraft_path):
+    """
+    Detects which shader loaders are installed, from the mods folder and the OptiFine launcher profiles.
+
+    Args:
+        path (str, optional): The path to the Minecraft directory. Defaults to the global variable `default_minecraft_path`.
+
+    Returns:
+        tuple: The Modrinth loaders of the installed shader loaders, or every shader loader if none is installed.
+    """
+    names = [entry.name.lower() for entry in scan_folder(os.path.join(path, 'mods'), ('.jar',))]
+    found = [loader for prefix, loader in SHADER_LOADER_MODS if any(name.startswith(prefix) for name in names)]
+    try:
+        if any('optifine' in name.lower() for name in _load_launcher_profiles(path)['profiles']):
+            found.append('optifine')
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return tuple(dict.fromkeys(found)) or CONTENT_LOADERS['shaderpacks']
+
+def get_content_loaders(category, loader=None, path = default_minecraft_path):
+    """
+    Returns the Modrinth loaders the updates of a content type have to support.
+
+    Mods need the mod loader of the instance, resource packs are 'minecraft' and shaderpacks need
+    one of the installed shader loaders.
+
+    Args:
+        category (str): The content type, for example 'mods' or 'shaderpacks'.
+        loader (str, optional): The mod loader of the instance. Defaults to None.
+        path (str, optional): The path to the Minecraft directory. Defaults to the global variable `default_minecraft_path`.
+
+    Returns:
+        list or None: The loaders, or None for no loader filter.
+    """
+    if category == 'mods':
+        return [loader] if loader else None
+    if category == 'shaderpacks':
+        return list(get_shader_loaders(path))
+    return list(CONTENT_LOADERS[category]) if category in CONTENT_LOADERS else None
+
+def _list_files(folder, only_name, extensions=MANAGED_EXTENSIONS):
+    """
+    Returns the file names or the full paths of the files in a folder.
+
+    Args:
+        folder (str): The folder to list.
+        only_name (bool): If True, returns only the file names.
+        extensions (tuple, optional): Only files with these extensions are returned. Defaults to `MANAGED_EXTENSIONS`.
+
+    Returns:
+        list: A list of file names or full paths depending on the `only_name` parameter.
+    """
+    entries = scan_folder(folder, extensions)
+    if only_name:
+        return [entry.name for entry in entries]
+    return [entry.path for entry in entries]
 
 def get_all_local_mods(only_name = False, path = default_minecraft_path):
     """
@@ -160,16 +256,7 @@ def get_all_local_mods(only_name = False, path = default_minecraft_path):
     Returns:
         list: A list of mod file names or full paths depending on the `only_name` parameter.
     """
-    mods_folder = os.path.join(path, 'mods')
-    list_mods = []
-    for mods in os.listdir(mods_folder):
-        mods_with_path = os.path.join(mods_folder, mods)
-        if os.path.isfile(mods_with_path):
-            if only_name:
-                list_mods.append(os.path.basename(mods_with_path))
-            else:
-                list_mods.append(mods_with_path)
-    return list_mods
+    return _list_files(os.path.join(path, 'mods'), only_name)
 
 def get_wait_for_update_mods(only_name = False, path = default_minecraft_path):
     """
@@ -187,16 +274,7 @@ def get_wait_for_update_mods(only_name = False, path = default_minecraft_path):
     Returns:
         list: A list of mod file names or full paths depending on the `only_name` parameter.
     """
-    wait_for_update_folder = os.path.join(path, 'modrinth_updater', 'mods', 'wait_for_update')
-    list_mods = []
-    for mods in os.listdir(wait_for_update_folder):
-        mods_with_path = os.path.join(wait_for_update_folder, mods)
-        if os.path.isfile(mods_with_path):
-            if only_name:
-                list_mods.append(os.path.basename(mods_with_path))
-            else:
-                list_mods.append(mods_with_path)
-    return list_mods
+    return _list_files(os.path.join(path, 'modrinth_updater', 'mods', 'wait_for_update'), only_name)
 
 def get_all_resource_packs(only_name = False, path = default_minecraft_path):
     """
@@ -214,16 +292,7 @@ def get_all_resource_packs(only_name = False, path = default_minecraft_path):
     Returns:
         list: A list of resourcepack file names or full paths depending on the `only_name` parameter.
     """
-    resurce_packs_folder = os.path.join(path, 'resourcepacks')
-    list_resource_packs = []
-    for resource_pack in os.listdir(resurce_packs_folder):
-        resource_pack_with_path = os.path.join(resurce_packs_folder, resource_pack)
-        if os.path.isfile(resource_pack_with_path):
-            if only_name:
-                list_resource_packs.append(os.path.basename(resource_pack_with_path))
-            else:
-                list_resource_packs.append(resource_pack_with_path)
-    return list_resource_packs
+    return _list_files(os.path.join(path, 'resourcepacks'), only_name)
 
 def get_wait_for_update_resource_packs(only_name = False, path = default_minecraft_path):
     """
@@ -241,18 +310,7 @@ def get_wait_for_update_resource_packs(only_name = False, path = default_minecra
     Returns:
         list: A list of resourcepack file names or full paths depending on the `only_name` parameter.
     """
-    resurce_packs_folder = os.path.join(path, 'modrinth_updater', 'resourcepacks', 'wait_for_update')
-    if not os.path.exists(resurce_packs_folder):
-                    os.makedirs(resurce_packs_folder)
-    list_resource_packs = []
-    for resource_pack in os.listdir(resurce_packs_folder):
-        resource_pack_with_path = os.path.join(resurce_packs_folder, resource_pack)
-        if os.path.isfile(resource_pack_with_path):
-            if only_name:
-                list_resource_packs.append(os.path.basename(resource_pack_with_path))
-            else:
-                list_resource_packs.append(resource_pack_with_path)
-    return list_resource_packs
+    return _list_files(os.path.join(path, 'modrinth_updater', 'resourcepacks', 'wait_for_update'), only_name)
 
 def get_all_shaderpacks(only_name = False, path = default_minecraft_path):
     """
@@ -270,16 +328,7 @@ def get_all_shaderpacks(only_name = False, path = default_minecraft_path):
     Returns:
         list: A list of shaderpack file names or full paths depending on the `only_name` parameter.
     """
-    shaderpacks_folder = os.path.join(path, 'shaderpacks')
-    list_shaderpacks = []
-    for shaderpack in os.listdir(shaderpacks_folder):
-        shaderpacks_with_path = os.path.join(shaderpacks_folder, shaderpack)
-        if os.path.isfile(shaderpacks_with_path):
-            if only_name:
-                list_shaderpacks.append(os.path.basename(shaderpacks_with_path))
-            else:
-                list_shaderpacks.append(shaderpacks_with_path)
-    return list_shaderpacks
+    return _list_files(os.path.join(path, 'shaderpacks'), only_name)
 
 def get_wait_for_update_shaderpacks(only_name = False, path = default_minecraft_path):
     """
@@ -297,18 +346,7 @@ def get_wait_for_update_shaderpacks(only_name = False, path = default_minecraft_
     Returns:
         list: A list of shaderpack file names or full paths depending on the `only_name` parameter.
     """
-    shaderpacks_folder = os.path.join(path, 'modrinth_updater', 'shaderpacks', 'wait_for_update')
-    if not os.path.exists(shaderpacks_folder):
-                    os.makedirs(shaderpacks_folder)
-    list_shaderpacks = []
-    for shaderpack in os.listdir(shaderpacks_folder):
-        shaderpacks_with_path = os.path.join(shaderpacks_folder, shaderpack)
-        if os.path.isfile(shaderpacks_with_path):
-            if only_name:
-                list_shaderpacks.append(os.path.basename(shaderpacks_with_path))
-            else:
-                list_shaderpacks.append(shaderpacks_with_path)
-    return list_shaderpacks
+    return _list_files(os.path.join(path, 'modrinth_updater', 'shaderpacks', 'wait_for_update'), only_name)
 
 def get_all_save_folder(only_name = False, path = default_minecraft_path):
     """
@@ -326,16 +364,7 @@ def get_all_save_folder(only_name = False, path = default_minecraft_path):
     Returns:
         list: A list of save file names or full paths depending on the `only_name` parameter.
     """
-    saves_folder = os.path.join(path, 'saves')
-    list_save_folders = []
-    for save in os.listdir(saves_folder):
-        save_with_path = os.path.join(saves_folder, save)
-        if os.path.isfile(save_with_path):
-            if only_name:
-                list_save_folders.append(os.path.basename(save_with_path))
-            else:
-                list_save_folders.append(save_with_path)
-    return list_save_folders
+    return _list_files(os.path.join(path, 'saves'), only_name, extensions=None)
 
 def get_all_datapacks(save_folder , only_name = False):
     """
@@ -352,16 +381,7 @@ def get_all_datapacks(save_folder , only_name = False):
     Returns:
         list: A list of datapack file names or full paths depending on the `only_name` parameter.
     """
-    datapacks_folder_path = os.path.join(save_folder, 'datapacks')
-    datapacks = []
-    for datapack in os.listdir(datapacks_folder_path):
-        datapacks_with_path = os.path.join(save_folder, datapack)
-        if os.path.isfile(datapacks_with_path):
-            if only_name:
-                datapacks.append(os.path.basename(datapacks_with_path))
-            else:
-                datapacks.append(datapacks_with_path)
-    return datapacks
+    return _list_files(os.path.join(save_folder, 'datapacks'), only_name)
 
 def get_wait_for_update_save_folder(only_name = False, path = default_minecraft_path):
     """
@@ -379,18 +399,7 @@ def get_wait_for_update_save_folder(only_name = False, path = default_minecraft_
     Returns:
         list: A list of save file names or full paths depending on the `only_name` parameter.
     """
-    datapacks_folder = os.path.join(path, 'modrinth_updater', 'datapacks', 'wait_for_update')
-    if not os.path.exists(datapacks_folder):
-                    os.makedirs(datapacks_folder)
-    list_save_folders = []
-    for save in os.listdir(datapacks_folder):
-        save_with_path = os.path.join(datapacks_folder, save)
-        if os.path.isfile(save_with_path):
-            if only_name:
-                list_save_folders.append(os.path.basename(save_with_path))
-            else:
-                list_save_folders.append(save_with_path)
-    return list_save_folders
+    return _list_files(os.path.join(path, 'modrinth_updater', 'datapacks', 'wait_for_update'), only_name)
 
 def get_wait_for_update_datapacks(save_folder , only_name = False):
     """
@@ -407,13 +416,4 @@ def get_wait_for_update_datapacks(save_folder , only_name = False):
     Returns:
         list: A list of datapack file names or full paths depending on the `only_name` parameter.
     """
-    datapacks_folder_path = os.path.join(save_folder, 'datapacks')
-    datapacks = []
-    for datapack in os.listdir(datapacks_folder_path):
-        datapacks_with_path = os.path.join(save_folder, datapack)
-        if os.path.isfile(datapacks_with_path):
-            if only_name:
-                datapacks.append(os.path.basename(datapacks_with_path))
-            else:
-                datapacks.append(datapacks_with_path)
-    return datapacks
\ No newline at end of file
+    return _list_files(os.path.join(save_folder, 'datapacks'), only_name)
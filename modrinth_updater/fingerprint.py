@@ -0,0 +1,116 @@
+import re
+import json
+import zipfile
+from modrinth_updater import state_db
+
+# the metadata files of the mod loaders, in the order they are looked for
+METADATA_FILES = ('fabric.mod.json', 'quilt.mod.json', 'META-INF/mods.toml', 'META-INF/neoforge.mods.toml')
+
+TOML_VALUE = r'^\s*{}\s*=\s*["\']([^"\']*)["\']'
+
+
+def _parse_fabric(data):
+    metadata = json.loads(data, strict=False)
+    return {'loader': 'fabric', 'mod_id': metadata.get('id'), 'name': metadata.get('name'), 'version': metadata.get('version')}
+
+
+def _parse_quilt(data):
+    metadata = json.loads(data, strict=False).get('quilt_loader', {})
+    return {
+        'loader': 'quilt',
+        'mod_id': metadata.get('id'),
+        'name': metadata.get('metadata', {}).get('name'),
+        'version': metadata.get('version'),
+    }
+
+
+def _parse_mods_toml(loader):
+    def parse(data):
+        # only the first [[mods]] entry is read, with a regex so no TOML parser is needed
+        text = data.decode('utf-8', errors='replace')
+        mods_start = text.find('[[mods]]')
+        section = text[mods_start:] if mods_start >= 0 else text
+        values = {}
+        for key in ('modId', 'version', 'displayName'):
+            match = re.search(TOML_VALUE.format(key), section, re.MULTILINE)
+            values[key] = match.group(1) if match else None
+        return {'loader': loader, 'mod_id': values['modId'], 'name': values['displayName'], 'version': values['version']}
+    return parse
+
+
+PARSERS = {
+    'fabric.mod.json': _parse_fabric,
+    'quilt.mod.json': _parse_quilt,
+    'META-INF/mods.toml': _parse_mods_toml('forge'),
+    'META-INF/neoforge.mods.toml': _parse_mods_toml('neoforge'),
+}
+
+
+def identify(file_path):
+    """
+    Identifies a mod jar from the metadata file of its loader without extracting it.
+
+    Only the zip central directory and the metadata file itself are read.
+
+    Args:
+        file_path (str): The path to the jar.
+
+    Returns:
+        dict or None: The 'loader', 'mod_id', 'name' and 'version' of the mod, or None if the file has no loader metadata.
+    """
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            names = set(archive.namelist())
+            for name in METADATA_FILES:
+                if name in names:
+                    fingerprint = PARSERS[name](archive.read(name))
+                    return fingerprint if fingerprint['mod_id'] else None
+    except (OSError, zipfile.BadZipFile, ValueError, AttributeError):
+        return None
+    return None
+
+
+def _slug_candidates(mod_id):
+    """
+    Returns the Modrinth slugs a mod id is likely published under, for example 'my_mod' as 'my-mod'.
+    """
+    mod_id = mod_id.lower()
+    return list(dict.fromkeys((mod_id, mod_id.replace('_', '-'))))
+
+
+def match_unknown_files(entries, hashes):
+    """
+    Identifies the files Modrinth does not know by hash and matches them to Modrinth projects.
+
+    Every new unknown file is identified from its loader metadata, and all their mod ids are
+    looked up with one bulk project request. The result is stored in the state database, so each
+    unknown file is only identified once.
+
+    Args:
+        entries (list): The `ScanEntry` items of the files to look at.
+        hashes (dict): The SHA1 hash by file path.
+
+    Returns:
+        list: One dict per newly identified file with 'name', the 'fingerprint' and the matching 'project' or None.
+    """
+    from modrinth_updater.catalogue import refresh_projects
+
+    pending = []
+    for entry in entries:
+        sha1_hash = hashes.get(entry.path)
+        if sha1_hash is None or not state_db.is_unknown(sha1_hash) or state_db.get_fingerprint(sha1_hash) is not None:
+            continue
+        pending.append((entry, sha1_hash, identify(entry.path)))
+    if not pending:
+        return []
+
+    candidates = [slug for _, _, fingerprint in pending if fingerprint for slug in _slug_candidates(fingerprint['mod_id'])]
+    by_slug = {project['slug']: dict(project, id=project_id) for project_id, project in refresh_projects(candidates).items()}
+    matches = []
+    for entry, sha1_hash, fingerprint in pending:
+        project = None
+        if fingerprint:
+            project = next((by_slug[slug] for slug in _slug_candidates(fingerprint['mod_id']) if slug in by_slug), None)
+        state_db.record_fingerprint(sha1_hash, fingerprint, project['id'] if project else None)
+        matches.append({'name': entry.name, 'fingerprint': fingerprint, 'project': project})
+    return matches
@@ -0,0 +1,406 @@
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+import contextlib
+import multiprocessing
+
+# The fleet runner updates many instances from one durable job queue in a SQLite file. Workers on
+# several machines can share the queue through a shared folder: a job is leased for a while and
+# the lease is renewed while the update runs, so the job of a crashed worker is taken over by the
+# next worker once its lease ran out. Every job runs in its own process with its own settings.
+#
+# This module reads the settings only inside functions, so the job processes can load them with
+# the Minecraft folder of their instance.
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    instance TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    not_before REAL NOT NULL,
+    queued REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    error TEXT,
+    log_path TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, not_before);
+"""
+
+# a job is taken over by another worker when its lease is not renewed for this many seconds
+LEASE_SECONDS = 300
+HEARTBEAT_SECONDS = 30
+
+# the wait before a failed job is tried again, doubled after every failed attempt
+RETRY_BASE_SECONDS = 60
+
+# the settings which select the Minecraft folder, one per platform
+INSTANCE_SETTINGS = ('DEFAULT_WINDOWS_MC_FOLDER', 'DEFAULT_MACOS_MC_FOLDER', 'DEFAULT_LINUX_MC_FOLDER')
+
+
+class FleetQueue:
+    """
+    The durable job queue of the fleet runner, one row per instance update.
+
+    Every method opens its own short connection, so the queue can be used from many threads,
+    processes and machines at once. Leases are taken in an immediate transaction, so two workers
+    never run the same job.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        folder = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        with self._connect() as connection:
+            connection.executescript(QUEUE_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # the default rollback journal also works on network folders, unlike WAL
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def add(self, instance, settings=None, max_attempts=3):
+        """
+        Queues the update of an instance, unless it is already queued or running.
+
+        Args:
+            instance (str): The Minecraft folder of the instance.
+            settings (dict, optional): Settings of this instance which replace the .env file values. Defaults to None.
+            max_attempts (int, optional): How often the update is tried before the job fails. Defaults to 3.
+
+        Returns:
+            int or None: The id of the new job, or None if the instance already has one.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            existing = connection.execute(
+                "SELECT id FROM jobs WHERE instance = ? AND state IN ('queued', 'running')", (instance,)
+            ).fetchone()
+            if existing is not None:
+                connection.execute('COMMIT')
+                return None
+            cursor = connection.execute(
+                "INSERT INTO jobs (instance, settings, state, max_attempts, not_before, queued) VALUES (?, ?, 'queued', ?, ?, ?)",
+                (instance, json.dumps(settings or {}), max_attempts, now, now)
+            )
+            connection.execute('COMMIT')
+            return cursor.lastrowid
+
+    def lease(self, worker):
+        """
+        Takes the next due job, or a running job whose lease ran out.
+
+        Args:
+            worker (str): The id of the worker.
+
+        Returns:
+            dict or None: The leased job, or None if no job is due.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            while True:
+                row = connection.execute(
+                    "SELECT * FROM jobs WHERE (state = 'queued' AND not_before <= ?) OR (state = 'running' AND lease_until < ?) "
+                    'ORDER BY id LIMIT 1', (now, now)
+                ).fetchone()
+                if row is None:
+                    connection.execute('COMMIT')
+                    return None
+                if row['state'] == 'running' and row['attempts'] >= row['max_attempts']:
+                    connection.execute(
+                        "UPDATE jobs SET state = 'failed', finished = ?, error = ? WHERE id = ?",
+                        (now, f"the worker {row['worker']} stopped during the last attempt", row['id'])
+                    )
+                    continue
+                connection.execute(
+                    "UPDATE jobs SET state = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, started = ? WHERE id = ?",
+                    (worker, now + LEASE_SECONDS, now, row['id'])
+                )
+                job = dict(connection.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone())
+                connection.execute('COMMIT')
+                job['settings'] = json.loads(job['settings'])
+                return job
+
+    def renew(self, job_id, worker, log_path=None):
+        """
+        Extends the lease of a running job.
+
+        Returns:
+            bool: False if the job was taken over by another worker in the meantime.
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET lease_until = ?, log_path = COALESCE(?, log_path) WHERE id = ? AND worker = ? AND state = 'running'",
+                (time.time() + LEASE_SECONDS, log_path, job_id, worker)
+            )
+            return cursor.rowcount == 1
+
+    def finish(self, job_id, worker, error=None):
+        """
+        Records the end of an attempt. A failed job is queued again with a growing wait until it runs out of attempts.
+
+        Args:
+            job_id (int): The id of the job.
+            worker (str): The id of the worker which ran it.
+            error (str, optional): Why the attempt failed, None if it succeeded. Defaults to None.
+
+        Returns:
+            str or None: The new state of the job, or None if the job was taken over by another worker.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND worker = ? AND state = 'running'", (job_id, worker)
+            ).fetchone()
+            if row is None:
+                connection.execute('COMMIT')
+                return None
+            if error is None:
+                state, not_before = 'done', now
+            elif row['attempts'] < row['max_attempts']:
+                state, not_before = 'queued', now + RETRY_BASE_SECONDS * 2 ** (row['attempts'] - 1)
+            else:
+                state, not_before = 'failed', now
+            connection.execute(
+                'UPDATE jobs SET state = ?, not_before = ?, finished = ?, error = ?, lease_until = NULL WHERE id = ?',
+                (state, not_before, now, error, job_id)
+            )
+            connection.execute('COMMIT')
+            return state
+
+    def next_due(self):
+        """
+        Returns in how many seconds the next queued job is due.
+
+        Returns:
+            float or None: The seconds until the next queued job, 0 if one is due, or None if nothing is queued.
+        """
+        with self._connect() as connection:
+            row = connection.execute("SELECT MIN(not_before) FROM jobs WHERE state = 'queued'").fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def requeue_failed(self):
+        """
+        Queues every failed job again with fresh attempts.
+
+        Returns:
+            int: The number of queued jobs.
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET state = 'queued', attempts = 0, not_before = ?, error = NULL WHERE state = 'failed'", (time.time(),)
+            )
+            return cursor.rowcount
+
+    def counts(self):
+        """
+        Returns the number of jobs by state, over every worker of the fleet.
+
+        Returns:
+            dict: The counts of 'queued', 'running', 'done' and 'failed' jobs.
+        """
+        counts = dict.fromkeys(('queued', 'running', 'done', 'failed'), 0)
+        with self._connect() as connection:
+            for state, count in connection.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state'):
+                counts[state] = count
+        return counts
+
+    def jobs(self):
+        """
+        Returns every job, from the oldest to the newest.
+
+        Returns:
+            list: One dict per job.
+        """
+        with self._connect() as connection:
+            return [dict(row) for row in connection.execute('SELECT * FROM jobs ORDER BY id')]
+
+
+def _run_job(settings, log_path):
+    """
+    Runs one instance update in a fresh process, with its output in the log of the job.
+    """
+    log = open(log_path, 'a', encoding='utf-8', buffering=1)
+    sys.stdout = sys.stderr = log
+    from modrinth_updater.config import load_config
+    config = load_config(settings)
+    if not os.path.isdir(config.default_minecraft_path):
+        raise FileNotFoundError(f'The Minecraft folder {config.default_minecraft_path} does not exist')
+    from modrinth_updater.updater import update
+    update()
+
+
+def _progress(queue):
+    counts = queue.counts()
+    return f"fleet: {counts['done']} done, {counts['running']} running, {counts['queued']} queued, {counts['failed']} failed"
+
+
+def _work(queue, worker, log_folder, settings, print_lock):
+    """
+    Leases jobs and runs each of them in its own process until the queue is empty.
+    """
+    context = multiprocessing.get_context('spawn')
+    while True:
+        job = queue.lease(worker)
+        if job is None:
+            wait = queue.next_due()
+            if wait is None:
+                return
+            time.sleep(min(max(wait, 1), HEARTBEAT_SECONDS))
+            continue
+        log_path = os.path.join(log_folder, f"{job['id']}-{job['attempts']}.log")
+        # the settings given for a job win over the ones of the worker, for example its proxy
+        job_settings = {**{name: job['instance'] for name in INSTANCE_SETTINGS}, **settings, **job['settings']}
+        start = time.time()
+        try:
+            process = context.Process(target=_run_job, args=(job_settings, log_path), daemon=True)
+            process.start()
+        except Exception as e:
+            # the job is released right away instead of staying leased until its lease runs out
+            error = f'the update could not be started: {e}'
+        else:
+            queue.renew(job['id'], worker, log_path)
+            while process.is_alive():
+                process.join(HEARTBEAT_SECONDS)
+                if process.is_alive() and not queue.renew(job['id'], worker):
+                    process.terminate()
+                    process.join()
+            error = None if process.exitcode == 0 else f'the update exited with code {process.exitcode}, see {log_path}'
+        state = queue.finish(job['id'], worker, error)
+        seconds = time.time() - start
+        with print_lock:
+            if state == 'done':
+                print(f"✅ {job['instance']} is up to date ({seconds:.1f} s), {_progress(queue)}")
+            elif state == 'queued':
+                print(f"⚠️  {job['instance']} failed (attempt {job['attempts']}/{job['max_attempts']}), it is tried again later, {_progress(queue)}")
+            elif state == 'failed':
+                print(f"❌ {job['instance']} failed, see {log_path}, {_progress(queue)}")
+            else:
+                print(f"⚠️  {job['instance']} was taken over by another worker, {_progress(queue)}")
+
+
+def work(queue, workers=2, proxy_url=None):
+    """
+    Runs the queued jobs with a number of parallel worker processes until the queue is empty.
+
+    Args:
+        queue (FleetQueue): The job queue.
+        workers (int, optional): How many instances are updated at the same time. Defaults to 2.
+        proxy_url (str, optional): The API base of a caching proxy the jobs use, so the fleet
+            fetches every lookup and download from Modrinth only once. Defaults to None.
+    """
+    log_folder = os.path.join(os.path.dirname(os.path.abspath(queue.path)), 'fleet-logs')
+    if not os.path.exists(log_folder):
+        os.makedirs(log_folder)
+    settings = {'MODRINTH_API_BASE': proxy_url} if proxy_url else {}
+    print_lock = threading.Lock()
+    print(f'🚚 Working on the fleet queue with {workers} workers, {_progress(queue)}')
+    threads = []
+    for slot in range(workers):
+        worker = f'{socket.gethostname()}-{os.getpid()}-{slot}'
+        thread = threading.Thread(target=_work, args=(queue, worker, log_folder, settings, print_lock), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    print(f'🏁 The fleet queue is empty, {_progress(queue)}')
+
+
+def print_jobs(queue):
+    """
+    Prints the state of every job of the fleet.
+    """
+    icons = {'queued': '⏳', 'running': '🔄', 'done': '✅', 'failed': '❌'}
+    for job in queue.jobs():
+        line = f"{icons.get(job['state'], '?')} {job['instance']}: {job['state']}, attempt {job['attempts']}/{job['max_attempts']}"
+        if job['state'] == 'running':
+            line += f", worker {job['worker']}"
+        if job['error']:
+            line += f", {job['error']}"
+        print(line)
+    print(_progress(queue))
+
+
+def _parse_settings(values):
+    settings = {}
+    for value in values or ():
+        name, separator, setting = value.partition('=')
+        if not separator:
+            raise argparse.ArgumentTypeError(f'{value} is not a KEY=VALUE setting')
+        settings[name] = setting
+    return settings
+
+
+def main(argv=None):
+    """
+    Command line entry point of the fleet runner: `python -m modrinth_updater.fleet <command>`.
+    """
+    from modrinth_updater.config import env_fleet_queue_path, env_fleet_workers, env_proxy_host, env_proxy_port
+
+    parser = argparse.ArgumentParser(prog='python -m modrinth_updater.fleet', description='Update many instances from a shared job queue.')
+    parser.add_argument('--queue', default=env_fleet_queue_path, help='the path of the queue database, share it to work on several machines')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    add_parser = subparsers.add_parser('add', help='queue the update of instances')
+    add_parser.add_argument('instances', nargs='+', help='the Minecraft folders of the instances')
+    add_parser.add_argument('--set', action='append', metavar='KEY=VALUE', help='a .env setting for these instances, can be repeated')
+    add_parser.add_argument('--max-attempts', type=int, default=3, help='how often an update is tried, defaults to 3')
+    work_parser = subparsers.add_parser('work', help='run the queued updates until the queue is empty')
+    work_parser.add_argument('--workers', type=int, default=int(env_fleet_workers), help='how many instances are updated at the same time')
+    proxy_group = work_parser.add_mutually_exclusive_group()
+    proxy_group.add_argument('--proxy', metavar='URL', help='the API base of a caching proxy the updates use, for example http://proxy:8080/v2')
+    proxy_group.add_argument('--start-proxy', action='store_true', help='start a caching proxy for the updates of this worker')
+    subparsers.add_parser('status', help='show the jobs of the fleet')
+    subparsers.add_parser('retry', help='queue the failed jobs again')
+    args = parser.parse_args(argv)
+
+    queue = FleetQueue(args.queue)
+    if args.command == 'add':
+        try:
+            settings = _parse_settings(args.set)
+        except argparse.ArgumentTypeError as e:
+            parser.error(str(e))
+        for instance in args.instances:
+            instance = os.path.abspath(instance)
+            if queue.add(instance, settings, args.max_attempts) is None:
+                print(f'⏳ {instance} is already queued.')
+            else:
+                print(f'✅ {instance} is queued.')
+    elif args.command == 'work':
+        proxy_url = args.proxy
+        if args.start_proxy:
+            from modrinth_updater import proxy
+            proxy.start(env_proxy_host, env_proxy_port)
+            proxy_url = f'http://127.0.0.1:{env_proxy_port}/v2'
+            print(f'🌐 The updates share the caching proxy on {proxy_url}')
+        work(queue, args.workers, proxy_url)
+        return 1 if queue.counts()['failed'] else 0
+    elif args.command == 'status':
+        print_jobs(queue)
+        counts = queue.counts()
+        return 1 if counts['failed'] else 0
+    elif args.command == 'retry':
+        print(f'✅ {queue.requeue_failed()} failed jobs are queued again.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
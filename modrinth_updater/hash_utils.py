@@ -1,24 +1,246 @@
+import os
 import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from modrinth_updater import state_db, metrics
+
+# one reusable read buffer per thread, large enough that hashing is limited by the disk
+BUFFER_SIZE = 1024 * 1024
+
+_local = threading.local()
+
+# SHA1 hashes by file path, valid while the size, mtime and inode of the file stay the same,
+# kept in the 'files' table of the state database
+_hash_cache = None
+_hash_cache_dirty = False
+_hash_cache_lock = threading.Lock()
+
+
+class HashError(Exception):
+    """
+    Raised when a file cannot be read for hashing.
+    """
+
+    def __init__(self, file_path, error):
+        super().__init__(f'Error calculating the hash of {file_path}: {error}')
+        self.file_path = file_path
+        self.error = error
+
+
+def _get_buffer():
+    """
+    Returns the read buffer of the current thread, so no new bytes object is allocated per chunk.
+
+    Returns:
+        memoryview: A view over the reusable buffer.
+    """
+    view = getattr(_local, 'view', None)
+    if view is None:
+        view = _local.view = memoryview(bytearray(BUFFER_SIZE))
+    return view
+
+
+def hash_file(file_path, algorithms=('sha1',)):
+    """
+    Calculates several hashes of a local file while reading it only once.
+
+    Args:
+        file_path (str): The path to the file to calculate the hashes for.
+        algorithms (tuple, optional): The hashlib algorithm names. Defaults to ('sha1',).
+
+    Returns:
+        dict: The hex digest of the file for every algorithm.
+
+    Raises:
+        HashError: If the file could not be read.
+    """
+    digests = [hashlib.new(algorithm) for algorithm in algorithms]
+    view = _get_buffer()
+    try:
+        with open(file_path, 'rb', buffering=0) as f:
+            while True:
+                size = f.readinto(view)
+                if not size:
+                    break
+                chunk = view[:size]
+                for digest in digests:
+                    digest.update(chunk)
+    except OSError as e:
+        raise HashError(file_path, e) from e
+    return {algorithm: digest.hexdigest() for algorithm, digest in zip(algorithms, digests)}
+
+
+def hash_files(file_paths, algorithms=('sha1',), max_workers=None):
+    """
+    Calculates the hashes of many files in parallel.
+
+    hashlib releases the GIL while hashing large chunks, so the files are hashed on every core.
+    Files which cannot be read are reported and left out of the result.
+
+    Args:
+        file_paths (list): The paths to the files to calculate the hashes for.
+        algorithms (tuple, optional): The hashlib algorithm names. Defaults to ('sha1',).
+        max_workers (int, optional): The number of hashing threads. Defaults to the number of CPUs.
+
+    Returns:
+        dict: The hex digests by algorithm for every readable file path.
+    """
+    file_paths = list(file_paths)
+    if len(file_paths) < 2:
+        max_workers = 1
+    results = {}
+
+    def hash_one(file_path):
+        try:
+            return file_path, hash_file(file_path, algorithms)
+        except HashError as e:
+            print(f'⚠️  {e}')
+            return file_path, None
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        for file_path, digests in executor.map(hash_one, file_paths):
+            if digests is not None:
+                results[file_path] = digests
+    return results
+
+
+def _load_hash_cache():
+    """
+    Returns the hash cache loaded from the state database.
+
+    Returns:
+        dict: The cached hash and stat data by file path.
+    """
+    global _hash_cache
+    if _hash_cache is None:
+        _hash_cache = state_db.load_hashes()
+    return _hash_cache
+
+
+def save_hash_cache():
+    """
+    Writes the hash cache to the state database if it changed since it was loaded.
+    """
+    global _hash_cache_dirty
+    if not _hash_cache_dirty:
+        return
+    with _hash_cache_lock:
+        state_db.save_hashes(_hash_cache)
+        _hash_cache_dirty = False
+
+
+def _remember_hash(file_path, size, mtime_ns, inode, sha1_hash):
+    """
+    Stores the SHA1 hash of a file together with the stat data it is valid for.
+    """
+    global _hash_cache_dirty
+    with _hash_cache_lock:
+        _load_hash_cache()[file_path] = {'size': size, 'mtime_ns': mtime_ns, 'inode': inode, 'sha1': sha1_hash}
+        _hash_cache_dirty = True
+
+
+def _same_inode(cached_inode, inode):
+    # `os.scandir` reports inode 0 on Windows while `os.stat` reports the real one, 0 means unknown
+    return not cached_inode or not inode or cached_inode == inode
+
+
+def cached_sha1_hash(file_path, size, mtime_ns, inode):
+    """
+    Returns the cached SHA1 hash of a file if the file did not change since it was hashed.
+
+    Args:
+        file_path (str): The path to the file.
+        size (int): The current size of the file.
+        mtime_ns (int): The current modification time of the file in nanoseconds.
+        inode (int): The current inode of the file, 0 if it is unknown.
+
+    Returns:
+        str or None: The cached SHA1 hash, or None if the file is new or changed.
+    """
+    cached = _load_hash_cache().get(file_path)
+    if cached and cached['size'] == size and cached['mtime_ns'] == mtime_ns and _same_inode(cached['inode'], inode):
+        return cached['sha1']
+    return None
+
+
+def changed_entries(entries):
+    """
+    Returns the scanned files which are new or changed since they were last hashed.
+
+    Args:
+        entries (list): The `ScanEntry` items returned by the directory scanner.
+
+    Returns:
+        list: The entries without a valid cached hash.
+    """
+    return [e for e in entries if cached_sha1_hash(e.path, e.size, e.mtime_ns, e.inode) is None]
+
+
+def hash_entries(entries, prune=False):
+    """
+    Returns the SHA1 hash of every scanned file, hashing only the new and changed files in parallel.
+
+    The stat data of the scan is reused, so unchanged files cost no extra system call.
+
+    Args:
+        entries (list): The `ScanEntry` items returned by the directory scanner.
+        prune (bool, optional): If True, cached hashes of files which are not in `entries` are dropped. Defaults to False.
+
+    Returns:
+        dict: The SHA1 hash by file path.
+    """
+    global _hash_cache_dirty
+    entries = list(entries)
+    changed = {e.path: e for e in changed_entries(entries)}
+    if changed:
+        # a moved file keeps its inode, size and mtime, so its hash is reused under the new path,
+        # without a known inode (Windows) the size and mtime alone could match a different file
+        by_stat = {(c['inode'], c['size'], c['mtime_ns']): c['sha1'] for c in _load_hash_cache().values() if c['inode']}
+        for entry in list(changed.values()):
+            sha1_hash = by_stat.get((entry.inode, entry.size, entry.mtime_ns)) if entry.inode else None
+            if sha1_hash is not None:
+                _remember_hash(entry.path, entry.size, entry.mtime_ns, entry.inode, sha1_hash)
+                del changed[entry.path]
+    metrics.CACHE_HITS.inc(len(entries) - len(changed), cache='hashes')
+    metrics.CACHE_MISSES.inc(len(changed), cache='hashes')
+    for file_path, digests in hash_files(list(changed)).items():
+        entry = changed[file_path]
+        _remember_hash(file_path, entry.size, entry.mtime_ns, entry.inode, digests['sha1'])
+    cache = _load_hash_cache()
+    if prune:
+        paths = {e.path for e in entries}
+        with _hash_cache_lock:
+            for file_path in [p for p in cache if p not in paths]:
+                del cache[file_path]
+                _hash_cache_dirty = True
+    return {e.path: cache[e.path]['sha1'] for e in entries if e.path in cache}
+
 
 def get_sha1_hash(file_path):
     """
     Calculates and returns the SHA1 hash of a local file.
 
+    The hash is taken from the hash cache when the file did not change since it was last hashed.
+
     Args:
         file_path (str): The path to the file to calculate the hash for.
 
     Returns:
-        str: The SHA1 hash of the file, or an error message if the file could not be read.
+        str: The SHA1 hash of the file.
+
+    Raises:
+        HashError: If the file could not be read.
     """
-    sha1_hash = hashlib.sha1()
     try:
-        with open(file_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b''):
-                sha1_hash.update(chunk)
-        return sha1_hash.hexdigest()
-    except Exception as e:
-        error = (f'Error calculating SHA1 for {file_path}: {e}')
-        return error
+        stat = os.stat(file_path)
+    except OSError as e:
+        raise HashError(file_path, e) from e
+    sha1_hash = cached_sha1_hash(file_path, stat.st_size, stat.st_mtime_ns, stat.st_ino)
+    if sha1_hash is None:
+        sha1_hash = hash_file(file_path, ('sha1',))['sha1']
+        _remember_hash(file_path, stat.st_size, stat.st_mtime_ns, stat.st_ino, sha1_hash)
+    return sha1_hash
+
 
 def get_sha256_hash(file_path):
     """
@@ -28,14 +250,9 @@ def get_sha256_hash(file_path):
         file_path (str): The path to the file to calculate the hash for.
 
     Returns:
-        str: The SHA256 hash of the file, or an error message if the file could not be read.
+        str: The SHA256 hash of the file.
+
+    Raises:
+        HashError: If the file could not be read.
     """
-    sha256_hash = hashlib.sha256()
-    try:
-        with open(file_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b''):
-                sha256_hash.update(chunk)
-        return sha256_hash.hexdigest()
-    except Exception as e:
-        error = (f'Error calculating SHA256 for {file_path}: {e}')
-        return error
+    return hash_file(file_path, ('sha256',))['sha256']
@@ -0,0 +1,158 @@
+import os
+import time
+import threading
+
+# Counters, gauges and histograms in the Prometheus text format, without a client library.
+# The updater writes them to a textfile for the node_exporter textfile collector after every run
+# (METRICS_TEXTFILE), and the caching proxy serves its own metrics under '/metrics'.
+
+_lock = threading.Lock()
+_registry = []
+
+# upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Metric:
+    """
+    Base class of the metrics, one value per label combination.
+    """
+    kind = 'untyped'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        _registry.append(self)
+
+    def reset(self):
+        with _lock:
+            self._values.clear()
+
+    def _samples(self):
+        return [(self.name, key, (), value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        with _lock:
+            samples = self._samples()
+        for name, key, extra, value in samples:
+            lines.append(f'{name}{_format_labels(key, extra)} {value!r}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """
+    A value which only goes up, for example the number of downloaded bytes.
+    """
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+
+class Gauge(Metric):
+    """
+    A value which is set, for example the duration of the last run of a stage.
+    """
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with _lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram(Metric):
+    """
+    The distribution of observed values in cumulative buckets, for example the API latency.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with _lock:
+            counts, total, count = self._values.get(key, ((0,) * len(self.buckets), 0.0, 0))
+            counts = tuple(c + 1 if value <= bound else c for c, bound in zip(counts, self.buckets))
+            self._values[key] = (counts, total + value, count + 1)
+
+    def _samples(self):
+        samples = []
+        for key, (counts, total, count) in self._values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                samples.append((f'{self.name}_bucket', key, (('le', f'{bound:g}'),), bucket_count))
+            samples.append((f'{self.name}_bucket', key, (('le', '+Inf'),), count))
+            samples.append((f'{self.name}_sum', key, (), total))
+            samples.append((f'{self.name}_count', key, (), count))
+        return samples
+
+
+FILES_CHECKED = Counter('modrinth_updater_files_checked_total', 'Files checked for updates against Modrinth.')
+UPDATES_APPLIED = Counter('modrinth_updater_updates_applied_total', 'Updated files swapped into the instance.')
+FILES_PARKED = Counter('modrinth_updater_files_parked_total', 'Files moved to a wait_for_update folder.')
+API_REQUESTS = Counter('modrinth_updater_api_requests_total', 'Requests sent to the Modrinth API by answer status.')
+API_LATENCY = Histogram('modrinth_updater_api_request_duration_seconds', 'Duration of the Modrinth API requests.')
+RATE_LIMIT_WAITS = Counter('modrinth_updater_rate_limit_waits_total', 'Waits caused by rate limited Modrinth API answers.')
+RATE_LIMIT_WAIT_SECONDS = Counter('modrinth_updater_rate_limit_wait_seconds_total', 'Time spent waiting for the Modrinth API rate limit.')
+DOWNLOADS = Counter('modrinth_updater_downloads_total', 'Downloaded files.')
+BYTES_DOWNLOADED = Counter('modrinth_updater_downloaded_bytes_total', 'Downloaded bytes.')
+CACHE_HITS = Counter('modrinth_updater_cache_hits_total', 'Lookups answered from a local cache.')
+CACHE_MISSES = Counter('modrinth_updater_cache_misses_total', 'Lookups which missed a local cache.')
+STAGE_DURATION = Gauge('modrinth_updater_stage_duration_seconds', 'Duration of the pipeline stages of the last run.')
+LAST_RUN = Gauge('modrinth_updater_last_run_timestamp_seconds', 'End time of the last run.')
+
+
+def record_stage(stage, seconds):
+    """
+    Records the duration of a pipeline stage, registered with `modrinth_updater.profiling.subscribe`.
+    """
+    STAGE_DURATION.set(seconds, stage=stage)
+
+
+def render():
+    """
+    Returns every metric in the Prometheus text format.
+
+    Returns:
+        str: The metrics, ready to be served or written to a textfile.
+    """
+    return '\n'.join(metric.render() for metric in _registry) + '\n'
+
+
+def write_textfile(path):
+    """
+    Writes every metric to a file for the node_exporter textfile collector.
+
+    The file is replaced atomically, so the collector never reads a half written file.
+
+    Args:
+        path (str): The path of the '.prom' file.
+    """
+    LAST_RUN.set(time.time())
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write(render())
+    os.replace(temp_path, path)
@@ -0,0 +1,359 @@
+import os
+import sys
+import json
+import shutil
+import sqlite3
+import argparse
+import requests
+from http import HTTPStatus
+from modrinth_updater.config import MODRINTH_API_BASE, env_offline_mirror_path
+from modrinth_updater.hash_utils import hash_file, hash_files
+from modrinth_updater.scanner import scan_managed_folders
+
+MIRROR_DATABASE = os.path.join(env_offline_mirror_path, 'mirror.db')
+MIRROR_FILES_FOLDER = os.path.join(env_offline_mirror_path, 'files')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS game_versions (
+    version TEXT PRIMARY KEY,
+    version_type TEXT NOT NULL,
+    date TEXT,
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS projects (
+    id TEXT PRIMARY KEY,
+    slug TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions (
+    id TEXT PRIMARY KEY,
+    project_id TEXT NOT NULL,
+    date_published TEXT,
+    game_versions TEXT NOT NULL,
+    loaders TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    sha1 TEXT PRIMARY KEY,
+    sha512 TEXT,
+    version_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    url TEXT NOT NULL,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS versions_project ON versions (project_id, date_published);
+CREATE INDEX IF NOT EXISTS files_url ON files (url);
+"""
+
+_connection = None
+
+
+class MirrorResponse:
+    """
+    A minimal stand-in for `requests.Response`, so the services handle answers from the mirror
+    exactly like answers from Modrinth.
+    """
+
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self._data = data
+        self.text = json.dumps(data) if data is not None else 'Not found in the offline mirror'
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        if self.status_code >= HTTPStatus.BAD_REQUEST:
+            raise requests.exceptions.HTTPError(f'{self.status_code}: {self.text}', response=self)
+
+
+def connect():
+    """
+    Opens the mirror database, creating the tables when the mirror is new.
+
+    Returns:
+        sqlite3.Connection: The connection to the mirror database.
+    """
+    global _connection
+    if _connection is None:
+        if not os.path.exists(env_offline_mirror_path):
+            os.makedirs(env_offline_mirror_path)
+        _connection = sqlite3.connect(MIRROR_DATABASE, check_same_thread=False)
+        _connection.executescript(SCHEMA)
+    return _connection
+
+
+def get_version_file(sha1_hash):
+    """
+    Looks up the version a file belongs to, like the `/version_file/{hash}` endpoint.
+
+    Args:
+        sha1_hash (str): The SHA1 hash of the file.
+
+    Returns:
+        MirrorResponse: The version with status 200, or status 404 if the hash is not in the mirror.
+    """
+    row = connect().execute(
+        'SELECT versions.data FROM files JOIN versions ON versions.id = files.version_id WHERE files.sha1 = ?',
+        (sha1_hash,)
+    ).fetchone()
+    if row is None:
+        return MirrorResponse(HTTPStatus.NOT_FOUND)
+    return MirrorResponse(HTTPStatus.OK, json.loads(row[0]))
+
+
+def get_version_file_update(sha1_hash, game_versions=None, loaders=None):
+    """
+    Looks up the newest version of the project a file belongs to, like the `/version_file/{hash}/update` endpoint.
+
+    Args:
+        sha1_hash (str): The SHA1 hash of the file.
+        game_versions (list, optional): Only versions supporting one of these game versions are returned. Defaults to None.
+        loaders (list, optional): Only versions supporting one of these loaders are returned. Defaults to None.
+
+    Returns:
+        MirrorResponse: The newest matching version with status 200, or status 404 if there is none.
+    """
+    query = (
+        'SELECT data FROM versions WHERE project_id = ('
+        'SELECT versions.project_id FROM files JOIN versions ON versions.id = files.version_id WHERE files.sha1 = ?)'
+    )
+    params = [sha1_hash]
+    for column, values in (('game_versions', game_versions), ('loaders', loaders)):
+        if values:
+            query += f' AND EXISTS (SELECT 1 FROM json_each(versions.{column}) WHERE value IN ({",".join("?" * len(values))}))'
+            params.extend(values)
+    query += ' ORDER BY date_published DESC LIMIT 1'
+    row = connect().execute(query, params).fetchone()
+    if row is None:
+        return MirrorResponse(HTTPStatus.NOT_FOUND)
+    return MirrorResponse(HTTPStatus.OK, json.loads(row[0]))
+
+
+def get_projects(project_ids):
+    """
+    Looks up the metadata of many projects, like the `/projects` endpoint.
+
+    Args:
+        project_ids (list): The project ids or slugs.
+
+    Returns:
+        list: The projects found in the mirror.
+    """
+    if not project_ids:
+        return []
+    marks = ','.join('?' * len(project_ids))
+    rows = connect().execute(
+        f'SELECT data FROM projects WHERE id IN ({marks}) OR slug IN ({marks})',
+        list(project_ids) * 2
+    ).fetchall()
+    return [json.loads(row[0]) for row in rows]
+
+
+def get_game_versions():
+    """
+    Returns the game versions stored in the mirror, like the `/tag/game_version` endpoint.
+
+    Returns:
+        list: The game versions from the newest to the oldest.
+    """
+    rows = connect().execute('SELECT version, version_type, date FROM game_versions ORDER BY position').fetchall()
+    return [{'version': version, 'version_type': version_type, 'date': date} for version, version_type, date in rows]
+
+
+def find_file(url):
+    """
+    Finds the local copy of a download in the mirror.
+
+    Files downloaded by `sync_mirror` are stored by their SHA1 hash. Files copied into the
+    mirror 'files' folder by hand are found by their file name.
+
+    Args:
+        url (str): The download URL of the file.
+
+    Returns:
+        str or None: The path of the local copy, or None if the mirror does not have the file.
+    """
+    row = connect().execute('SELECT sha1, filename FROM files WHERE url = ?', (url,)).fetchone()
+    candidates = []
+    if row is not None:
+        candidates.append(os.path.join(MIRROR_FILES_FOLDER, row[0][:2], row[0]))
+        candidates.append(os.path.join(MIRROR_FILES_FOLDER, row[1]))
+    candidates.append(os.path.join(MIRROR_FILES_FOLDER, requests.utils.unquote(os.path.basename(url))))
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def link_or_copy(source, destination):
+    """
+    Places a file at the destination with a hardlink, falling back to a copy across file systems.
+
+    Args:
+        source (str): The path of the existing file.
+        destination (str): The path of the new file.
+    """
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+def _store_versions(connection, versions):
+    """
+    Stores versions and their files in the mirror.
+
+    Args:
+        connection (sqlite3.Connection): The connection to the mirror database.
+        versions (list): The versions returned by the Modrinth API.
+    """
+    for version in versions:
+        connection.execute(
+            'INSERT OR REPLACE INTO versions (id, project_id, date_published, game_versions, loaders, data) VALUES (?, ?, ?, ?, ?, ?)',
+            (version['id'], version['project_id'], version.get('date_published'),
+             json.dumps(version.get('game_versions', [])), json.dumps(version.get('loaders', [])), json.dumps(version))
+        )
+        for file in version.get('files', []):
+            connection.execute(
+                'INSERT OR REPLACE INTO files (sha1, sha512, version_id, filename, url, size) VALUES (?, ?, ?, ?, ?, ?)',
+                (file['hashes']['sha1'], file['hashes'].get('sha512'), version['id'], file['filename'], file['url'], file.get('size'))
+            )
+
+
+def _download_to_mirror(url, sha1_hash):
+    """
+    Downloads a file into the mirror 'files' folder, stored by its SHA1 hash.
+
+    Args:
+        url (str): The download URL of the file.
+        sha1_hash (str): The expected SHA1 hash of the file.
+
+    Returns:
+        bool: True if the file is in the mirror after the call.
+    """
+    # modrinth_api imports the mirror, so its request helper is imported on use
+    from modrinth_updater.modrinth_api import _send
+
+    target_folder = os.path.join(MIRROR_FILES_FOLDER, sha1_hash[:2])
+    target_path = os.path.join(target_folder, sha1_hash)
+    if os.path.exists(target_path):
+        return True
+    if not os.path.exists(target_folder):
+        os.makedirs(target_folder)
+    temp_path = f'{target_path}.part'
+    response = _send('GET', url, 'mirror_file', stream=True, timeout=15)
+    response.raise_for_status()
+    with open(temp_path, 'wb') as file:
+        for chunk in response.iter_content(chunk_size=1024 * 1024):
+            file.write(chunk)
+    if hash_file(temp_path)['sha1'] != sha1_hash:
+        os.remove(temp_path)
+        print(f'⚠️  The downloaded file does not match its hash: {url}')
+        return False
+    os.replace(temp_path, target_path)
+    return True
+
+
+def sync_mirror(hashes=None, download=False, game_versions=None, loaders=None):
+    """
+    Exports the metadata of every installed project from Modrinth into the local mirror.
+
+    The installed and parked files are resolved with one bulk `/version_files` request, the projects
+    with bulk `/projects` requests of `PROJECTS_CHUNK_SIZE` ids, and every version of each project is stored, so later update
+    checks can be answered offline. With `download` the primary file of the newest matching
+    version of each project is stored in the mirror as well.
+
+    Args:
+        hashes (list, optional): The SHA1 hashes to export. Defaults to None, which exports every installed and parked file.
+        download (bool, optional): If True, the update files are downloaded into the mirror. Defaults to False.
+        game_versions (list, optional): The game versions used to select the downloaded files. Defaults to None.
+        loaders (list, optional): The loaders used to select the downloaded files. Defaults to None.
+
+    Returns:
+        tuple: The number of projects whose versions were stored in the mirror and the number of projects which failed.
+    """
+    # the catalogue and modrinth_api import the mirror, so they are imported on use
+    from modrinth_updater.catalogue import PROJECTS_CHUNK_SIZE
+    from modrinth_updater.modrinth_api import _send
+
+    if hashes is None:
+        # the parked files are exported too, so they can be re-checked offline
+        paths = [entry.path for folders in scan_managed_folders().values() for entry in folders['installed'] + folders['wait_for_update']]
+        hashes = [digests['sha1'] for digests in hash_files(paths).values()]
+    connection = connect()
+
+    response = _send('GET', f'{MODRINTH_API_BASE}/tag/game_version', 'game_version', timeout=15)
+    response.raise_for_status()
+    connection.execute('DELETE FROM game_versions')
+    connection.executemany(
+        'INSERT INTO game_versions (version, version_type, date, position) VALUES (?, ?, ?, ?)',
+        [(v['version'], v['version_type'], v.get('date'), i) for i, v in enumerate(response.json())]
+    )
+
+    response = _send('POST', f'{MODRINTH_API_BASE}/version_files', 'version_files', json={'hashes': hashes, 'algorithm': 'sha1'}, timeout=60)
+    response.raise_for_status()
+    project_ids = sorted({version['project_id'] for version in response.json().values()})
+    if not project_ids:
+        connection.commit()
+        return 0, 0
+
+    for start in range(0, len(project_ids), PROJECTS_CHUNK_SIZE):
+        chunk = project_ids[start:start + PROJECTS_CHUNK_SIZE]
+        response = _send('GET', f'{MODRINTH_API_BASE}/projects', 'projects', params={'ids': json.dumps(chunk)}, timeout=60)
+        response.raise_for_status()
+        for project in response.json():
+            connection.execute(
+                'INSERT OR REPLACE INTO projects (id, slug, data) VALUES (?, ?, ?)',
+                (project['id'], project.get('slug'), json.dumps(project))
+            )
+
+    exported = 0
+    for project_id in project_ids:
+        response = _send('GET', f'{MODRINTH_API_BASE}/project/{project_id}/version', 'project_versions', timeout=60)
+        if response.status_code != HTTPStatus.OK:
+            print(f'⚠️  Cannot export the versions of the project {project_id}: {response.status_code}')
+            continue
+        _store_versions(connection, response.json())
+        exported += 1
+    connection.commit()
+
+    if download:
+        for sha1_hash in hashes:
+            update = get_version_file_update(sha1_hash, game_versions, loaders)
+            if update.status_code != HTTPStatus.OK:
+                continue
+            files = update.json()['files']
+            primary = next((f for f in files if f.get('primary')), files[0])
+            _download_to_mirror(primary['url'], primary['hashes']['sha1'])
+    return exported, len(project_ids) - exported
+
+
+def main(argv=None):
+    """
+    Command line entry point of the mirror: `python -m modrinth_updater.mirror sync`.
+    """
+    parser = argparse.ArgumentParser(prog='python -m modrinth_updater.mirror', description='Manage the offline metadata mirror.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    sync = subparsers.add_parser('sync', help='export the metadata of every installed project into the mirror')
+    sync.add_argument('--download', action='store_true', help='also download the newest matching file of every project')
+    sync.add_argument('--game-version', action='append', dest='game_versions', help='game version used to select the downloaded files')
+    sync.add_argument('--loader', action='append', dest='loaders', help='loader used to select the downloaded files')
+    args = parser.parse_args(argv)
+    if args.command == 'sync':
+        try:
+            count, failed = sync_mirror(download=args.download, game_versions=args.game_versions, loaders=args.loaders)
+        except requests.exceptions.RequestException as e:
+            print(f'⚠️ An error occurred: {e}')
+            return 1
+        if failed:
+            print(f'⚠️  {count} projects are stored in the offline mirror, {failed} could not be exported: {env_offline_mirror_path}')
+            return 1
+        print(f'✅ {count} projects are stored in the offline mirror: {env_offline_mirror_path}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import json
+import codecs
+
+
+class Record:
+    """
+    Base class of the compact metadata records.
+
+    The records use `__slots__` and keep only the fields the updater needs, so thousands of
+    versions from bulk answers take a fraction of the memory of the raw JSON dicts.
+    """
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        for name, value in zip(self.__slots__, args):
+            setattr(self, name, value)
+        for name in self.__slots__[len(args):]:
+            setattr(self, name, kwargs.get(name))
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, n) == getattr(other, n) for n in self.__slots__)
+
+    def __repr__(self):
+        fields = ', '.join(f'{n}={getattr(self, n)!r}' for n in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+
+class VersionFile(Record):
+    """
+    A downloadable file of a Modrinth version.
+    """
+    __slots__ = ('url', 'filename', 'sha1', 'sha512', 'size', 'primary')
+
+    @classmethod
+    def from_json(cls, data):
+        hashes = data['hashes']
+        return cls(data['url'], data['filename'], hashes['sha1'], hashes.get('sha512'), data.get('size'), data.get('primary', False))
+
+
+class Dependency(Record):
+    """
+    A dependency of a Modrinth version.
+    """
+    __slots__ = ('project_id', 'version_id', 'dependency_type')
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data.get('project_id'), data.get('version_id'), data.get('dependency_type'))
+
+
+class Version(Record):
+    """
+    A version of a Modrinth project.
+    """
+    __slots__ = ('id', 'project_id', 'name', 'version_number', 'game_versions', 'loaders', 'files', 'dependencies')
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            data['id'],
+            data['project_id'],
+            data.get('name'),
+            data.get('version_number'),
+            tuple(data.get('game_versions', ())),
+            tuple(data.get('loaders', ())),
+            tuple(VersionFile.from_json(f) for f in data.get('files', ())),
+            tuple(Dependency.from_json(d) for d in data.get('dependencies', ())),
+        )
+
+    @property
+    def primary_file(self):
+        """
+        Returns the primary file of the version, or the first file if none is marked as primary.
+        """
+        return next((f for f in self.files if f.primary), self.files[0] if self.files else None)
+
+
+class Project(Record):
+    """
+    A Modrinth project.
+    """
+    __slots__ = ('id', 'slug', 'title', 'project_type', 'game_versions', 'loaders')
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            data['id'],
+            data.get('slug'),
+            data.get('title'),
+            data.get('project_type'),
+            tuple(data.get('game_versions', ())),
+            tuple(data.get('loaders', ())),
+        )
+
+
+class LatestRelease(Record):
+    """
+    The newest Minecraft release a project supports, `game_version` is None if it supports no release.
+    """
+    __slots__ = ('project_id', 'slug', 'title', 'game_version', 'loaders')
+
+
+def iter_version_map(chunks):
+    """
+    Parses a `{hash: version}` answer of the bulk endpoints while it is downloaded.
+
+    Only one version is decoded at a time and turned into a `Version` record right away, so the
+    memory use stays flat however many hashes are in the answer.
+
+    Args:
+        chunks (iterable): The answer as byte chunks, for example `response.iter_content()`.
+
+    Yields:
+        tuple: The hash and the `Version` record of every entry.
+
+    Raises:
+        ValueError: If the answer is not a JSON object.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ''
+    position = 0
+    finished = False
+
+    def more():
+        nonlocal buffer, position
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError('Unexpected end of the bulk answer')
+        buffer = buffer[position:] + text_decoder.decode(chunk)
+        position = 0
+
+    def skip(characters):
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in characters:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            more()
+
+    def decode():
+        nonlocal position
+        while True:
+            try:
+                value, position = decoder.raw_decode(buffer, position)
+                return value
+            except json.JSONDecodeError:
+                more()
+
+    if skip(' \t\r\n') != '{':
+        raise ValueError('The bulk answer is not a JSON object')
+    position += 1
+    while not finished:
+        character = skip(' \t\r\n,')
+        if character == '}':
+            finished = True
+            continue
+        key = decode()
+        if skip(' \t\r\n') != ':':
+            raise ValueError('The bulk answer is not a JSON object')
+        position += 1
+        skip(' \t\r\n')
+        yield key, Version.from_json(decode())
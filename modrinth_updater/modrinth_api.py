@@ -1,59 +1,151 @@
 import os
+import time
 import requests
 from http import HTTPStatus
-from modrinth_updater.hash_utils import get_sha1_hash
+from modrinth_updater.config import MODRINTH_API_BASE, env_offline_mode, env_negative_cache_days
+from modrinth_updater import mirror, state_db, metrics
+from modrinth_updater.hash_utils import get_sha1_hash, HashError
 from modrinth_updater.file_utils import get_current_fabric_version, get_current_loader
+from modrinth_updater.catalogue import get_projects, newest_release
+from modrinth_updater.models import Version, LatestRelease, iter_version_map
+from modrinth_updater.fingerprint import identify
 
+# the longest wait for the rate limit before a request is sent again
+MAX_RATE_LIMIT_WAIT = 60
 
-MODRINTH_API_BASE = "https://api.modrinth.com/v2"
+
+def _send(method, url, endpoint, **kwargs):
+    """
+    Sends a request to the Modrinth API and records its latency and status in the metrics.
+
+    A rate limited answer is retried once after the wait announced by the 'X-Ratelimit-Reset' header.
+
+    Args:
+        method (str): The HTTP method.
+        url (str): The URL of the request.
+        endpoint (str): The name of the endpoint used as metrics label, for example 'version_file'.
+
+    Returns:
+        requests.Response: The answer.
+    """
+    for attempt in range(2):
+        start = time.perf_counter()
+        response = requests.request(method, url, **kwargs)
+        metrics.API_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+        metrics.API_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+        if response.status_code != HTTPStatus.TOO_MANY_REQUESTS or attempt:
+            return response
+        try:
+            wait = min(float(response.headers.get('X-Ratelimit-Reset', 1)), MAX_RATE_LIMIT_WAIT)
+        except ValueError:
+            wait = 1
+        print(f'⏳ The Modrinth API rate limit is reached, waiting {wait:.0f} seconds...')
+        metrics.RATE_LIMIT_WAITS.inc(endpoint=endpoint)
+        metrics.RATE_LIMIT_WAIT_SECONDS.inc(wait)
+        response.close()
+        time.sleep(wait)
+    return response
+
+def get_latest_releases(project_ids):
+    """
+    Retrieves the newest Minecraft release supported by many projects from the local project catalogue.
+
+    The missing and too old projects are downloaded with multi-id requests of up to 100 projects,
+    and the catalogue keeps the answers, so repeated questions cost no request.
+
+    Args:
+        project_ids (list): The project ids.
+
+    Returns:
+        dict: The `LatestRelease` by project id, projects Modrinth does not know are left out.
+    """
+    return {
+        project_id: LatestRelease(project_id, project['slug'], project['title'],
+                                  newest_release(project['game_versions']), tuple(project['loaders']))
+        for project_id, project in get_projects(project_ids).items()
+    }
 
 def get_latest_mod_versions(mod_project_id):
     """
-    Retrieves the latest version of a mod by sending a GET request to the Modrinth API with the provided project id.
+    Retrieves the newest Minecraft release supported by a mod from the local project catalogue.
+
+    Use `get_latest_releases` to look up many projects at once.
 
     Args:
         mod_project_id (str): The project id of the mod to retrieve the latest version for.
 
     Returns:
-        str or requests.Response: The latest version string of the mod, or an error message if the mod could not be found or an error occurred.
+        str or None: The newest release supported by the mod, or None if the mod could not be found.
+    """
+    latest = get_latest_releases([mod_project_id]).get(mod_project_id)
+    if latest is None:
+        print (f'❌ Cannot find the mod witht the project id: {mod_project_id}')
+        return None
+    return latest.game_version
+
+def _negative_cache_seconds():
+    """
+    Returns how long a file unknown to Modrinth is skipped before it is looked up again.
     """
-    url = f'{MODRINTH_API_BASE}/project/{mod_project_id}'
     try:
-        response = requests.get(url, timeout=15)
-        if response.status_code == HTTPStatus.OK:
-            data = response.json()
-            filtered_latest_mod_versions = [v for v in data['game_versions'] if 'w' not in v]
-            return filtered_latest_mod_versions[-1]
-        elif response.status_code == HTTPStatus.NOT_FOUND:
-            print (f'❌ Cannot find the mod witht the project id: {mod_project_id}')
-        else:
-            print(f'⚠️  Error: {response.status_code}')
-            return response
-    except requests.exceptions.Timeout:
-        print('The request timed out!')
-    except requests.exceptions.RequestException as e:
-        print(f'An error occurred: {e}')
+        return float(env_negative_cache_days) * 86400
+    except (TypeError, ValueError):
+        return 7 * 86400
+
+def is_negatively_cached(sha1_hash):
+    """
+    Checks if a file was unknown to Modrinth at its last lookup and the negative cache has not expired yet.
+
+    Args:
+        sha1_hash (str): The SHA1 hash of the file.
+
+    Returns:
+        bool: True if the file is skipped without a request.
+    """
+    unknown_since = state_db.unknown_since(sha1_hash)
+    return unknown_since is not None and time.time() - unknown_since < _negative_cache_seconds()
 
 def get_local_version(file_path):
     """
     Retrieves the version of a mod by sending a GET request to the Modrinth API with the provided file hash.
 
+    Files which Modrinth did not know at their last lookup are skipped without a request until the
+    negative cache expires (`NEGATIVE_CACHE_DAYS`).
+
     Args:
-        hashed_file (str): The SHA1 hash of the local mod file to retrieve the version for.
+        file_path (str): The path to the local mod file to retrieve the version for.
 
     Returns:
-        str or requests.Response: The version string of the mod, or an error message if the mod could not be found or an error occurred.
+        tuple: The game versions and the version number of the installed version, and the HTTP status of
+            the lookup. The lists are empty when the file is unknown, and the status is None if the file
+            could not be hashed or the request failed.
     """
-    hashed_file = get_sha1_hash(file_path)
     mod_name = os.path.basename(file_path)
+    try:
+        hashed_file = get_sha1_hash(file_path)
+    except HashError as e:
+        print(f'⚠️ {e}')
+        return [], [], None
+    if is_negatively_cached(hashed_file):
+        metrics.CACHE_HITS.inc(cache='unknown_files')
+        return [], [], HTTPStatus.NOT_FOUND
     url = f'{MODRINTH_API_BASE}/version_file/{hashed_file}'
     try:
-        response = requests.get(url, timeout=15)
+        if env_offline_mode == 'true':
+            response = mirror.get_version_file(hashed_file)
+        else:
+            response = _send('GET', url, 'version_file', timeout=15)
         if response.status_code == HTTPStatus.OK:
-            data = response.json()
-            return data['game_versions'], data['version_number'], response.status_code
+            version = Version.from_json(response.json())
+            state_db.record_file_version(hashed_file, version)
+            return list(version.game_versions), version.version_number, response.status_code
         elif response.status_code == HTTPStatus.NOT_FOUND:
-            print (f'⚠️  Cannot find the mod with the hash: {hashed_file}. Your mod file "{mod_name}" can be corrupted, donwload it again.')
+            state_db.record_file_version(hashed_file, None)
+            fingerprint = identify(file_path)
+            if fingerprint:
+                print(f"ℹ️  {mod_name} is not hosted on Modrinth, it is {fingerprint['name'] or fingerprint['mod_id']} {fingerprint['version'] or ''} for {fingerprint['loader']}. It is skipped for the next {env_negative_cache_days or 7} days.")
+            else:
+                print (f'⚠️  Cannot find the mod with the hash: {hashed_file}. Your mod file "{mod_name}" can be corrupted, donwload it again.')
             return [], [], response.status_code
         else:
             print(response.text)
@@ -73,13 +165,21 @@ def check_update(path, game_versions=None, loaders=None):
     Args:
         path (str): The path to the local mod file to check for updates.
         game_versions (str, optional): The current game version, or None to use the latest version.
-        loaders (str, optional): The current loader, or None to use the latest version.
+        loaders (str or list, optional): The loader or the loaders the update has to support, for example
+            ['iris', 'optifine'] for a shaderpack, or None to use the current loader.
 
     Returns:
-        tuple or None: A tuple containing the response from Modrinth, the current game version, the current loader, and the SHA1 hash of the file, or None if an error occurred.
+        tuple: The response from Modrinth, the checked game version and the checked loaders joined with '/'.
+            The response is None if the request could not be sent, and (None, game_versions, loaders)
+            with the arguments unchanged is returned if the file could not be hashed.
     """
 
-    sha1_hash = get_sha1_hash(path)
+    try:
+        sha1_hash = get_sha1_hash(path)
+    except HashError as e:
+        print(f'⚠️ {e}')
+        return None, game_versions, loaders
+    metrics.FILES_CHECKED.inc()
     url = f'{MODRINTH_API_BASE}/version_file/{sha1_hash}/update'
     headers = {
         'Content-Type': 'application/json'
@@ -92,11 +192,19 @@ def check_update(path, game_versions=None, loaders=None):
     else:
         loader_version = get_current_fabric_version()
     if loaders:
-        body['loaders'] = [loaders]
+        body['loaders'] = [loaders] if isinstance(loaders, str) else list(loaders)
+        loaders = '/'.join(body['loaders'])
     else:
         loaders = get_current_loader()
+    response = None
     try:
-        response = requests.post(url, json=body, headers=headers, timeout=15)
+        if env_offline_mode == 'true':
+            response = mirror.get_version_file_update(sha1_hash, body.get('game_versions'), body.get('loaders'))
+        else:
+            response = _send('POST', url, 'version_file_update', json=body, headers=headers, timeout=15)
+        if game_versions and response.status_code in (HTTPStatus.OK, HTTPStatus.NOT_FOUND):
+            version = Version.from_json(response.json()) if response.status_code == HTTPStatus.OK else None
+            state_db.record_latest_versions({sha1_hash: version}, loader_version, ','.join(body.get('loaders', ())) or None)
         response.raise_for_status()
         return response, loader_version, loaders
     except requests.exceptions.Timeout:
@@ -104,4 +212,102 @@ def check_update(path, game_versions=None, loaders=None):
         return response, loader_version, loaders
     except requests.exceptions.RequestException:
         print (f'❌ There is no update for {os.path.basename(path)} your loader is {loaders}-{game_versions}.')
-        return response, loader_version, loaders
\ No newline at end of file
+        return response, loader_version, loaders
+
+def _record_bulk_updates(hashes, updates, game_versions, loaders):
+    """
+    Records the answer of a bulk update check in the state database when it was made for one game version.
+    """
+    if game_versions and len(game_versions) == 1:
+        state_db.record_latest_versions(
+            {sha1_hash: updates.get(sha1_hash) for sha1_hash in hashes}, game_versions[0], ','.join(loaders) if loaders else None
+        )
+
+def _post_version_map(path, endpoint, body):
+    """
+    Sends a bulk request answered with a `{hash: version}` object and parses it while it is downloaded.
+
+    Returns:
+        dict or None: The `Version` records by SHA1 hash, or None if the request failed.
+    """
+    url = f'{MODRINTH_API_BASE}/{path}'
+    try:
+        with _send('POST', url, endpoint, json=body, timeout=30, stream=True) as response:
+            if response.status_code == HTTPStatus.OK:
+                return dict(iter_version_map(response.iter_content(chunk_size=64 * 1024)))
+            print(f'⚠️ Error: {response.status_code}')
+            print(response.text)
+            return None
+    except requests.exceptions.Timeout:
+        print('⚠️ The request timed out!')
+        return None
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f'⚠️ An error occurred: {e}')
+        return None
+
+def get_versions_bulk(hashes):
+    """
+    Looks up the versions many local files belong to with one POST request to the Modrinth API.
+
+    The answers are recorded in the state database, files Modrinth does not know are recorded as unknown.
+
+    Args:
+        hashes (list): The SHA1 hashes of the local files.
+
+    Returns:
+        dict or None: The `Version` by SHA1 hash, unknown files are left out, or None if the request failed.
+    """
+    if not hashes:
+        return {}
+    if env_offline_mode == 'true':
+        versions = {}
+        for sha1_hash in hashes:
+            response = mirror.get_version_file(sha1_hash)
+            if response.status_code == HTTPStatus.OK:
+                versions[sha1_hash] = Version.from_json(response.json())
+    else:
+        versions = _post_version_map('version_files', 'version_files', {'hashes': list(hashes), 'algorithm': 'sha1'})
+        if versions is None:
+            return None
+    for sha1_hash in hashes:
+        state_db.record_file_version(sha1_hash, versions.get(sha1_hash))
+    return versions
+
+def check_updates_bulk(hashes, game_versions=None, loaders=None, record=True):
+    """
+    Checks many local files for updates with one POST request to the Modrinth API.
+
+    The answer is parsed while it is downloaded and every entry is kept as a compact `Version` record.
+
+    Args:
+        hashes (list): The SHA1 hashes of the local files.
+        game_versions (list, optional): The game versions the updates have to support. Defaults to None.
+        loaders (list, optional): The loaders the updates have to support. Defaults to None.
+        record (bool, optional): If False, the answer is not stored as the latest versions in the state
+            database, for example when planning for another game version. Defaults to True.
+
+    Returns:
+        dict or None: The newest compatible `Version` by SHA1 hash, files without a compatible version are
+            left out, or None if the request failed.
+    """
+    if not hashes:
+        return {}
+    metrics.FILES_CHECKED.inc(len(hashes))
+    body = {'hashes': list(hashes), 'algorithm': 'sha1'}
+    if game_versions:
+        body['game_versions'] = list(game_versions)
+    if loaders:
+        body['loaders'] = list(loaders)
+    if env_offline_mode == 'true':
+        updates = {}
+        for sha1_hash in hashes:
+            response = mirror.get_version_file_update(sha1_hash, body.get('game_versions'), body.get('loaders'))
+            if response.status_code == HTTPStatus.OK:
+                updates[sha1_hash] = Version.from_json(response.json())
+    else:
+        updates = _post_version_map('version_files/update', 'version_files_update', body)
+        if updates is None:
+            return None
+    if record:
+        _record_bulk_updates(hashes, updates, game_versions, loaders)
+    return updates
@@ -0,0 +1,158 @@
+import sys
+import json
+import argparse
+from modrinth_updater.config import default_minecraft_path
+from modrinth_updater.file_utils import get_current_loader, get_content_loaders
+from modrinth_updater.scanner import scan_managed_folders
+from modrinth_updater.hash_utils import hash_entries, save_hash_cache
+from modrinth_updater.modrinth_api import get_versions_bulk, check_updates_bulk
+from modrinth_updater.catalogue import get_projects, get_version_type
+from modrinth_updater.profiling import format_bytes
+from modrinth_updater.updater import enabled_categories
+
+# the loaders `get_current_loader` detects, anything else it returns is an error message
+MOD_LOADERS = ('fabric', 'forge', 'neoforge', 'quilt')
+
+
+def _supports(project, game_version, loader):
+    """
+    Checks from the project metadata if a project has any version for the target.
+    """
+    if project is None or game_version not in project['game_versions']:
+        return False
+    return loader is None or project['project_type'] != 'mod' or loader in project['loaders']
+
+
+def plan(game_version, loader=None, path=default_minecraft_path):
+    """
+    Resolves every installed and parked file against a target game version and loader, without changing anything.
+
+    The current versions of the files, the newest versions for the target and the metadata of the
+    projects are fetched with bulk requests, one per category at most. A file is ready when its
+    project has a version for the target and every required dependency has one too, blocked when a
+    required dependency has none, and missing when its own project has none.
+
+    Args:
+        game_version (str): The target game version, for example '1.21.5'.
+        loader (str, optional): The target loader. Defaults to the loader of the current instance.
+        path (str, optional): The path to the Minecraft directory. Defaults to the global variable `default_minecraft_path`.
+
+    Returns:
+        dict or None: The 'game_version', the 'loader', lists of file dicts under the keys 'ready',
+            'blocked', 'missing' and 'unknown' and the total 'download_size' in bytes, or None if a request failed.
+    """
+    if loader is None:
+        loader = get_current_loader(path)
+        loader = loader if loader in MOD_LOADERS else None
+    scan = scan_managed_folders(path)
+    enabled = enabled_categories()
+    entries = {category: folders['installed'] + folders['wait_for_update'] for category, folders in scan.items() if enabled[category]}
+    hashes = hash_entries([entry for category_entries in entries.values() for entry in category_entries])
+    save_hash_cache()
+
+    current = get_versions_bulk(list(set(hashes.values())))
+    if current is None:
+        return None
+    files = []
+    for category, category_entries in entries.items():
+        known = [entry for entry in category_entries if hashes.get(entry.path) in current]
+        loaders = get_content_loaders(category, loader, path)
+        targets = check_updates_bulk(list({hashes[entry.path] for entry in known}), [game_version], loaders, record=False)
+        if targets is None:
+            return None
+        for entry in category_entries:
+            sha1_hash = hashes.get(entry.path)
+            installed = current.get(sha1_hash)
+            target = targets.get(sha1_hash)
+            primary = target.primary_file if target is not None else None
+            files.append({
+                'category': category,
+                'name': entry.name,
+                'path': entry.path,
+                'project_id': installed.project_id if installed is not None else None,
+                'installed': installed.version_number if installed is not None else None,
+                'target': target.version_number if target is not None else None,
+                'filename': primary.filename if primary else None,
+                # nothing is downloaded when the installed file already supports the target
+                'size': (primary.size or 0) if primary and all(file.sha1 != sha1_hash for file in target.files) else 0,
+                'dependencies': [dependency.project_id for dependency in target.dependencies
+                                 if dependency.dependency_type == 'required' and dependency.project_id] if target is not None else [],
+            })
+
+    project_ids = {file['project_id'] for file in files if file['project_id']}
+    dependency_ids = {dependency for file in files for dependency in file['dependencies']}
+    projects = get_projects(sorted(project_ids | dependency_ids))
+    ready_projects = {file['project_id'] for file in files if file['target'] is not None}
+
+    report = {'game_version': game_version, 'loader': loader, 'ready': [], 'blocked': [], 'missing': [], 'unknown': [], 'download_size': 0}
+    for file in files:
+        project = projects.get(file['project_id'], {})
+        file['title'] = project.get('title') or file['name']
+        if file['project_id'] is None:
+            report['unknown'].append(file)
+        elif file['target'] is None:
+            report['missing'].append(file)
+        else:
+            # a dependency which is not installed counts when the project metadata supports the target
+            file['missing_dependencies'] = [
+                (projects.get(dependency) or {}).get('title') or dependency for dependency in file['dependencies']
+                if dependency not in ready_projects and not _supports(projects.get(dependency), game_version, loader)
+            ]
+            if file['missing_dependencies']:
+                report['blocked'].append(file)
+            else:
+                report['ready'].append(file)
+                report['download_size'] += file['size']
+    return report
+
+
+def print_plan(report):
+    """
+    Prints a plan returned by `plan`.
+    """
+    target = f"{report['loader'] or 'any loader'}-{report['game_version']}"
+    print(f'🧭 Plan for {target}:')
+    for file in report['ready']:
+        size = f" ({format_bytes(file['size'])})" if file['size'] else ' (already compatible)'
+        print(f"✅ {file['title']}: {file['installed'] or '?'} -> {file['target']}{size}")
+    for file in report['blocked']:
+        print(f"⛔ {file['title']} {file['target']} needs {', '.join(file['missing_dependencies'])}, which has no version for {target}.")
+    for file in report['missing']:
+        print(f"❌ {file['title']} has no version for {target} yet.")
+    for file in report['unknown']:
+        print(f"❓ {file['name']} is not known by Modrinth.")
+    total = len(report['ready']) + len(report['blocked']) + len(report['missing'])
+    print(f"📊 {len(report['ready'])} of {total} projects are ready, {len(report['blocked'])} blocked, "
+          f"{len(report['missing'])} missing, {format_bytes(report['download_size'])} to download.")
+
+
+def main(argv=None):
+    """
+    Command line entry point of the planner: `python -m modrinth_updater.planner 1.21.5 [1.21.6 ...]`.
+
+    The exit code is 1 when a target is not fully ready, so scripts can wait for the right moment to upgrade.
+    """
+    parser = argparse.ArgumentParser(prog='python -m modrinth_updater.planner', description='Show which projects are ready for other game versions, without changing anything.')
+    parser.add_argument('game_versions', nargs='+', metavar='game_version', help='the target game versions')
+    parser.add_argument('--loader', help='the target loader, defaults to the current loader')
+    parser.add_argument('--json', action='store_true', help='print the plans as JSON')
+    args = parser.parse_args(argv)
+
+    reports = []
+    for game_version in args.game_versions:
+        if get_version_type(game_version) is None:
+            print(f'⚠️  {game_version} is not a known Minecraft version.')
+            return 2
+        report = plan(game_version, args.loader)
+        if report is None:
+            return 2
+        reports.append(report)
+        if not args.json:
+            print_plan(report)
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    return 0 if all(not report['blocked'] and not report['missing'] for report in reports) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
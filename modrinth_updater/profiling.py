@@ -0,0 +1,154 @@
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import tracemalloc
+import threading
+import contextlib
+
+# callbacks called with (stage name, seconds) after every pipeline stage
+_subscribers = []
+
+
+def subscribe(callback):
+    """
+    Registers a callback which is called after every pipeline stage with the stage name and its duration.
+
+    External tools, for example a metrics exporter, use this to time the stages of a run.
+
+    Args:
+        callback (callable): Called as `callback(stage, seconds)`.
+    """
+    if callback not in _subscribers:
+        _subscribers.append(callback)
+
+
+def unsubscribe(callback):
+    """
+    Removes a callback registered with `subscribe`.
+
+    Args:
+        callback (callable): The registered callback.
+    """
+    if callback in _subscribers:
+        _subscribers.remove(callback)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Times a pipeline stage and reports it to the subscribers, also when the stage fails.
+
+    Usage:
+        with stage('hash'):
+            hashes = hash_entries(entries)
+
+    Args:
+        name (str): The name of the stage, for example 'scan', 'hash' or 'mods'.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        for callback in list(_subscribers):
+            callback(name, seconds)
+
+
+def format_bytes(size):
+    """
+    Returns a byte count as a human readable string, for example '12.3 MiB'.
+    """
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} GiB'
+
+
+def profile_run(function, output_folder, limit=30):
+    """
+    Runs a function under cProfile and tracemalloc and writes a hot-path report.
+
+    The worker threads started during the run, like the hashing pool and the download scheduler,
+    are profiled as well and merged into the report, so their time is not hidden behind waits.
+
+    The report lists the functions sorted by their own time and by their cumulative time, the
+    duration of every pipeline stage, the peak memory and the lines which allocated the most memory.
+    The raw profile is written next to it, so it can be opened with tools like snakeviz.
+
+    Args:
+        function (callable): The function to profile, called without arguments.
+        output_folder (str): The folder the report and the raw profile are written to.
+        limit (int, optional): The number of functions and allocation sites listed. Defaults to 30.
+
+    Returns:
+        tuple: The return value of the function and the path of the report.
+    """
+    stages = []
+    thread_profilers = []
+    lock = threading.Lock()
+
+    def record_stage(name, seconds):
+        stages.append((name, seconds))
+
+    def profile_thread(frame, event, arg):
+        # called once in every new thread, for example the hashing and download workers,
+        # and replaced by a profiler of that thread which is merged into the report
+        sys.setprofile(None)
+        thread_profiler = cProfile.Profile()
+        with lock:
+            thread_profilers.append(thread_profiler)
+        thread_profiler.enable()
+
+    subscribe(record_stage)
+    profiler = cProfile.Profile()
+    # before Python 3.12 a profiler only sees its own thread, later ones see every thread
+    per_thread = sys.version_info < (3, 12)
+    if per_thread:
+        threading.setprofile(profile_thread)
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = profiler.runcall(function)
+    finally:
+        elapsed = time.perf_counter() - start
+        if per_thread:
+            threading.setprofile(None)
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        unsubscribe(record_stage)
+        with lock:
+            thread_profilers = list(thread_profilers)
+        for thread_profiler in thread_profilers:
+            thread_profiler.disable()
+
+        os.makedirs(output_folder, exist_ok=True)
+        name = time.strftime('profile-%Y%m%d-%H%M%S')
+        raw_path = os.path.join(output_folder, f'{name}.prof')
+        report_path = os.path.join(output_folder, f'{name}.txt')
+        pstats.Stats(profiler, *thread_profilers).dump_stats(raw_path)
+
+        with open(report_path, 'w', encoding='utf-8') as report:
+            report.write(f'Total time: {elapsed:.3f} s\n')
+            report.write(f'Peak traced memory: {format_bytes(peak)}\n')
+            report.write(f'Profiled worker threads: {len(thread_profilers)}\n\n')
+            report.write('Pipeline stages:\n')
+            for stage_name, seconds in stages:
+                report.write(f'  {stage_name:<20} {seconds:8.3f} s\n')
+            for sort_key, title in (('tottime', 'own time'), ('cumulative', 'cumulative time')):
+                stream = io.StringIO()
+                pstats.Stats(profiler, *thread_profilers, stream=stream).strip_dirs().sort_stats(sort_key).print_stats(limit)
+                report.write(f'\nHot functions by {title}:\n{stream.getvalue()}')
+            report.write('Largest allocation sites:\n')
+            for statistic in snapshot.statistics('lineno')[:limit]:
+                report.write(f'  {statistic}\n')
+
+        print(f'⏱  Profiled run: {elapsed:.2f} s, peak memory {format_bytes(peak)}')
+        for stage_name, seconds in stages:
+            print(f'   {stage_name:<20} {seconds:8.3f} s')
+        print(f'📄 Profile report: {report_path}')
+    return result, report_path
@@ -0,0 +1,307 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import threading
+import requests
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from modrinth_updater import metrics
+from modrinth_updater.config import (
+    MODRINTH_UPSTREAM_API_BASE,
+    MODRINTH_UPSTREAM_CDN_BASE,
+    env_proxy_host,
+    env_proxy_port,
+    env_proxy_cache_path,
+    env_proxy_cache_ttl_seconds
+)
+
+API_CACHE_FOLDER = os.path.join(env_proxy_cache_path, 'api')
+ARTIFACT_CACHE_FOLDER = os.path.join(env_proxy_cache_path, 'artifacts')
+
+# only successful answers and "not found" answers are worth sharing between servers
+CACHEABLE_STATUS = (HTTPStatus.OK, HTTPStatus.NOT_FOUND)
+
+PROXY_REQUESTS = metrics.Counter('modrinth_updater_proxy_requests_total', 'Requests served by the proxy by kind and cache result.')
+UPSTREAM_LATENCY = metrics.Histogram('modrinth_updater_proxy_upstream_duration_seconds', 'Duration of the requests sent upstream by the proxy.')
+
+_session = requests.Session()
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _single_flight(key, fetch):
+    """
+    Runs `fetch` once for concurrent callers with the same key, the other callers wait for its result.
+
+    Args:
+        key (str): The key identifying identical requests.
+        fetch (callable): The function fetching the value from upstream.
+
+    Returns:
+        object: The value returned by `fetch`.
+    """
+    with _inflight_lock:
+        entry = _inflight.get(key)
+        leader = entry is None
+        if leader:
+            entry = {'event': threading.Event(), 'result': None, 'error': None}
+            _inflight[key] = entry
+    if not leader:
+        entry['event'].wait()
+        if entry['error'] is not None:
+            raise entry['error']
+        return entry['result']
+    try:
+        entry['result'] = fetch()
+        return entry['result']
+    except Exception as e:
+        entry['error'] = e
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        entry['event'].set()
+
+
+def _cache_ttl():
+    """
+    Returns the time to live of cached API answers in seconds.
+
+    Returns:
+        float: The configured time to live, or 600 seconds if the configuration is invalid.
+    """
+    try:
+        return float(env_proxy_cache_ttl_seconds)
+    except ValueError:
+        return 600
+
+
+def _write_atomic(path, data):
+    """
+    Writes a cache file atomically, so readers never see a half written file.
+
+    Args:
+        path (str): The path of the cache file.
+        data (bytes): The content of the file.
+    """
+    folder = os.path.dirname(path)
+    if not os.path.exists(folder):
+        os.makedirs(folder, exist_ok=True)
+    temp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(data)
+    os.replace(temp_path, path)
+
+
+def fetch_api(method, path, body=b''):
+    """
+    Returns an API answer from the disk cache, asking Modrinth only when the answer is missing or expired.
+
+    Args:
+        method (str): The HTTP method, 'GET' or 'POST'.
+        path (str): The path and query after '/v2', for example '/version_file/<hash>'.
+        body (bytes, optional): The request body of a POST request. Defaults to b''.
+
+    Returns:
+        tuple: The status code, the content type and the body of the answer.
+    """
+    key = hashlib.sha256(method.encode() + b' ' + path.encode() + b'\n' + body).hexdigest()
+    cache_path = os.path.join(API_CACHE_FOLDER, key[:2], f'{key}.json')
+    try:
+        with open(cache_path, 'r') as file:
+            cached = json.load(file)
+        if time.time() - cached['stored'] < _cache_ttl():
+            PROXY_REQUESTS.inc(kind='api', cache='hit')
+            return cached['status'], cached['content_type'], cached['body'].encode()
+    except (OSError, ValueError, KeyError):
+        pass
+    PROXY_REQUESTS.inc(kind='api', cache='miss')
+
+    def fetch():
+        headers = {'Content-Type': 'application/json'} if body else {}
+        start = time.perf_counter()
+        response = _session.request(method, f'{MODRINTH_UPSTREAM_API_BASE}{path}', data=body or None, headers=headers, timeout=30)
+        UPSTREAM_LATENCY.observe(time.perf_counter() - start, kind='api')
+        content_type = response.headers.get('Content-Type', 'application/json')
+        if response.status_code in CACHEABLE_STATUS:
+            cached = {'stored': time.time(), 'status': response.status_code, 'content_type': content_type, 'body': response.text}
+            _write_atomic(cache_path, json.dumps(cached).encode())
+        return response.status_code, content_type, response.content
+
+    return _single_flight(key, fetch)
+
+
+def fetch_artifact(path):
+    """
+    Returns the cache path of a download, fetching it from the Modrinth CDN only once.
+
+    Downloads are immutable, so they are kept in the cache forever.
+
+    Args:
+        path (str): The download path on the CDN, for example '/data/<project>/versions/<version>/<file>'.
+
+    Returns:
+        str or None: The path of the cached file, or None if the CDN does not have it.
+
+    Raises:
+        requests.exceptions.HTTPError: If the CDN answers with another error, for example 429 or 503.
+    """
+    relative_path = os.path.normpath(path.lstrip('/'))
+    if relative_path.startswith('..') or os.path.isabs(relative_path):
+        return None
+    cache_path = os.path.join(ARTIFACT_CACHE_FOLDER, relative_path)
+    if os.path.isfile(cache_path):
+        PROXY_REQUESTS.inc(kind='artifact', cache='hit')
+        return cache_path
+    PROXY_REQUESTS.inc(kind='artifact', cache='miss')
+
+    def fetch():
+        if os.path.isfile(cache_path):
+            return cache_path
+        start = time.perf_counter()
+        response = _session.get(f'{MODRINTH_UPSTREAM_CDN_BASE}{path}', stream=True, timeout=30)
+        if response.status_code == HTTPStatus.NOT_FOUND:
+            response.close()
+            return None
+        if response.status_code != HTTPStatus.OK:
+            # a temporary failure of the CDN is passed on, so clients retry instead of giving up on the file
+            response.close()
+            raise requests.exceptions.HTTPError(f'The CDN answered {response.status_code}', response=response)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f'{cache_path}.{threading.get_ident()}.part'
+        with open(temp_path, 'wb') as file:
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                file.write(chunk)
+                metrics.BYTES_DOWNLOADED.inc(len(chunk))
+        os.replace(temp_path, cache_path)
+        UPSTREAM_LATENCY.observe(time.perf_counter() - start, kind='artifact')
+        return cache_path
+
+    return _single_flight(f'artifact:{path}', fetch)
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    """
+    Serves the Modrinth API under '/v2' and the CDN downloads under '/data' from the proxy cache,
+    and the metrics of the proxy under '/metrics'.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error_json(self, status, message):
+        self._send(status, 'application/json', json.dumps({'error': message}).encode())
+
+    def _handle_api(self, method, body=b''):
+        path = self.path[len('/v2'):]
+        try:
+            status, content_type, content = fetch_api(method, path, body)
+        except requests.exceptions.RequestException as e:
+            self._send_error_json(HTTPStatus.BAD_GATEWAY, str(e))
+            return
+        # download URLs are pointed at this proxy, so the artifacts are shared as well
+        own_base = f'http://{self.headers.get("Host", self.server.server_address[0])}'
+        content = content.replace(MODRINTH_UPSTREAM_CDN_BASE.encode(), own_base.encode())
+        self._send(status, content_type, content)
+
+    def _handle_artifact(self):
+        try:
+            cache_path = fetch_artifact(urlsplit(self.path).path)
+        except requests.exceptions.HTTPError as e:
+            self._send_error_json(e.response.status_code, str(e))
+            return
+        except requests.exceptions.RequestException as e:
+            self._send_error_json(HTTPStatus.BAD_GATEWAY, str(e))
+            return
+        if cache_path is None:
+            self._send_error_json(HTTPStatus.NOT_FOUND, 'not found')
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(os.path.getsize(cache_path)))
+        self.end_headers()
+        with open(cache_path, 'rb') as file:
+            shutil.copyfileobj(file, self.wfile, 1024 * 1024)
+
+    def do_GET(self):
+        if self.path.startswith('/v2/'):
+            self._handle_api('GET')
+        elif self.path.startswith('/data/'):
+            self._handle_artifact()
+        elif self.path == '/metrics':
+            self._send(HTTPStatus.OK, 'text/plain; version=0.0.4; charset=utf-8', metrics.render().encode())
+        else:
+            self._send_error_json(HTTPStatus.NOT_FOUND, 'not found')
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path.startswith('/v2/'):
+            self._handle_api('POST', body)
+        else:
+            self._send_error_json(HTTPStatus.NOT_FOUND, 'not found')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(host=env_proxy_host, port=env_proxy_port):
+    """
+    Starts the caching proxy in a background thread, for example next to the fleet runner.
+
+    Args:
+        host (str, optional): The address to listen on. Defaults to the `PROXY_HOST` configuration.
+        port (str, optional): The port to listen on. Defaults to the `PROXY_PORT` configuration.
+
+    Returns:
+        ThreadingHTTPServer: The running server, stop it with `shutdown`.
+    """
+    server = ThreadingHTTPServer((host, int(port)), ProxyHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def serve(host=env_proxy_host, port=env_proxy_port):
+    """
+    Starts the caching proxy and serves requests until it is interrupted.
+
+    Args:
+        host (str, optional): The address to listen on. Defaults to the `PROXY_HOST` configuration.
+        port (str, optional): The port to listen on. Defaults to the `PROXY_PORT` configuration.
+    """
+    server = ThreadingHTTPServer((host, int(port)), ProxyHandler)
+    server.daemon_threads = True
+    print(f'🌐 Modrinth caching proxy is listening on http://{host}:{port}/v2')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    """
+    Command line entry point of the proxy: `python -m modrinth_updater.proxy`.
+    """
+    parser = argparse.ArgumentParser(prog='python -m modrinth_updater.proxy', description='Run a caching proxy for the Modrinth API and CDN.')
+    parser.add_argument('--host', default=env_proxy_host, help='address to listen on')
+    parser.add_argument('--port', default=env_proxy_port, help='port to listen on')
+    args = parser.parse_args(argv)
+    serve(args.host, args.port)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
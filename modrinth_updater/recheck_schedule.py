@@ -0,0 +1,108 @@
+import time
+from modrinth_updater import state_db
+from modrinth_updater.config import env_recheck_base_hours, env_recheck_max_days
+
+_schedule = None
+_schedule_dirty = False
+
+
+def _load_schedule():
+    """
+    Returns the re-check schedule loaded from the state database.
+
+    Returns:
+        dict: The schedule of every parked file by SHA1 hash.
+    """
+    global _schedule
+    if _schedule is None:
+        _schedule = state_db.load_wait_status()
+    return _schedule
+
+
+def save_schedule():
+    """
+    Writes the re-check schedule to the state database if it changed since it was loaded.
+    """
+    global _schedule_dirty
+    if not _schedule_dirty:
+        return
+    state_db.save_wait_status(_schedule)
+    _schedule_dirty = False
+
+
+def _backoff_seconds(attempts):
+    """
+    Returns the wait before the next re-check after the given number of incompatible answers.
+
+    Args:
+        attempts (int): The number of incompatible answers in a row.
+
+    Returns:
+        float: The wait in seconds, doubled for every attempt and capped at `RECHECK_MAX_DAYS`.
+    """
+    try:
+        base = float(env_recheck_base_hours) * 3600
+        limit = float(env_recheck_max_days) * 86400
+    except (TypeError, ValueError):
+        base, limit = 6 * 3600, 14 * 86400
+    return min(base * 2 ** max(attempts - 1, 0), limit)
+
+
+def is_due(sha1_hash, game_version, loader, now=None):
+    """
+    Checks if a parked file has to be checked again.
+
+    A file is due when it was never checked, when its wait is over, or when the detected game
+    version or loader changed since the last check.
+
+    Args:
+        sha1_hash (str): The SHA1 hash of the file.
+        game_version (str): The current game version.
+        loader (str): The current loaders, joined with commas.
+        now (float, optional): The current time. Defaults to None, which uses `time.time()`.
+
+    Returns:
+        bool: True if the file has to be checked.
+    """
+    entry = _load_schedule().get(sha1_hash)
+    if entry is None:
+        return True
+    if entry['game_version'] != game_version or entry['loader'] != loader:
+        return True
+    return (now or time.time()) >= entry['next_check']
+
+
+def record_not_compatible(sha1_hash, game_version, loader):
+    """
+    Records an incompatible answer for a parked file and schedules its next check.
+
+    Args:
+        sha1_hash (str): The SHA1 hash of the file.
+        game_version (str): The game version the file was checked against.
+        loader (str): The loaders the file was checked against, joined with commas.
+    """
+    global _schedule_dirty
+    schedule = _load_schedule()
+    entry = schedule.get(sha1_hash)
+    attempts = 1
+    if entry and entry['game_version'] == game_version and entry['loader'] == loader:
+        attempts = entry['attempts'] + 1
+    schedule[sha1_hash] = {
+        'attempts': attempts,
+        'next_check': time.time() + _backoff_seconds(attempts),
+        'game_version': game_version,
+        'loader': loader,
+    }
+    _schedule_dirty = True
+
+
+def forget(sha1_hash):
+    """
+    Removes a file from the schedule, for example after it became compatible.
+
+    Args:
+        sha1_hash (str): The SHA1 hash of the file.
+    """
+    global _schedule_dirty
+    if _load_schedule().pop(sha1_hash, None) is not None:
+        _schedule_dirty = True
@@ -0,0 +1,58 @@
+import os
+from collections import namedtuple
+from modrinth_updater.config import default_minecraft_path
+
+# The directory scanner only needs the standard library, so light commands like `status` can use it
+# without importing the network code of file_utils.
+
+ScanEntry = namedtuple('ScanEntry', ['name', 'path', 'size', 'mtime_ns', 'inode'])
+
+# the file types managed by the updater: mods are jars, resource, shader and data packs are zips
+MANAGED_EXTENSIONS = ('.jar', '.zip')
+MANAGED_CATEGORIES = ('mods', 'resourcepacks', 'shaderpacks')
+
+def scan_folder(folder, extensions=MANAGED_EXTENSIONS):
+    """
+    Scans a folder once with `os.scandir` and returns its files with their cached stat data.
+
+    Args:
+        folder (str): The folder to scan.
+        extensions (tuple, optional): Only files with these extensions are returned, or every file if None.
+            Defaults to `MANAGED_EXTENSIONS`.
+
+    Returns:
+        list: A `ScanEntry` (name, path, size, mtime_ns, inode) for every file, or an empty list if the folder does not exist.
+    """
+    entries = []
+    try:
+        with os.scandir(folder) as iterator:
+            for entry in iterator:
+                if extensions is not None and not entry.name.lower().endswith(extensions):
+                    continue
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                entries.append(ScanEntry(entry.name, entry.path, stat.st_size, stat.st_mtime_ns, stat.st_ino))
+    except FileNotFoundError:
+        pass
+    return entries
+
+def scan_managed_folders(path = default_minecraft_path, extensions=MANAGED_EXTENSIONS):
+    """
+    Scans every folder managed by the updater in a single pass.
+
+    Args:
+        path (str, optional): The path to the Minecraft directory. Defaults to the global variable `default_minecraft_path`.
+        extensions (tuple, optional): Only files with these extensions are returned. Defaults to `MANAGED_EXTENSIONS`.
+
+    Returns:
+        dict: For every category ('mods', 'resourcepacks', 'shaderpacks') a dict with the
+            'installed' and the 'wait_for_update' entries.
+    """
+    return {
+        category: {
+            'installed': scan_folder(os.path.join(path, category), extensions),
+            'wait_for_update': scan_folder(os.path.join(path, 'modrinth_updater', category, 'wait_for_update'), extensions),
+        }
+        for category in MANAGED_CATEGORIES
+    }
@@ -0,0 +1,33 @@
+import os
+from modrinth_updater.hash_utils import get_sha1_hash
+from modrinth_updater.transaction import apply_update, move_file
+
+
+def install_compatible_version(transaction, category, parked_path, latest, target_folder):
+    """
+    Installs the compatible version a bulk update check found for a parked file, without asking Modrinth again.
+
+    If the parked file itself is compatible now, it is moved back. Otherwise the compatible version
+    is queued for download and the parked file is moved to the backup store when it is swapped in.
+
+    Args:
+        transaction (Transaction or None): The transaction of the current run.
+        category (str): The category of the file, for example 'mods'.
+        parked_path (str): The path to the file in the wait_for_update folder.
+        latest (Version): The compatible version returned by the bulk update check.
+        target_folder (str): The folder the compatible version is placed in.
+
+    Returns:
+        str: An error message if the file cannot be moved or queued, otherwise None.
+    """
+    name = os.path.basename(parked_path)
+    try:
+        if any(file.sha1 == get_sha1_hash(parked_path) for file in latest.files):
+            move_file(transaction, category, parked_path, os.path.join(target_folder, name))
+            print(f'✅ {name} is compatible again and moved back to the {category} folder.')
+        else:
+            print(f'🚀 A compatible version of {name} is available: {latest.version_number}')
+            apply_update(transaction, category, parked_path, latest.primary_file.url, target_folder, latest.primary_file.size, latest.primary_file.sha1)
+            print(f'⬇️ {latest.name} is queued for download!')
+    except Exception as e:
+        return f'Error moving file: {e}'
@@ -1,12 +1,14 @@
 import os
-import shutil
 from http import HTTPStatus
 from packaging.version import Version
 from modrinth_updater.config import default_minecraft_path
 from modrinth_updater.modrinth_api import check_update, get_local_version
-from modrinth_updater.file_utils import fix_game_version_number, fix_version_number, download_mod
+from modrinth_updater.file_utils import fix_game_version_number, fix_version_number
+from modrinth_updater import models
+from modrinth_updater.transaction import apply_update, move_file
+from modrinth_updater.services import install_compatible_version
 
-def check_updateable_mods(mod_path, game_versions=None, loaders=None):
+def check_updateable_mods(mod_path, game_versions=None, loaders=None, transaction=None):
     """
     Checks if a given mod is updatable, and if so, downloads the latest version and backs up the old file.
     If the mod is not supported or incompatible, it is moved to the 'wait_for_update' folder.
@@ -15,12 +17,11 @@ def check_updateable_mods(mod_path, game_versions=None, loaders=None):
         mod_path (str): The path to the mod file to check for updates.
         game_versions (list, optional): A list of game versions to check compatibility against. Defaults to None.
         loaders (list, optional): A list of loaders to check compatibility against. Defaults to None.
+        transaction (Transaction, optional): The transaction of the current run, the update is applied right away if None.
 
     Returns:
         str: An error message if something went wrong during the download or file move operations, otherwise None.
     """
-    backup_folder = os.path.join(default_minecraft_path, 'modrinth_updater', 'mods', 'backup' )
-    backup_path = os.path.join(default_minecraft_path, 'modrinth_updater', 'mods' ,'backup', os.path.basename(mod_path))
     mods_folder = os.path.join(default_minecraft_path, 'mods')
     local_mod_versions, local_version_number, response_status_code = get_local_version(mod_path)
     if response_status_code == HTTPStatus.OK:
@@ -28,28 +29,24 @@ def check_updateable_mods(mod_path, game_versions=None, loaders=None):
         mod_name = os.path.basename(mod_path)
         if response is None:
             print(f'⚠️ Cannot update this mod: {mod_name} because the update check failed.')
-        if response.status_code == HTTPStatus.OK:
-            data = response.json()
-            latest_mod_version = fix_game_version_number(data['game_versions'])
+        elif response.status_code == HTTPStatus.OK:
+            latest = models.Version.from_json(response.json())
+            latest_mod_version = fix_game_version_number(latest.game_versions)
             local_mod_version = fix_game_version_number(local_mod_versions)
-            fixed_latest_version_number, _ = fix_version_number(data['version_number'])
+            # a file whose versions are all snapshots has no release to compare
+            if latest_mod_version is None or local_mod_version is None:
+                print(f'⚠️ Cannot compare the game versions of this mod: {mod_name}, it is skipped.')
+                return
+            fixed_latest_version_number, _ = fix_version_number(latest.version_number)
             fixed_local_version_number, _ = fix_version_number(local_version_number)
             if local_mod_version in latest_mod_version and fixed_latest_version_number == fixed_local_version_number:
                 print (f'✅ Your mod is on the latest release: {mod_name}! Your loader is {loaders}-{loader_version}.')
             elif latest_mod_version > local_mod_version or Version(fixed_latest_version_number) > Version(fixed_local_version_number):
                 print('🚀 A newer version is available of this mod!')
-                print(f"Name: {data['name']}")
-                if not os.path.exists(backup_folder):
-                    os.makedirs(backup_folder)
+                print(f"Name: {latest.name}")
                 try:
-                    download_mod(data['files'][0]['url'],mods_folder)
-                    print('⬇️ Latest version of the mod has been downloaded!')
-                    try:
-                        shutil.move(mod_path, backup_path)
-                        print('📦 Old mod file moved to the backup folder!')
-                    except Exception as e:
-                        error = (f'Error moving file: {e}')
-                        return error
+                    apply_update(transaction, 'mods', mod_path, latest.primary_file.url, mods_folder, latest.primary_file.size, latest.primary_file.sha1)
+                    print('⬇️ Latest version of the mod is queued for download!')
                 except Exception as e:
                     error = (f'Error downloading file: {e}')
                     return error
@@ -60,7 +57,7 @@ def check_updateable_mods(mod_path, game_versions=None, loaders=None):
             if not os.path.exists(wait_for_update_folder):
                 os.makedirs(wait_for_update_folder)
             try:
-                shutil.move(mod_path, wait_for_update_path)
+                move_file(transaction, 'mods', mod_path, wait_for_update_path)
                 print ("⚠️  The mod moved to the 'modrinth_updater/mods/wait_for_update' folder because of incompatibility!")
             except Exception as e:
                 error = (f'Error moving file: {e}')
@@ -69,51 +66,50 @@ def check_updateable_mods(mod_path, game_versions=None, loaders=None):
             print(f'⚠️  Error: {response.status_code}')
             print(response.text)
 
-def check_wait_for_update_mods(mod_path, game_versions=None, loaders=None):
+def check_wait_for_update_mods(mod_path, game_versions=None, loaders=None, transaction=None, latest=None):
     """
     Checks if a given mod in the 'modrinth_updater/mods/wait_for_update' folder is now compatible with the current Minecraft version and loader.
-    If the mod is compatible, it will download the latest version, move the old file to the 'modrinth_updater/mods/backup' folder and the new file to the mods folder.
+    If the mod is compatible, it will download the latest version, move the old file to the 'modrinth_updater/backups' store and the new file to the mods folder.
     If the mod is not compatible, it will print a message with the loader and Minecraft version that is incompatible.
 
     Args:
         mod_path (str): The path to the mod file to check for updates.
         game_versions (list, optional): A list of Minecraft versions to check compatibility against. Defaults to None.
         loaders (list, optional): A list of loaders to check compatibility against. Defaults to None.
+        transaction (Transaction, optional): The transaction of the current run, the update is applied right away if None.
+        latest (Version, optional): The compatible version found by a bulk update check, which saves the
+            per-file requests. Defaults to None.
 
     Returns:
         str: An error message if there is an issue downloading or moving the file
     """
-    backup_folder = os.path.join(default_minecraft_path, 'modrinth_updater', 'mods', 'backup' )
-    backup_path = os.path.join(default_minecraft_path, 'modrinth_updater', 'mods', 'backup', os.path.basename(mod_path))
     mods_folder = os.path.join(default_minecraft_path, 'mods')
+    if latest is not None:
+        return install_compatible_version(transaction, 'mods', mod_path, latest, mods_folder)
     local_mod_versions, local_version_number, response_status_code = get_local_version(mod_path)
     if response_status_code ==HTTPStatus.OK:
         response, loader_version, loaders = check_update(mod_path, game_versions, loaders)
         mod_name = os.path.basename(mod_path)
         if response is None:
             print(f'⚠️ Cannot update this mod "{mod_name}" because the update check failed.')
-        if response.status_code == HTTPStatus.OK:
-            data = response.json()
-            latest_mod_version = fix_game_version_number(data['game_versions'])
+        elif response.status_code == HTTPStatus.OK:
+            latest = models.Version.from_json(response.json())
+            latest_mod_version = fix_game_version_number(latest.game_versions)
             local_mod_version = fix_game_version_number(local_mod_versions)
-            fixed_latest_version_number, _ = fix_version_number(data['version_number'])
+            # a file whose versions are all snapshots has no release to compare
+            if latest_mod_version is None or local_mod_version is None:
+                print(f'⚠️ Cannot compare the game versions of this mod: {mod_name}, it is skipped.')
+                return
+            fixed_latest_version_number, _ = fix_version_number(latest.version_number)
             fixed_local_version_number, _ = fix_version_number(local_version_number)
             if local_mod_version in latest_mod_version and fixed_latest_version_number == fixed_local_version_number:
                 print (f'✅ Your mod is on the latest release: {mod_name}! Your loader is {loaders}-{loader_version}.')
             elif latest_mod_version > local_mod_version or Version(fixed_latest_version_number) > Version(fixed_local_version_number):
                 print('🚀 A newer version is available of this mod!')
-                print(f"Name: {data['name']}")
-                if not os.path.exists(backup_folder):
-                    os.makedirs(backup_folder)
+                print(f"Name: {latest.name}")
                 try:
-                    download_mod(data['files'][0]['url'],mods_folder)
-                    print('⬇️ Latest version of the mod has been downloaded!')
-                    try:
-                        shutil.move(mod_path, backup_path)
-                        print('📦 Old mod file moved to the backup folder!')
-                    except Exception as e:
-                        error = (f'Error moving file: {e}')
-                        return error
+                    apply_update(transaction, 'mods', mod_path, latest.primary_file.url, mods_folder, latest.primary_file.size, latest.primary_file.sha1)
+                    print('⬇️ Latest version of the mod is queued for download!')
                 except Exception as e:
                     error = (f'Error downloading file: {e}')
                     return error
@@ -1,12 +1,14 @@
 import os
-import shutil
 from http import HTTPStatus
 from packaging.version import Version
 from modrinth_updater.config import default_minecraft_path
 from modrinth_updater.modrinth_api import check_update, get_local_version
-from modrinth_updater.file_utils import fix_game_version_number, fix_version_number, download_mod
+from modrinth_updater.file_utils import fix_game_version_number, fix_version_number
+from modrinth_updater import models
+from modrinth_updater.transaction import apply_update, move_file
+from modrinth_updater.services import install_compatible_version
 
-def check_updateable_shaderpacks(shaderpacks_path, game_versions=None, loaders=None):
+def check_updateable_shaderpacks(shaderpacks_path, game_versions=None, loaders=None, transaction=None):
     """
     Checks if the given shaderpack is updatable, and if so, downloads and backs up the old file.
     If the shaderpack is not supported or incompatible, it is moved to the 'wait_for_update' folder.
@@ -15,12 +17,11 @@ def check_updateable_shaderpacks(shaderpacks_path, game_versions=None, loaders=N
         shaderpacks_path (str): The path to the shaderpack to check for updates.
         game_versions (str, optional): The game version. Defaults to None.
         loaders (str, optional): The loader version. Defaults to None.
+        transaction (Transaction, optional): The transaction of the current run, the update is applied right away if None.
 
     Returns:
         str: An error message if something went wrong, otherwise None.
     """
-    backup_folder = os.path.join(default_minecraft_path, 'modrinth_updater', 'shaderpacks', 'backup' )
-    backup_path = os.path.join(default_minecraft_path, 'modrinth_updater', 'shaderpacks', 'backup', os.path.basename(shaderpacks_path))
     shaderpacks_folder = os.path.join(default_minecraft_path, 'shaderpacks')
     local_shaderpack_versions, local_version_number, response_status_code = get_local_version(shaderpacks_path)
     if response_status_code ==HTTPStatus.OK:
@@ -28,28 +29,24 @@ def check_updateable_shaderpacks(shaderpacks_path, game_versions=None, loaders=N
         shaderpacks_name = os.path.basename(shaderpacks_path)
         if response is None:
             print(f'⚠️ Cannot update this shaderpack: {shaderpacks_name} because the update check failed.')
-        if response.status_code == HTTPStatus.OK:
-            data = response.json()
-            latest_shaderpack_version = fix_game_version_number(data['game_versions'])
+        elif response.status_code == HTTPStatus.OK:
+            latest = models.Version.from_json(response.json())
+            latest_shaderpack_version = fix_game_version_number(latest.game_versions)
             local_shaderpack_version = fix_game_version_number(local_shaderpack_versions)
-            fixed_latest_version_number = fix_version_number(data['version_number'])
+            # a file whose versions are all snapshots has no release to compare
+            if latest_shaderpack_version is None or local_shaderpack_version is None:
+                print(f'⚠️ Cannot compare the game versions of this shaderpack: {shaderpacks_name}, it is skipped.')
+                return
+            fixed_latest_version_number = fix_version_number(latest.version_number)
             fixed_local_version_number = fix_version_number(local_version_number)
             if latest_shaderpack_version in local_shaderpack_version and fixed_latest_version_number == fixed_local_version_number:
                 print (f'✅ Your shaderpack is on the latest release: {shaderpacks_name}! Your loader is {loaders}-{loader_version}.')
             elif latest_shaderpack_version > local_shaderpack_version or Version(fixed_latest_version_number) > Version(fixed_local_version_number):
                 print('🚀 A newer version is available of this shaderpack!')
-                print(f"Name: {data['name']}")
-                if not os.path.exists(backup_folder):
-                    os.makedirs(backup_folder)
+                print(f"Name: {latest.name}")
                 try:
-                    download_mod(data['files'][0]['url'],shaderpacks_folder)
-                    print('⬇️ Latest version of the shaderpack has been downloaded!')
-                    try:
-                        shutil.move(shaderpacks_path, backup_path)
-                        print('📦 Old shaderpack file moved to the backup folder!')
-                    except Exception as e:
-                        error = (f'Error moving file: {e}')
-                        return error
+                    apply_update(transaction, 'shaderpacks', shaderpacks_path, latest.primary_file.url, shaderpacks_folder, latest.primary_file.size, latest.primary_file.sha1)
+                    print('⬇️ Latest version of the shaderpack is queued for download!')
                 except Exception as e:
                     error = (f'Error downloading file: {e}')
                     return error
@@ -59,7 +56,7 @@ def check_updateable_shaderpacks(shaderpacks_path, game_versions=None, loaders=N
                 wait_for_update_path = os.path.join(default_minecraft_path, 'modrinth_updater', 'shaderpacks', 'wait_for_update', os.path.basename(shaderpacks_path) )
                 if not os.path.exists(wait_for_update_folder):
                     os.makedirs(wait_for_update_folder)
-                shutil.move(shaderpacks_path, wait_for_update_path)
+                move_file(transaction, 'shaderpacks', shaderpacks_path, wait_for_update_path)
                 print ("⚠️  The shaderpack moved to the 'modrinth_updater/shaderpacks/wait_for_update' folder because of incompatibility!")
             except Exception as e:
                 error = (f'Error moving file: {e}')
@@ -68,48 +65,48 @@ def check_updateable_shaderpacks(shaderpacks_path, game_versions=None, loaders=N
             print(f'⚠️  Error: {response.status_code}')
             print(response.text)
 
-def check_wait_for_update_shaderpacks(shaderpacks_path, game_versions=None, loaders=None):
+def check_wait_for_update_shaderpacks(shaderpacks_path, game_versions=None, loaders=None, transaction=None, latest=None):
     """
     This function will check if the shaderpacks in the 'modrinth_updater/shaderpacks/wait_for_update' folder are now compatible with the current Minecraft version and loader.
 
-    If the shaderpack is compatible, it will download the latest version, move the old file to the 'modrinth_updater/shaderpacks/backup' folder and the new file to the shaderpacks folder.
+    If the shaderpack is compatible, it will download the latest version, move the old file to the 'modrinth_updater/backups' store and the new file to the shaderpacks folder.
 
     If the shaderpack is not compatible, it will print a message with the loader and Minecraft version that is incompatible.
 
     :param shaderpacks_path: The path to the shaderpack to check for updates
     :param game_versions: A list of Minecraft versions to check for compatibility
     :param loaders: A list of loaders to check for compatibility
+    :param transaction: The transaction of the current run, the update is applied right away if None
+    :param latest: The compatible version found by a bulk update check, which saves the per-file requests
     :return: An error message if there is an issue downloading or moving the file
     """
-    backup_folder = os.path.join(default_minecraft_path, 'modrinth_updater', 'shaderpacks', 'backup' )
-    backup_path = os.path.join(default_minecraft_path, 'modrinth_updater', 'shaderpacks', 'backup', os.path.basename(shaderpacks_path))
     shaderpacks_folder = os.path.join(default_minecraft_path, 'shaderpacks')
+    if latest is not None:
+        return install_compatible_version(transaction, 'shaderpacks', shaderpacks_path, latest, shaderpacks_folder)
     local_shaderpack_versions, local_version_number, response_status_code = get_local_version(shaderpacks_path)
     if response_status_code ==HTTPStatus.OK:
         response, loader_version, loaders = check_update(shaderpacks_path, game_versions, loaders)
         shaderpacks_name = os.path.basename(shaderpacks_path)
-        if response.status_code == HTTPStatus.OK:
-            data = response.json()
-            latest_shaderpack_version = fix_game_version_number(data['game_versions'])
+        if response is None:
+            print(f'⚠️ Cannot update this shaderpack "{shaderpacks_name}" because the update check failed.')
+        elif response.status_code == HTTPStatus.OK:
+            latest = models.Version.from_json(response.json())
+            latest_shaderpack_version = fix_game_version_number(latest.game_versions)
             local_shaderpack_version = fix_game_version_number(local_shaderpack_versions)
-            fixed_latest_version_number = fix_version_number(data['version_number'])
+            # a file whose versions are all snapshots has no release to compare
+            if latest_shaderpack_version is None or local_shaderpack_version is None:
+                print(f'⚠️ Cannot compare the game versions of this shaderpack: {shaderpacks_name}, it is skipped.')
+                return
+            fixed_latest_version_number = fix_version_number(latest.version_number)
             fixed_local_version_number = fix_version_number(local_version_number)
             if latest_shaderpack_version in local_shaderpack_version and fixed_latest_version_number == fixed_local_version_number:
                 print (f'✅ Your shaderpack is on the latest release: {shaderpacks_name}! Your loader is {loaders}-{loader_version}.')
             elif latest_shaderpack_version > local_shaderpack_version or Version(fixed_latest_version_number) > Version(fixed_local_version_number):
                 print('🚀 A newer version is available of this shaderpack!')
-                print(f"Name: {data['name']}")
-                if not os.path.exists(backup_folder):
-                    os.makedirs(backup_folder)
+                print(f"Name: {latest.name}")
                 try:
-                    download_mod(data['files'][0]['url'],shaderpacks_folder)
-                    print('⬇️ Latest version of the shaderpack has been downloaded!')
-                    try:
-                        shutil.move(shaderpacks_path, backup_path)
-                        print('📦 Old shaderpack file moved to the backup folder!')
-                    except Exception as e:
-                        error = (f'Error moving file: {e}')
-                        return error
+                    apply_update(transaction, 'shaderpacks', shaderpacks_path, latest.primary_file.url, shaderpacks_folder, latest.primary_file.size, latest.primary_file.sha1)
+                    print('⬇️ Latest version of the shaderpack is queued for download!')
                 except Exception as e:
                     error = (f'Error downloading file: {e}')
                     return error
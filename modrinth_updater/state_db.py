@@ -0,0 +1,569 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from modrinth_updater.config import default_minecraft_path
+
+STATE_FOLDER = os.path.join(default_minecraft_path, 'modrinth_updater')
+STATE_DATABASE = os.path.join(STATE_FOLDER, 'state.db')
+
+# the JSON files used before the state database, imported once when the database is created
+LEGACY_HASH_CACHE_FILE = os.path.join(STATE_FOLDER, 'cache', 'hashes.json')
+LEGACY_SCHEDULE_FILE = os.path.join(STATE_FOLDER, 'cache', 'recheck_schedule.json')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    category TEXT,
+    status TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    sha1 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions (
+    id TEXT PRIMARY KEY,
+    project_id TEXT NOT NULL,
+    name TEXT,
+    version_number TEXT,
+    game_versions TEXT NOT NULL,
+    loaders TEXT NOT NULL,
+    url TEXT,
+    filename TEXT,
+    size INTEGER
+);
+CREATE TABLE IF NOT EXISTS file_versions (
+    sha1 TEXT PRIMARY KEY,
+    version_id TEXT,
+    checked REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS latest_versions (
+    sha1 TEXT NOT NULL,
+    game_version TEXT NOT NULL,
+    loader TEXT NOT NULL,
+    version_id TEXT,
+    checked REAL NOT NULL,
+    PRIMARY KEY (sha1, game_version, loader)
+);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    sha1 TEXT PRIMARY KEY,
+    loader TEXT,
+    mod_id TEXT,
+    name TEXT,
+    version TEXT,
+    project_id TEXT,
+    checked REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS wait_status (
+    sha1 TEXT PRIMARY KEY,
+    attempts INTEGER NOT NULL,
+    next_check REAL NOT NULL,
+    game_version TEXT,
+    loader TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL,
+    state TEXT NOT NULL,
+    game_version TEXT,
+    loader TEXT
+);
+CREATE TABLE IF NOT EXISTS run_events (
+    run_id TEXT NOT NULL,
+    time REAL NOT NULL,
+    category TEXT,
+    action TEXT NOT NULL,
+    path TEXT,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS files_sha1 ON files (sha1);
+CREATE INDEX IF NOT EXISTS files_status ON files (status, category);
+CREATE INDEX IF NOT EXISTS versions_project ON versions (project_id);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+CREATE INDEX IF NOT EXISTS run_events_run ON run_events (run_id);
+"""
+
+_connection = None
+_lock = threading.RLock()
+
+
+def connect():
+    """
+    Opens the state database, creating the tables and importing the legacy JSON files when it is new.
+
+    Returns:
+        sqlite3.Connection: The connection to the state database.
+    """
+    global _connection
+    with _lock:
+        if _connection is None:
+            if not os.path.exists(STATE_FOLDER):
+                os.makedirs(STATE_FOLDER)
+            is_new = not os.path.exists(STATE_DATABASE)
+            connection = sqlite3.connect(STATE_DATABASE, check_same_thread=False)
+            # WAL with normal sync keeps single row writes cheap while the database stays consistent
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            if is_new:
+                _import_legacy_files(connection)
+            _connection = connection
+    return _connection
+
+
+def _read_legacy_file(path):
+    """
+    Reads and removes a JSON state file written by an older version.
+
+    Returns:
+        dict: The content of the file, or an empty dict if it is missing or broken.
+    """
+    try:
+        with open(path, 'r') as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    os.remove(path)
+    return data
+
+
+def _import_legacy_files(connection):
+    """
+    Imports the hash cache and the re-check schedule from the JSON files used before the state database.
+    """
+    hashes = _read_legacy_file(LEGACY_HASH_CACHE_FILE)
+    connection.executemany(
+        'INSERT OR REPLACE INTO files (path, category, status, size, mtime_ns, inode, sha1) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        [(path, *_classify(path), entry['size'], entry['mtime_ns'], entry['inode'], entry['sha1']) for path, entry in hashes.items()]
+    )
+    schedule = _read_legacy_file(LEGACY_SCHEDULE_FILE)
+    connection.executemany(
+        'INSERT OR REPLACE INTO wait_status (sha1, attempts, next_check, game_version, loader) VALUES (?, ?, ?, ?, ?)',
+        [(sha1_hash, e['attempts'], e['next_check'], e['game_version'], e['loader']) for sha1_hash, e in schedule.items()]
+    )
+    connection.commit()
+
+
+def _classify(file_path):
+    """
+    Returns the category and the status of a managed file from its path.
+
+    Args:
+        file_path (str): The path to the file, for example '<minecraft>/modrinth_updater/mods/wait_for_update/x.jar'.
+
+    Returns:
+        tuple: The category, for example 'mods', and the status, 'installed' or 'wait_for_update'.
+    """
+    folder = os.path.dirname(file_path)
+    if os.path.basename(folder) == 'wait_for_update':
+        return os.path.basename(os.path.dirname(folder)), 'wait_for_update'
+    return os.path.basename(folder), 'installed'
+
+
+def load_hashes():
+    """
+    Returns the hash cache stored in the database.
+
+    Returns:
+        dict: The size, mtime_ns, inode and SHA1 hash of every known file by path.
+    """
+    with _lock:
+        rows = connect().execute('SELECT path, size, mtime_ns, inode, sha1 FROM files').fetchall()
+    return {path: {'size': size, 'mtime_ns': mtime_ns, 'inode': inode, 'sha1': sha1} for path, size, mtime_ns, inode, sha1 in rows}
+
+
+def save_hashes(hashes):
+    """
+    Replaces the stored hash cache in one database transaction.
+
+    Args:
+        hashes (dict): The size, mtime_ns, inode and SHA1 hash of every known file by path.
+    """
+    with _lock:
+        connection = connect()
+        with connection:
+            connection.execute('DELETE FROM files')
+            connection.executemany(
+                'INSERT INTO files (path, category, status, size, mtime_ns, inode, sha1) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(path, *_classify(path), e['size'], e['mtime_ns'], e['inode'], e['sha1']) for path, e in hashes.items()]
+            )
+
+
+def load_wait_status():
+    """
+    Returns the re-check schedule of the parked files stored in the database.
+
+    Returns:
+        dict: The attempts, next_check, game_version and loader of every parked file by SHA1 hash.
+    """
+    with _lock:
+        rows = connect().execute('SELECT sha1, attempts, next_check, game_version, loader FROM wait_status').fetchall()
+    return {
+        sha1_hash: {'attempts': attempts, 'next_check': next_check, 'game_version': game_version, 'loader': loader}
+        for sha1_hash, attempts, next_check, game_version, loader in rows
+    }
+
+
+def save_wait_status(schedule):
+    """
+    Replaces the stored re-check schedule in one database transaction.
+
+    Args:
+        schedule (dict): The attempts, next_check, game_version and loader of every parked file by SHA1 hash.
+    """
+    with _lock:
+        connection = connect()
+        with connection:
+            connection.execute('DELETE FROM wait_status')
+            connection.executemany(
+                'INSERT INTO wait_status (sha1, attempts, next_check, game_version, loader) VALUES (?, ?, ?, ?, ?)',
+                [(sha1_hash, e['attempts'], e['next_check'], e['game_version'], e['loader']) for sha1_hash, e in schedule.items()]
+            )
+
+
+def _store_version(connection, version):
+    """
+    Stores the metadata of a `Version` record.
+    """
+    primary = version.primary_file
+    connection.execute(
+        'INSERT OR REPLACE INTO versions (id, project_id, name, version_number, game_versions, loaders, url, filename, size) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (version.id, version.project_id, version.name, version.version_number,
+         json.dumps(list(version.game_versions)), json.dumps(list(version.loaders)),
+         primary.url if primary else None, primary.filename if primary else None, primary.size if primary else None)
+    )
+
+
+def record_file_version(sha1_hash, version):
+    """
+    Records which version a local file belongs to.
+
+    Args:
+        sha1_hash (str): The SHA1 hash of the local file.
+        version (Version or None): The version of the file, or None if Modrinth does not know the file.
+    """
+    with _lock:
+        connection = connect()
+        with connection:
+            if version is not None:
+                _store_version(connection, version)
+            connection.execute(
+                'INSERT OR REPLACE INTO file_versions (sha1, version_id, checked) VALUES (?, ?, ?)',
+                (sha1_hash, version.id if version is not None else None, time.time())
+            )
+
+
+def unknown_since(sha1_hash):
+    """
+    Returns when Modrinth last answered that it does not know a file.
+
+    Args:
+        sha1_hash (str): The SHA1 hash of the file.
+
+    Returns:
+        float or None: The time of the check, or None if the file is known or was never looked up.
+    """
+    with _lock:
+        row = connect().execute('SELECT checked FROM file_versions WHERE sha1 = ? AND version_id IS NULL', (sha1_hash,)).fetchone()
+    return row[0] if row else None
+
+
+def is_unknown(sha1_hash):
+    """
+    Checks if Modrinth did not know a file when it was last looked up.
+    """
+    return unknown_since(sha1_hash) is not None
+
+
+def record_fingerprint(sha1_hash, fingerprint, project_id=None):
+    """
+    Records what an unknown file was identified as from its loader metadata.
+
+    Args:
+        sha1_hash (str): The SHA1 hash of the file.
+        fingerprint (dict or None): The 'loader', 'mod_id', 'name' and 'version' of the file, or None if it has no loader metadata.
+        project_id (str, optional): The Modrinth project the file was matched to. Defaults to None.
+    """
+    fingerprint = fingerprint or {}
+    with _lock:
+        connection = connect()
+        with connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO fingerprints (sha1, loader, mod_id, name, version, project_id, checked) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (sha1_hash, fingerprint.get('loader'), fingerprint.get('mod_id'), fingerprint.get('name'),
+                 fingerprint.get('version'), project_id, time.time())
+            )
+
+
+def get_fingerprint(sha1_hash):
+    """
+    Returns the recorded fingerprint of a file.
+
+    Args:
+        sha1_hash (str): The SHA1 hash of the file.
+
+    Returns:
+        dict or None: The 'loader', 'mod_id', 'name', 'version' and 'project_id' of the file, or None if it was never identified.
+    """
+    with _lock:
+        row = connect().execute(
+            'SELECT loader, mod_id, name, version, project_id FROM fingerprints WHERE sha1 = ?', (sha1_hash,)
+        ).fetchone()
+    return dict(zip(('loader', 'mod_id', 'name', 'version', 'project_id'), row)) if row else None
+
+
+def record_latest_versions(updates, game_version, loader):
+    """
+    Records the newest compatible version of local files for a game version and a loader.
+
+    Args:
+        updates (dict): The newest compatible `Version` by SHA1 hash, None for files without one.
+        game_version (str): The game version the files were checked against.
+        loader (str or None): The loader the files were checked against, several loaders separated by
+            commas, or None for no loader filter.
+    """
+    now = time.time()
+    with _lock:
+        connection = connect()
+        with connection:
+            for version in updates.values():
+                if version is not None:
+                    _store_version(connection, version)
+            connection.executemany(
+                'INSERT OR REPLACE INTO latest_versions (sha1, game_version, loader, version_id, checked) VALUES (?, ?, ?, ?, ?)',
+                [(sha1_hash, game_version or '', loader or '', version.id if version is not None else None, now)
+                 for sha1_hash, version in updates.items()]
+            )
+            # the files of the newest versions are known too, so a file placed by an update counts as checked
+            connection.executemany(
+                'INSERT OR REPLACE INTO file_versions (sha1, version_id, checked) VALUES (?, ?, ?)',
+                [(file.sha1, version.id, now) for version in updates.values() if version is not None for file in version.files]
+            )
+            connection.executemany(
+                'INSERT OR REPLACE INTO latest_versions (sha1, game_version, loader, version_id, checked) VALUES (?, ?, ?, ?, ?)',
+                [(file.sha1, game_version or '', loader or '', version.id, now)
+                 for version in updates.values() if version is not None for file in version.files]
+            )
+
+
+def start_run(run_id, game_version, loader):
+    """
+    Records the start of an update run.
+
+    Args:
+        run_id (str): The id of the run, the id of its transaction.
+        game_version (str): The detected game version.
+        loader (str): The detected loader.
+    """
+    with _lock:
+        connection = connect()
+        with connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO runs (id, started, state, game_version, loader) VALUES (?, ?, ?, ?, ?)',
+                (run_id, time.time(), 'running', game_version, loader)
+            )
+
+
+def record_event(run_id, category, action, path=None, detail=None):
+    """
+    Records what an update run did with a file, for example 'updated' or 'parked'.
+
+    Args:
+        run_id (str): The id of the run.
+        category (str): The category of the file, for example 'mods'.
+        action (str): The action.
+        path (str, optional): The path to the file. Defaults to None.
+        detail (str, optional): More information, for example the path of the new file. Defaults to None.
+    """
+    with _lock:
+        connection = connect()
+        with connection:
+            connection.execute(
+                'INSERT INTO run_events (run_id, time, category, action, path, detail) VALUES (?, ?, ?, ?, ?, ?)',
+                (run_id, time.time(), category, action, path, detail)
+            )
+
+
+def finish_run(run_id, state='finished'):
+    """
+    Records the end of an update run.
+
+    Args:
+        run_id (str): The id of the run.
+        state (str, optional): The final state of the run. Defaults to 'finished'.
+    """
+    with _lock:
+        connection = connect()
+        with connection:
+            connection.execute('UPDATE runs SET finished = ?, state = ? WHERE id = ?', (time.time(), state, run_id))
+
+
+def last_run():
+    """
+    Returns the last update run and what it did.
+
+    Returns:
+        dict or None: The run with its 'events', or None if there was no run yet.
+    """
+    with _lock:
+        connection = connect()
+        row = connection.execute(
+            'SELECT id, started, finished, state, game_version, loader FROM runs ORDER BY started DESC LIMIT 1'
+        ).fetchone()
+        if row is None:
+            return None
+        events = connection.execute(
+            'SELECT time, category, action, path, detail FROM run_events WHERE run_id = ? ORDER BY time', (row[0],)
+        ).fetchall()
+    run = dict(zip(('id', 'started', 'finished', 'state', 'game_version', 'loader'), row))
+    run['events'] = [dict(zip(('time', 'category', 'action', 'path', 'detail'), event)) for event in events]
+    return run
+
+
+def outdated_files(game_version, loader=None):
+    """
+    Returns the installed files whose last known newest compatible version is not the installed version.
+
+    Args:
+        game_version (str): The game version the files were checked against.
+        loader (str, optional): The mod loader the mods were checked against. Defaults to None, which
+            matches the checks without a loader filter. Resource packs and shaderpacks are checked
+            against the loaders of their content type, so this filter does not apply to them.
+
+    Returns:
+        list: One dict per outdated file with 'path', 'category', 'project_id', 'installed' and 'latest' version numbers.
+    """
+    with _lock:
+        rows = connect().execute(
+            'SELECT files.path, files.category, latest.project_id, installed.version_number, latest.version_number '
+            'FROM files '
+            'JOIN file_versions ON file_versions.sha1 = files.sha1 '
+            'JOIN latest_versions ON latest_versions.sha1 = files.sha1 AND latest_versions.game_version = ? '
+            "AND (latest_versions.loader = ? OR files.category != 'mods') "
+            'JOIN versions AS latest ON latest.id = latest_versions.version_id '
+            'LEFT JOIN versions AS installed ON installed.id = file_versions.version_id '
+            "WHERE files.status = 'installed' AND latest_versions.version_id IS NOT file_versions.version_id "
+            'ORDER BY files.category, files.path',
+            (game_version or '', loader or '')
+        ).fetchall()
+    return [dict(zip(('path', 'category', 'project_id', 'installed', 'latest'), row)) for row in rows]
+
+
+def outdated_projects(game_version, loader=None):
+    """
+    Returns the projects with at least one outdated installed file.
+
+    Args:
+        game_version (str): The game version the files were checked against.
+        loader (str, optional): The loader the files were checked against. Defaults to None.
+
+    Returns:
+        list: The project ids.
+    """
+    return sorted({file['project_id'] for file in outdated_files(game_version, loader)})
+
+
+def file_states(sha1_hashes):
+    """
+    Returns what the last checks found out about local files.
+
+    Args:
+        sha1_hashes (list): The SHA1 hashes of the local files.
+
+    Returns:
+        dict: By SHA1 hash, a dict with 'known' (False if Modrinth did not know the file, None if it was
+            never looked up), 'installed' and 'latest' version ids and numbers, and the 'game_version',
+            'loader' and 'checked' time of the newest update check, which are None if it was never checked.
+    """
+    states = {}
+    sha1_hashes = list(sha1_hashes)
+    with _lock:
+        connection = connect()
+        # SQLite allows a limited number of parameters per statement
+        for start in range(0, len(sha1_hashes), 500):
+            chunk = sha1_hashes[start:start + 500]
+            marks = ','.join('?' * len(chunk))
+            for sha1_hash in chunk:
+                states[sha1_hash] = {'known': None, 'installed': None, 'installed_number': None, 'latest': None,
+                                     'latest_number': None, 'game_version': None, 'loader': None, 'checked': None}
+            for sha1_hash, version_id, version_number in connection.execute(
+                'SELECT file_versions.sha1, file_versions.version_id, versions.version_number FROM file_versions '
+                f'LEFT JOIN versions ON versions.id = file_versions.version_id WHERE file_versions.sha1 IN ({marks})', chunk
+            ):
+                states[sha1_hash].update(known=version_id is not None, installed=version_id, installed_number=version_number)
+            for sha1_hash, version_id, version_number, game_version, loader, checked in connection.execute(
+                'SELECT latest_versions.sha1, latest_versions.version_id, versions.version_number, '
+                'latest_versions.game_version, latest_versions.loader, latest_versions.checked FROM latest_versions '
+                f'LEFT JOIN versions ON versions.id = latest_versions.version_id WHERE latest_versions.sha1 IN ({marks}) '
+                'ORDER BY latest_versions.checked', chunk
+            ):
+                # ordered by time, so the newest check of every file is applied last
+                states[sha1_hash].update(latest=version_id, latest_number=version_number,
+                                         game_version=game_version, loader=loader or None, checked=checked)
+    return states
+
+
+def parked_files():
+    """
+    Returns the files in the wait_for_update folders with their re-check schedule.
+
+    Returns:
+        list: One dict per parked file with 'path', 'category', 'attempts' and 'next_check'.
+    """
+    with _lock:
+        rows = connect().execute(
+            'SELECT files.path, files.category, wait_status.attempts, wait_status.next_check FROM files '
+            'LEFT JOIN wait_status ON wait_status.sha1 = files.sha1 '
+            "WHERE files.status = 'wait_for_update' ORDER BY files.category, files.path"
+        ).fetchall()
+    return [dict(zip(('path', 'category', 'attempts', 'next_check'), row)) for row in rows]
+
+
+def unknown_files():
+    """
+    Returns the installed files Modrinth did not know when they were last checked.
+
+    Returns:
+        list: One dict per unknown file with 'path' and 'category'.
+    """
+    with _lock:
+        rows = connect().execute(
+            'SELECT files.path, files.category FROM files JOIN file_versions ON file_versions.sha1 = files.sha1 '
+            "WHERE files.status = 'installed' AND file_versions.version_id IS NULL ORDER BY files.category, files.path"
+        ).fetchall()
+    return [dict(zip(('path', 'category'), row)) for row in rows]
+
+
+def main(argv=None):
+    """
+    Command line entry point of the state database: `python -m modrinth_updater.state_db last-run`.
+    """
+    parser = argparse.ArgumentParser(prog='python -m modrinth_updater.state_db', description='Query the state of the updater.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('last-run', help='show what the last update run did')
+    outdated_parser = subparsers.add_parser('outdated', help='list the outdated files known from the last checks')
+    outdated_parser.add_argument('game_version')
+    outdated_parser.add_argument('--loader')
+    args = parser.parse_args(argv)
+    if args.command == 'last-run':
+        run = last_run()
+        if run is None:
+            print('⚠️  There was no update run yet.')
+            return 1
+        started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(run['started']))
+        print(f"{run['id']}  {started}  {run['state']}  {run['loader']}-{run['game_version']}")
+        for event in run['events']:
+            print(f"  {event['action']:<10} {event['category'] or '':<14} {os.path.basename(event['path'] or '')}")
+    elif args.command == 'outdated':
+        for file in outdated_files(args.game_version, args.loader):
+            print(f"{file['category']:<14} {os.path.basename(file['path'])}  {file['installed']} -> {file['latest']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import os
+import sys
+import json
+import time
+import argparse
+from modrinth_updater import state_db
+from modrinth_updater.config import default_minecraft_path
+from modrinth_updater.scanner import scan_managed_folders
+from modrinth_updater.hash_utils import cached_sha1_hash
+
+
+def collect_status(path=default_minecraft_path):
+    """
+    Sorts the managed files by what the last checks found out about them, without network access.
+
+    Only the directory scan and the state database are used. Files which are new or changed since
+    they were last hashed are not hashed again, they are reported as not checked.
+
+    Args:
+        path (str, optional): The path to the Minecraft directory. Defaults to the global variable `default_minecraft_path`.
+
+    Returns:
+        dict: Lists of file dicts ('category', 'name', 'path' and version details) under the keys
+            'outdated', 'up_to_date', 'no_compatible_version', 'unknown', 'not_checked' and 'parked',
+            and the 'checked' time of the oldest check, so the report is at least as fresh as that time.
+    """
+    scan = scan_managed_folders(path)
+    hashes = {}
+    for folders in scan.values():
+        for entries in folders.values():
+            for entry in entries:
+                sha1_hash = cached_sha1_hash(entry.path, entry.size, entry.mtime_ns, entry.inode)
+                if sha1_hash is not None:
+                    hashes[entry.path] = sha1_hash
+    states = state_db.file_states(set(hashes.values()))
+    schedule = state_db.load_wait_status()
+
+    report = {key: [] for key in ('outdated', 'up_to_date', 'no_compatible_version', 'unknown', 'not_checked', 'parked')}
+    checked_times = []
+    for category, folders in scan.items():
+        for entry in folders['wait_for_update']:
+            wait = schedule.get(hashes.get(entry.path), {})
+            report['parked'].append({'category': category, 'name': entry.name, 'path': entry.path, 'next_check': wait.get('next_check')})
+        for entry in folders['installed']:
+            file = {'category': category, 'name': entry.name, 'path': entry.path}
+            state = states.get(hashes.get(entry.path))
+            if state is None:
+                report['not_checked'].append(file)
+                continue
+            file.update(installed=state['installed_number'], latest=state['latest_number'],
+                        game_version=state['game_version'], loader=state['loader'])
+            if state['checked'] is not None:
+                checked_times.append(state['checked'])
+            if state['known'] is False:
+                fingerprint = state_db.get_fingerprint(hashes[entry.path]) or {}
+                file.update(mod_id=fingerprint.get('mod_id'), project_id=fingerprint.get('project_id'))
+                report['unknown'].append(file)
+            elif state['checked'] is None:
+                report['not_checked'].append(file)
+            elif state['latest'] is None:
+                report['no_compatible_version'].append(file)
+            elif state['latest'] == state['installed']:
+                report['up_to_date'].append(file)
+            else:
+                report['outdated'].append(file)
+    report['checked'] = min(checked_times) if checked_times else None
+    return report
+
+
+def print_status(report):
+    """
+    Prints a status report returned by `collect_status`.
+    """
+    for file in report['outdated']:
+        print(f"🚀 {file['name']} can be updated: {file['installed'] or '?'} -> {file['latest']}")
+    for file in report['no_compatible_version']:
+        print(f"⚠️  {file['name']} has no version for {file['loader'] or 'any loader'}-{file['game_version']}.")
+    for file in report['unknown']:
+        match = f", it looks like the project {file['project_id']}" if file.get('project_id') else ''
+        print(f"❓ {file['name']} is not known by Modrinth{match}.")
+    for file in report['parked']:
+        due = time.strftime('%Y-%m-%d %H:%M', time.localtime(file['next_check'])) if file['next_check'] else 'the next run'
+        print(f"⏳ {file['name']} waits for an update, next check: {due}.")
+    if report['not_checked']:
+        print(f"🔍 {len(report['not_checked'])} files were not checked yet, run the check or update command.")
+    if report['checked']:
+        checked = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(report['checked']))
+        print(f'Oldest check: {checked}')
+    if report['outdated']:
+        print(f"❗️ {len(report['outdated'])} files can be updated.")
+    else:
+        print('✅ Nothing is known to be outdated.')
+
+
+def main(argv=None):
+    """
+    Command line entry point of the status report: `python -m modrinth_updater.status`.
+
+    The exit code is 1 when a file is known to be outdated, so monitoring can use it directly.
+    """
+    parser = argparse.ArgumentParser(prog='python -m modrinth_updater.status', description='Report outdated, parked and unknown files from the local state only.')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+    if not os.path.exists(state_db.STATE_DATABASE):
+        print('⚠️  There is no local state yet, run the check or update command first.')
+        return 2
+    report = collect_status()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_status(report)
+    return 1 if report['outdated'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
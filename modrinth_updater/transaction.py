@@ -0,0 +1,445 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import urllib.parse
+from modrinth_updater import state_db, metrics
+from modrinth_updater.config import default_minecraft_path
+from modrinth_updater.downloads import DownloadScheduler, CATEGORY_PRIORITY
+from modrinth_updater.hash_utils import get_sha1_hash
+from modrinth_updater.backup_store import object_path, store_file, restore_file, write_generation, list_generations, prune_generations
+
+TRANSACTIONS_FOLDER = os.path.join(default_minecraft_path, 'modrinth_updater', 'transactions')
+STAGING_FOLDER = os.path.join(default_minecraft_path, 'modrinth_updater', 'staging')
+
+
+class Transaction:
+    """
+    Applies the updates of one run as a unit.
+
+    Every download is queued first. On commit the downloads are fetched by the download scheduler
+    one priority tier at a time (mods, then datapacks, then resource packs and shaderpacks) and
+    every tier is swapped into the instance with atomic renames as soon as it is downloaded, so
+    the mods are in place before the big packs arrive. Files parked in or taken out of the
+    wait_for_update folders are moved right away by `move`. Each step is written to a journal before the next one starts, so an interrupted run
+    can be rolled back by `recover_transactions` and a finished run by `rollback`.
+
+    The journal is stored in 'modrinth_updater/transactions/<run_id>.json'. The replaced files are
+    moved into the backup store and the committed run becomes a backup generation with the same id.
+    """
+
+    def __init__(self, run_id=None):
+        self.run_id = run_id or f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}'
+        self.journal_path = os.path.join(TRANSACTIONS_FOLDER, f'{self.run_id}.json')
+        self.staging_folder = os.path.join(STAGING_FOLDER, self.run_id)
+        self.state = 'staging'
+        self.operations = []
+
+    @classmethod
+    def load(cls, journal_path):
+        """
+        Loads a transaction from its journal.
+
+        Args:
+            journal_path (str): The path to the journal file.
+
+        Returns:
+            Transaction: The loaded transaction.
+        """
+        with open(journal_path, 'r') as file:
+            journal = json.load(file)
+        transaction = cls(journal['run_id'])
+        transaction.state = journal['state']
+        transaction.operations = journal['operations']
+        return transaction
+
+    def _write(self):
+        """
+        Writes the journal to the disk and flushes it, so it survives a crash right after the call.
+        """
+        if not os.path.exists(TRANSACTIONS_FOLDER):
+            os.makedirs(TRANSACTIONS_FOLDER)
+        temp_path = f'{self.journal_path}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump({'run_id': self.run_id, 'state': self.state, 'operations': self.operations}, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.journal_path)
+
+    def stage(self, category, old_path, url, target_folder, size=None, download_sha1=None):
+        """
+        Queues the download of the new version of a file into the staging folder without touching the instance.
+
+        The queued files are downloaded together by `download`, at the latest when the transaction is committed.
+
+        Args:
+            category (str): The category of the file, for example 'mods'.
+            old_path (str): The path to the file which is replaced.
+            url (str): The download URL of the new version.
+            target_folder (str): The folder the new version is placed in.
+            size (int, optional): The size of the new version in bytes, used to order the downloads. Defaults to None.
+            download_sha1 (str, optional): The SHA1 hash of the new version, the download is dropped if it does not match. Defaults to None.
+
+        Returns:
+            str: The path the file is staged at.
+
+        Raises:
+            HashError: If the old file cannot be read.
+        """
+        sha1_hash = get_sha1_hash(old_path)
+        file_name = urllib.parse.unquote(os.path.basename(url))
+        staging_folder = os.path.join(self.staging_folder, str(len(self.operations)))
+        if not os.path.exists(staging_folder):
+            os.makedirs(staging_folder)
+        staged_path = os.path.join(staging_folder, file_name)
+        self.operations.append({
+            'category': category,
+            'action': 'update',
+            'old_path': old_path,
+            'staged_path': staged_path,
+            'new_path': os.path.join(target_folder, file_name),
+            'sha1': sha1_hash,
+            'size': os.path.getsize(old_path),
+            'url': url,
+            'download_size': size,
+            'download_sha1': download_sha1,
+            'state': 'pending',
+        })
+        self._write()
+        return staged_path
+
+    def move(self, category, old_path, new_path):
+        """
+        Moves a file within the instance right away, for example into the wait_for_update folder.
+
+        The move is journaled before and after the file is moved, so `rollback`, `discard` and
+        `recover_transactions` move the file back.
+
+        Args:
+            category (str): The category of the file, for example 'mods'.
+            old_path (str): The path to the file which is moved.
+            new_path (str): The path the file is moved to.
+
+        Raises:
+            OSError: If the file cannot be moved, the move is dropped from the journal.
+        """
+        operation = {'category': category, 'action': 'move', 'old_path': old_path, 'new_path': new_path, 'state': 'pending'}
+        self.operations.append(operation)
+        self._write()
+        try:
+            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            shutil.move(old_path, new_path)
+        except OSError:
+            self.operations.remove(operation)
+            self._write()
+            raise
+        operation['state'] = 'applied'
+        self._write()
+
+    def _updates(self):
+        """
+        Returns the operations which replace a file with a downloaded version, journals of older
+        versions have no 'action' and only contain those.
+        """
+        return [operation for operation in self.operations if operation.get('action', 'update') == 'update']
+
+    def _undo_move(self, operation):
+        """
+        Moves the file of a move operation back to its old path.
+        """
+        # a crash right after the move and before the journal write leaves a 'pending' operation with the file moved
+        moved = operation['state'] == 'pending' and not os.path.exists(operation['old_path']) and os.path.exists(operation['new_path'])
+        if operation['state'] == 'applied' or moved:
+            os.makedirs(os.path.dirname(operation['old_path']), exist_ok=True)
+            shutil.move(operation['new_path'], operation['old_path'])
+            operation['state'] = 'restored'
+            self._write()
+
+    def download(self, scheduler=None, categories=None):
+        """
+        Downloads the queued files into the staging folder.
+
+        A file which cannot be downloaded or does not match its SHA1 hash is dropped from the transaction,
+        so its old version stays in place.
+
+        Args:
+            scheduler (DownloadScheduler, optional): The scheduler to use. Defaults to one configured by the .env file.
+            categories (collection, optional): Only the files of these categories are downloaded. Defaults to None, which means every file.
+
+        Returns:
+            int: The number of failed downloads.
+        """
+        pending = [operation for operation in self._updates() if operation['state'] == 'pending'
+                   and (categories is None or operation['category'] in categories)]
+        if not pending:
+            return 0
+        scheduler = scheduler or DownloadScheduler()
+        jobs = {}
+        for operation in pending:
+            job = scheduler.add(operation['url'], os.path.dirname(operation['staged_path']), os.path.basename(operation['staged_path']),
+                                operation['download_size'], operation['category'], operation.get('download_sha1'))
+            jobs[id(job)] = operation
+        failed = 0
+        for job, error in scheduler.run():
+            operation = jobs[id(job)]
+            if error is None:
+                operation['state'] = 'staged'
+            else:
+                print(f"⚠️  Cannot download the new version of {os.path.basename(operation['old_path'])}, it is kept: {error}")
+                self.operations.remove(operation)
+                failed += 1
+        self._write()
+        return failed
+
+    def _apply(self, operation):
+        """
+        Moves the replaced file of a staged operation to the backup store and swaps the new file in.
+        """
+        if operation['state'] == 'staged':
+            store_file(operation['old_path'], operation['sha1'])
+            operation['state'] = 'backed_up'
+            self._write()
+        if operation['state'] == 'backed_up':
+            os.replace(operation['staged_path'], operation['new_path'])
+            operation['state'] = 'applied'
+            self._write()
+            state_db.record_event(self.run_id, operation['category'], 'updated', operation['old_path'], operation['new_path'])
+            metrics.UPDATES_APPLIED.inc(category=operation['category'])
+            print(f"📦 Old file moved to the backup store: {os.path.basename(operation['old_path'])}")
+
+    def commit(self):
+        """
+        Downloads the queued files one priority tier at a time and swaps every tier into the instance
+        as soon as it is downloaded, moving the replaced files to the backup store.
+
+        The run is recorded as a backup generation and the generations outside the retention
+        policy are pruned together with their journals.
+        """
+        if not self.operations:
+            self.discard()
+            return
+        self.state = 'applying'
+        self._write()
+        tiers = {}
+        for category in {operation['category'] for operation in self._updates()}:
+            tiers.setdefault(CATEGORY_PRIORITY.get(category, 1), set()).add(category)
+        for priority in sorted(tiers):
+            self.download(categories=tiers[priority])
+            for operation in self._updates():
+                if operation['category'] in tiers[priority]:
+                    self._apply(operation)
+        if not self.operations:
+            self.discard()
+            return
+        # a run which only moved files has nothing in the backup store
+        if self._updates():
+            write_generation(self.run_id, [
+                {
+                    'category': operation['category'],
+                    'original_path': operation['old_path'],
+                    'replaced_by': operation['new_path'],
+                    'sha1': operation['sha1'],
+                    'size': operation['size'],
+                }
+                for operation in self._updates()
+            ])
+        self.state = 'committed'
+        self._write()
+        shutil.rmtree(self.staging_folder, ignore_errors=True)
+        prune_journals(prune_generations())
+
+    def discard(self):
+        """
+        Drops the staged downloads of a transaction which was never applied and moves the moved files back.
+        """
+        for operation in reversed(self.operations):
+            if operation.get('action') == 'move':
+                self._undo_move(operation)
+        shutil.rmtree(self.staging_folder, ignore_errors=True)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def rollback(self):
+        """
+        Restores the files replaced by this transaction from the backup store and moves the moved files back.
+
+        The backups are hardlinked back into place, so they stay available and nothing is downloaded again.
+        The journal is removed once every file is back.
+        """
+        for operation in reversed(self.operations):
+            if operation.get('action') == 'move':
+                self._undo_move(operation)
+                continue
+            # a crash right after the swap and before the journal write leaves a 'backed_up' operation without its staged file
+            swapped = operation['state'] == 'backed_up' and not os.path.exists(operation['staged_path'])
+            if (operation['state'] == 'applied' or swapped) and os.path.exists(operation['new_path']):
+                os.remove(operation['new_path'])
+            # a crash right after the backup and before the journal write leaves a 'staged' operation without its old file
+            moved = operation['state'] == 'staged' and not os.path.exists(operation['old_path']) and os.path.exists(object_path(operation['sha1']))
+            if operation['state'] in ('applied', 'backed_up') or moved:
+                restore_file(operation['sha1'], operation['old_path'])
+                operation['state'] = 'restored'
+                self._write()
+        self.state = 'rolled_back'
+        self._write()
+        state_db.record_event(self.run_id, None, 'rolled_back')
+        shutil.rmtree(self.staging_folder, ignore_errors=True)
+        os.remove(self.journal_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+        return False
+
+
+def apply_update(transaction, category, old_path, url, target_folder, size=None, download_sha1=None):
+    """
+    Stages an update in the given transaction, or applies it right away if there is no transaction.
+
+    Args:
+        transaction (Transaction or None): The transaction of the current run.
+        category (str): The category of the file, for example 'mods'.
+        old_path (str): The path to the file which is replaced.
+        url (str): The download URL of the new version.
+        target_folder (str): The folder the new version is placed in.
+        size (int, optional): The size of the new version in bytes. Defaults to None.
+        download_sha1 (str, optional): The SHA1 hash of the new version. Defaults to None.
+    """
+    if transaction is None:
+        with Transaction() as transaction:
+            transaction.stage(category, old_path, url, target_folder, size, download_sha1)
+    else:
+        transaction.stage(category, old_path, url, target_folder, size, download_sha1)
+
+
+def move_file(transaction, category, old_path, new_path):
+    """
+    Moves a file in the given transaction, or in a transaction of its own if there is no transaction.
+
+    Args:
+        transaction (Transaction or None): The transaction of the current run.
+        category (str): The category of the file, for example 'mods'.
+        old_path (str): The path to the file which is moved.
+        new_path (str): The path the file is moved to.
+    """
+    if transaction is None:
+        with Transaction() as transaction:
+            transaction.move(category, old_path, new_path)
+    else:
+        transaction.move(category, old_path, new_path)
+
+
+def list_transactions():
+    """
+    Returns every transaction with a journal, from the oldest to the newest.
+
+    Returns:
+        list: The loaded transactions.
+    """
+    if not os.path.exists(TRANSACTIONS_FOLDER):
+        return []
+    journals = sorted(name for name in os.listdir(TRANSACTIONS_FOLDER) if name.endswith('.json'))
+    return [Transaction.load(os.path.join(TRANSACTIONS_FOLDER, name)) for name in journals]
+
+
+def prune_journals(removed_generations=()):
+    """
+    Removes the journals of the committed runs which can no longer be rolled back.
+
+    These are the runs whose backup generation was pruned and the runs older than the oldest kept
+    generation, which includes the runs which only moved files. The newest committed run is always kept.
+
+    Args:
+        removed_generations (collection, optional): The ids of the generations which were just pruned. Defaults to ().
+    """
+    generations = list_generations()
+    oldest = generations[-1]['id'] if generations else None
+    committed = [transaction for transaction in list_transactions() if transaction.state == 'committed']
+    for transaction in committed[:-1]:
+        if transaction.run_id in removed_generations or (oldest is not None and transaction.run_id < oldest):
+            os.remove(transaction.journal_path)
+
+
+def recover_transactions():
+    """
+    Rolls back every transaction interrupted by a crash, so the instance never keeps two versions of a file.
+
+    The files moved by an interrupted run are moved back, and the journals left by a crash at the
+    end of a rollback are removed.
+
+    Returns:
+        int: The number of recovered transactions.
+    """
+    recovered = 0
+    for transaction in list_transactions():
+        if transaction.state == 'staging':
+            transaction.discard()
+            recovered += 1
+        elif transaction.state == 'applying':
+            print(f'⚠️  Rolling back the interrupted update run {transaction.run_id}...')
+            transaction.rollback()
+            recovered += 1
+        elif transaction.state == 'rolled_back':
+            os.remove(transaction.journal_path)
+    return recovered
+
+
+def rollback(run_id=None):
+    """
+    Restores the files replaced by the last committed run, or by the given run.
+
+    Only the last committed run can be rolled back, the runs after an older run may have replaced
+    or moved the same files again. Rolling back the runs one after the other goes further back.
+
+    Args:
+        run_id (str, optional): The run to roll back. Defaults to None, which rolls back the last committed run.
+
+    Returns:
+        Transaction or None: The rolled back transaction, or None if there was nothing to roll back.
+
+    Raises:
+        ValueError: If the given run is not the last committed run.
+    """
+    committed = [t for t in list_transactions() if t.state == 'committed']
+    matching = [t for t in committed if run_id in (None, t.run_id)]
+    if not matching:
+        return None
+    transaction = matching[-1]
+    if transaction is not committed[-1]:
+        newer = ', '.join(t.run_id for t in committed[committed.index(transaction) + 1:])
+        raise ValueError(f'The update run {run_id} is not the last one, roll back {newer} first.')
+    transaction.rollback()
+    return transaction
+
+
+def main(argv=None):
+    """
+    Command line entry point of the transactions: `python -m modrinth_updater.transaction rollback`.
+    """
+    parser = argparse.ArgumentParser(prog='python -m modrinth_updater.transaction', description='Manage the update transactions.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    rollback_parser = subparsers.add_parser('rollback', help='restore the files replaced by the last update run')
+    rollback_parser.add_argument('run_id', nargs='?', help='the run to roll back, defaults to the last one')
+    args = parser.parse_args(argv)
+    if args.command == 'rollback':
+        try:
+            transaction = rollback(args.run_id)
+        except ValueError as e:
+            print(f'⚠️  {e}')
+            return 1
+        if transaction is None:
+            print('⚠️  There is no update run to roll back.')
+            return 1
+        print(f'✅ The update run {transaction.run_id} has been rolled back.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+from modrinth_updater.config import (
+    env_run_mods_update,
+    env_run_resourepacks_update,
+    env_run_shaderpacks_update,
+    env_metrics_textfile
+)
+from modrinth_updater.file_utils import (
+    get_current_fabric_version,
+    get_current_loader,
+    get_content_loaders,
+)
+from modrinth_updater.scanner import scan_managed_folders
+from modrinth_updater.hash_utils import hash_entries, save_hash_cache
+from modrinth_updater.transaction import Transaction, recover_transactions
+from modrinth_updater.modrinth_api import check_updates_bulk, is_negatively_cached
+from modrinth_updater import recheck_schedule, state_db, metrics, profiling
+from modrinth_updater.profiling import stage
+from modrinth_updater.fingerprint import match_unknown_files
+from modrinth_updater.services.mods import (
+    check_updateable_mods,
+    check_wait_for_update_mods
+)
+from modrinth_updater.services.resourcepacks import (
+    check_updateable_resourcepacks,
+    check_wait_for_update_resourcepacks
+)
+from modrinth_updater.services.shaderpacks import (
+    check_updateable_shaderpacks,
+    check_wait_for_update_shaderpacks
+)
+
+
+def recheck_wait_for_update(entries, hashes, game_version, loaders, check, transaction):
+    """
+    Re-checks the parked files of one category which are due according to the re-check schedule.
+
+    Every due file is checked with one bulk request. Files without a compatible version are
+    scheduled again with a longer wait, files with a compatible version are updated by `check`.
+
+    Args:
+        entries (list): The `ScanEntry` items of the wait_for_update folder.
+        hashes (dict): The SHA1 hash by file path.
+        game_version (str): The current game version.
+        loaders (list or None): The loaders the updates have to support, or None for no loader filter.
+            The schedule is keyed on them, so installing a loader makes the parked files due again.
+        check (callable): The service function updating a parked file.
+        transaction (Transaction): The transaction of the current run.
+
+    Returns:
+        bool: True if any update returned an error.
+    """
+    loader = ','.join(loaders or [])
+    due = [entry for entry in entries if entry.path in hashes and recheck_schedule.is_due(hashes[entry.path], game_version, loader)]
+    if len(due) < len(entries):
+        print(f'⏳ {len(entries) - len(due)} files are not due for a re-check yet.')
+    if not due:
+        return False
+    updates = check_updates_bulk([hashes[entry.path] for entry in due], [game_version], loaders)
+    if updates is None:
+        return False
+    update_in_progres = False
+    for entry in due:
+        sha1_hash = hashes[entry.path]
+        if sha1_hash not in updates:
+            recheck_schedule.record_not_compatible(sha1_hash, game_version, loader)
+            continue
+        recheck_schedule.forget(sha1_hash)
+        # the bulk answer is passed on, so the service does not ask Modrinth again
+        if check(entry.path, game_version, loaders, transaction, latest=updates[sha1_hash]):
+            update_in_progres = True
+    return update_in_progres
+
+def enabled_categories():
+    """
+    Returns which managed categories are enabled in the .env file.
+
+    Returns:
+        dict: True for every enabled category.
+    """
+    return {
+        'mods': env_run_mods_update == "true",
+        'resourcepacks': env_run_resourepacks_update == "true",
+        'shaderpacks': env_run_shaderpacks_update == "true",
+    }
+
+def write_metrics():
+    """
+    Writes the metrics of the run to the textfile configured by `METRICS_TEXTFILE`, if there is one.
+    """
+    if env_metrics_textfile:
+        try:
+            metrics.write_textfile(env_metrics_textfile)
+        except OSError as e:
+            print(f'⚠️  Cannot write the metrics file: {e}')
+
+def record_moves(run_id, before, after):
+    """
+    Records the files a run parked in or brought back from the wait_for_update folders.
+
+    Args:
+        run_id (str): The id of the run.
+        before (dict): The scan of the managed folders at the start of the run.
+        after (dict): The scan of the managed folders at the end of the run.
+    """
+    for category, folders in after.items():
+        for status, action in (('wait_for_update', 'parked'), ('installed', 'restored')):
+            other = 'installed' if status == 'wait_for_update' else 'wait_for_update'
+            previous = {entry.name for entry in before[category][other]}
+            for entry in folders[status]:
+                if entry.name in previous:
+                    state_db.record_event(run_id, category, action, entry.path)
+                    if action == 'parked':
+                        metrics.FILES_PARKED.inc(category=category)
+
+def update():
+    """
+    Main function to update mods, resourcepacks and shaderpacks based on
+    the Modrinth API.
+
+    This function will check if the mods, resourcepacks and shaderpacks in the
+    Minecraft folder are up to date. If they are not, it will download the latest
+    version and move the old file to the 'wait_for_update' folder. If the file
+    is in the 'wait_for_update' folder, it will check if the file is now
+    compatible with the current Minecraft version and loader, and if it is,
+    it will move the file back to the mods folder. Parked files are only re-checked when
+    they are due according to the re-check schedule, all of them with one bulk request.
+
+    The function will also print some information about what it is doing and
+    if everything is up to date or not.
+
+    """
+    profiling.subscribe(metrics.record_stage)
+    with stage('recover'):
+        recover_transactions()
+    transaction = Transaction()
+    with stage('detect'):
+        loader = get_current_loader()
+        loader_version = get_current_fabric_version()
+    state_db.start_run(transaction.run_id, loader_version, loader)
+    with stage('scan'):
+        scan = scan_managed_folders()
+    enabled = enabled_categories()
+    # hash every new or changed file in parallel once, the services reuse the cached hashes
+    with stage('hash'):
+        hashes = hash_entries([entry for category, folders in scan.items() if enabled[category]
+                      for entries in folders.values() for entry in entries], prune=True)
+
+    update_in_progres = False
+
+    # mods update
+    with stage('mods'):
+        if env_run_mods_update == "true":
+            # if the wait_for_update mods folder has files
+            if scan['mods']['wait_for_update']:
+                print('❗️ Checking updateable mods in the wait_for_update folder...')
+                if recheck_wait_for_update(scan['mods']['wait_for_update'], hashes, loader_version, get_content_loaders('mods', loader), check_wait_for_update_mods, transaction):
+                    update_in_progres = True
+            print('❗️ Checking updateable mods in the mods folder...')
+            # updating mods at the original mods folder
+            for mod_file in scan['mods']['installed']:
+                updatable_mod = check_updateable_mods(mod_file.path, loader_version, loader, transaction)
+                if updatable_mod:
+                    update_in_progres = True
+            print('✅ Every mods are up to date')
+        elif env_run_mods_update == "false":
+            print('⚠️  Mods updater is disabled in the .env file!')
+
+    # resourcepacks update
+    with stage('resourcepacks'):
+        if env_run_resourepacks_update == "true":
+            resource_pack_loaders = get_content_loaders('resourcepacks')
+            # if the wait_for_update resourcepacks folder has files
+            if scan['resourcepacks']['wait_for_update']:
+                print('❗️ Checking updateable resource packs in the wait_for_update folder...')
+                if recheck_wait_for_update(scan['resourcepacks']['wait_for_update'], hashes, loader_version, resource_pack_loaders, check_wait_for_update_resourcepacks, transaction):
+                    update_in_progres = True
+            print('❗️ Checking updateable resource packs in the resourcepacks folder...')
+            # updating resourcepacks at the original resource_pack folder
+            for resource_pack_file in scan['resourcepacks']['installed']:
+                updatable_resource_packs = check_updateable_resourcepacks(resource_pack_file.path, loader_version, resource_pack_loaders, transaction)
+                if updatable_resource_packs:
+                    update_in_progres = True
+            print('✅ Every resoucepacks are up to date')
+        elif env_run_resourepacks_update == "false":
+            print('⚠️  Resourcepacks updater is disabled in the .env file!')
+
+    # shaderpacks update
+    with stage('shaderpacks'):
+        if env_run_shaderpacks_update == "true":
+            # shaderpacks are checked against the installed shader loader, not the mod loader
+            shaderpack_loaders = get_content_loaders('shaderpacks')
+            # if the wait_for_update shaderpacks folder has files
+            if scan['shaderpacks']['wait_for_update']:
+                print('❗️ Checking updateable shaderpacks in the wait_for_update folder...')
+                if recheck_wait_for_update(scan['shaderpacks']['wait_for_update'], hashes, loader_version, shaderpack_loaders, check_wait_for_update_shaderpacks, transaction):
+                    update_in_progres = True
+            print('❗️ Checking updateable shaderpacks in the shaderpacks folder...')
+            # updating shaderpacks at the original shaderpacks folder
+            for shaderpack_file in scan['shaderpacks']['installed']:
+                updatable_shaderpacks = check_updateable_shaderpacks(shaderpack_file.path, loader_version, shaderpack_loaders, transaction)
+                if updatable_shaderpacks:
+                    update_in_progres = True
+            print('✅ Every shaderpacks are up to date')
+        elif env_run_shaderpacks_update == "false":
+            print('⚠️  Shaderpacks updater is disabled in the .env file!')
+
+    # identify the new jars Modrinth does not know by hash, all of them with one bulk request
+    if enabled['mods']:
+        with stage('fingerprint'):
+            for match in match_unknown_files(scan['mods']['installed'], hashes):
+                if match['project']:
+                    print(f"🔎 {match['name']} looks like the Modrinth project '{match['project']['slug']}', download it from Modrinth to get updates.")
+
+    # download the queued updates tier by tier, mods first, and swap every tier in as soon as it is downloaded
+    with stage('commit'):
+        transaction.commit()
+    with stage('save_state'):
+        final_scan = scan_managed_folders()
+        record_moves(transaction.run_id, scan, final_scan)
+        hash_entries([entry for category, folders in final_scan.items() if enabled[category]
+                      for entries in folders.values() for entry in entries], prune=True)
+        save_hash_cache()
+        recheck_schedule.save_schedule()
+        state_db.finish_run(transaction.run_id)
+    write_metrics()
+
+    if not update_in_progres:
+        print('✅ Everything is up to date!')
+
+def check():
+    """
+    Reports the installed files which have a newer compatible version, without changing anything.
+
+    Every enabled category is checked with one bulk request. The answers are stored in the state
+    database, so later `status` calls can report them without network access.
+
+    Returns:
+        int or None: The number of files with an update, or None if a check failed.
+    """
+    profiling.subscribe(metrics.record_stage)
+    loader = get_current_loader()
+    loader_version = get_current_fabric_version()
+    with stage('scan'):
+        scan = scan_managed_folders()
+    enabled = enabled_categories()
+    with stage('hash'):
+        hashes = hash_entries([entry for category, folders in scan.items() if enabled[category]
+                      for entries in folders.values() for entry in entries], prune=True)
+        save_hash_cache()
+
+    outdated = 0
+    for category, folders in scan.items():
+        if not enabled[category]:
+            continue
+        installed = [entry for entry in folders['installed'] if entry.path in hashes]
+        # files Modrinth did not know at their last lookup are not incompatible, they are not hosted there
+        unknown = [entry for entry in installed if is_negatively_cached(hashes[entry.path])]
+        for entry in unknown:
+            print(f'ℹ️  {entry.name} is not hosted on Modrinth, it is skipped.')
+        installed = [entry for entry in installed if entry not in unknown]
+        loaders = get_content_loaders(category, loader)
+        with stage(category):
+            updates = check_updates_bulk([hashes[entry.path] for entry in installed], [loader_version], loaders)
+        if updates is None:
+            write_metrics()
+            return None
+        for entry in installed:
+            version = updates.get(hashes[entry.path])
+            if version is None:
+                print(f"⚠️  There is no compatible version of {entry.name} for {'/'.join(loaders or ['any loader'])}-{loader_version}.")
+            elif all(file.sha1 != hashes[entry.path] for file in version.files):
+                print(f'🚀 {entry.name} can be updated to {version.version_number}.')
+                outdated += 1
+    if outdated:
+        print(f'❗️ {outdated} files can be updated, run the update command to apply them.')
+    else:
+        print('✅ Everything is up to date!')
+    write_metrics()
+    return outdated
\ No newline at end of file
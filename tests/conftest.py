@@ -0,0 +1,50 @@
+import tempfile
+import threading
+import functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+import pytest
+from modrinth_updater.config import load_config
+from modrinth_updater.fleet import INSTANCE_SETTINGS
+
+# The settings are loaded once per process, so every module under test works in this throwaway
+# Minecraft folder instead of the one of the user. The tests which write files redirect their
+# folders into the temporary folder of the test on top of that.
+MINECRAFT_PATH = tempfile.mkdtemp(prefix='modrinth_updater_tests_')
+load_config({name: MINECRAFT_PATH for name in INSTANCE_SETTINGS})
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """
+    Redirects the backup store, the journals and the staging folder into the temporary folder of the test.
+    """
+    from modrinth_updater import backup_store, transaction
+    monkeypatch.setattr(backup_store, 'OBJECTS_FOLDER', str(tmp_path / 'backups' / 'objects'))
+    monkeypatch.setattr(backup_store, 'GENERATIONS_FOLDER', str(tmp_path / 'backups' / 'generations'))
+    monkeypatch.setattr(transaction, 'TRANSACTIONS_FOLDER', str(tmp_path / 'transactions'))
+    monkeypatch.setattr(transaction, 'STAGING_FOLDER', str(tmp_path / 'staging'))
+    return tmp_path
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def file_server(tmp_path):
+    """
+    Serves a folder over HTTP, standing in for the Modrinth CDN.
+
+    Yields:
+        tuple: The served folder and its base URL.
+    """
+    folder = tmp_path / 'cdn'
+    folder.mkdir()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(_QuietHandler, directory=str(folder)))
+    threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+    try:
+        yield folder, f'http://127.0.0.1:{server.server_address[1]}'
+    finally:
+        server.shutdown()
+        server.server_close()
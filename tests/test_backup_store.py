@@ -0,0 +1,66 @@
+import os
+import json
+import time
+from modrinth_updater import backup_store
+from modrinth_updater.backup_store import object_path, prune_generations, list_generations
+
+
+def _generation(generation_id, age_days, files):
+    """
+    Writes a generation of the given age with one stored object of the given size per SHA1 hash.
+    """
+    for sha1_hash, size in files.items():
+        os.makedirs(os.path.dirname(object_path(sha1_hash)), exist_ok=True)
+        with open(object_path(sha1_hash), 'wb') as file:
+            file.write(b'x' * size)
+    os.makedirs(backup_store.GENERATIONS_FOLDER, exist_ok=True)
+    manifest = {
+        'id': generation_id,
+        'created': time.time() - age_days * 86400,
+        'files': [{'category': 'mods', 'original_path': f'{sha1_hash}.jar', 'replaced_by': None, 'sha1': sha1_hash, 'size': size}
+                  for sha1_hash, size in files.items()],
+    }
+    with open(os.path.join(backup_store.GENERATIONS_FOLDER, f'{generation_id}.json'), 'w') as file:
+        json.dump(manifest, file)
+
+
+def _ids():
+    return [generation['id'] for generation in list_generations()]
+
+
+def test_the_oldest_generations_and_their_objects_are_pruned_by_count(store):
+    _generation('old', 3, {'a' * 40: 10})
+    _generation('middle', 2, {'b' * 40: 10})
+    _generation('new', 1, {'c' * 40: 10})
+
+    assert prune_generations(keep=2) == ['old']
+    assert _ids() == ['new', 'middle']
+    assert not os.path.exists(object_path('a' * 40))
+    assert os.path.exists(object_path('b' * 40))
+
+
+def test_an_object_shared_with_a_kept_generation_stays(store):
+    _generation('old', 2, {'a' * 40: 10, 'b' * 40: 10})
+    _generation('new', 1, {'a' * 40: 10})
+
+    assert prune_generations(keep=1) == ['old']
+    assert os.path.exists(object_path('a' * 40))
+    assert not os.path.exists(object_path('b' * 40))
+
+
+def test_shared_objects_count_once_towards_the_size_limit(store):
+    megabyte = 1024 * 1024
+    _generation('old', 2, {'a' * 40: megabyte})
+    _generation('new', 1, {'a' * 40: megabyte})
+
+    assert prune_generations(max_size_mb=1.5) == []
+    assert _ids() == ['new', 'old']
+
+
+def test_the_newest_generation_is_kept_beyond_the_age_and_size_limits(store):
+    _generation('old', 20, {'a' * 40: 10})
+    _generation('new', 10, {'b' * 40: 2 * 1024 * 1024})
+
+    assert prune_generations(max_age_days=5, max_size_mb=1) == ['old']
+    assert _ids() == ['new']
+    assert os.path.exists(object_path('b' * 40))
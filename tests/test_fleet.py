@@ -0,0 +1,104 @@
+import pytest
+from modrinth_updater import fleet
+from modrinth_updater.fleet import FleetQueue, LEASE_SECONDS, RETRY_BASE_SECONDS
+
+
+class Clock:
+    """
+    A clock which only moves when a test moves it.
+    """
+
+    def __init__(self):
+        self.now = 1000000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(fleet.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return FleetQueue(str(tmp_path / 'fleet.db'))
+
+
+def test_a_running_job_is_not_leased_twice_while_its_lease_holds(queue, clock):
+    job_id = queue.add('/instances/a')
+
+    assert queue.lease('w1')['id'] == job_id
+    clock.now += LEASE_SECONDS - 1
+    assert queue.lease('w2') is None
+
+
+def test_an_expired_lease_is_taken_over_by_another_worker(queue, clock):
+    job_id = queue.add('/instances/a')
+    queue.lease('w1')
+
+    clock.now += LEASE_SECONDS + 1
+    job = queue.lease('w2')
+
+    assert job['id'] == job_id
+    assert job['worker'] == 'w2'
+    assert job['attempts'] == 2
+    assert not queue.renew(job_id, 'w1')
+    assert queue.finish(job_id, 'w1') is None
+    assert queue.finish(job_id, 'w2') == 'done'
+
+
+def test_a_renewed_lease_is_not_taken_over(queue, clock):
+    job_id = queue.add('/instances/a')
+    queue.lease('w1')
+
+    clock.now += LEASE_SECONDS - 1
+    assert queue.renew(job_id, 'w1', log_path='/logs/a.log')
+    clock.now += LEASE_SECONDS - 1
+
+    assert queue.lease('w2') is None
+    assert queue.jobs()[0]['log_path'] == '/logs/a.log'
+
+
+def test_a_job_whose_worker_stopped_during_the_last_attempt_fails(queue, clock):
+    job_id = queue.add('/instances/a', max_attempts=1)
+    queue.lease('w1')
+
+    clock.now += LEASE_SECONDS + 1
+
+    assert queue.lease('w2') is None
+    job = queue.jobs()[0]
+    assert job['id'] == job_id
+    assert job['state'] == 'failed'
+    assert job['error'] == 'the worker w1 stopped during the last attempt'
+
+
+def test_a_failed_attempt_is_queued_again_with_a_growing_wait(queue, clock):
+    job_id = queue.add('/instances/a', max_attempts=3)
+
+    queue.lease('w1')
+    assert queue.finish(job_id, 'w1', error='boom') == 'queued'
+    assert queue.next_due() == RETRY_BASE_SECONDS
+    assert queue.lease('w1') is None
+
+    clock.now += RETRY_BASE_SECONDS
+    queue.lease('w1')
+    assert queue.finish(job_id, 'w1', error='boom') == 'queued'
+    assert queue.next_due() == 2 * RETRY_BASE_SECONDS
+
+    clock.now += 2 * RETRY_BASE_SECONDS
+    queue.lease('w1')
+    assert queue.finish(job_id, 'w1', error='boom') == 'failed'
+    assert queue.counts() == {'queued': 0, 'running': 0, 'done': 0, 'failed': 1}
+
+
+def test_an_instance_is_queued_only_once_while_its_job_is_active(queue, clock):
+    job_id = queue.add('/instances/a')
+
+    assert queue.add('/instances/a') is None
+    queue.lease('w1')
+    assert queue.add('/instances/a') is None
+    queue.finish(job_id, 'w1')
+    assert queue.add('/instances/a') is not None
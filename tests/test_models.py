@@ -0,0 +1,48 @@
+import json
+import pytest
+from modrinth_updater.models import Version, iter_version_map
+
+
+def _version(index):
+    return {
+        'id': f'version{index}',
+        'project_id': f'project{index}',
+        'name': f'Ünïcödé {index} 🚀',
+        'version_number': f'1.{index}.0',
+        'game_versions': ['1.21.4', '1.21.5'],
+        'loaders': ['fabric'],
+        'files': [{'url': f'https://cdn.modrinth.com/{index}.jar', 'filename': f'{index}.jar',
+                   'hashes': {'sha1': f'{index:040d}'}, 'size': index, 'primary': True}],
+        'dependencies': [{'project_id': 'fabric-api', 'dependency_type': 'required'}],
+    }
+
+
+ANSWER = {f'{index:040x}': _version(index) for index in range(5)}
+# indented, so whitespace falls on the chunk boundaries as well
+BODY = json.dumps(ANSWER, indent=1, ensure_ascii=False).encode('utf-8')
+
+
+def _chunks(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, len(BODY)])
+def test_every_chunk_size_gives_the_same_versions(size):
+    # sizes of 1 to 3 bytes also split the multi-byte UTF-8 characters
+    parsed = dict(iter_version_map(_chunks(BODY, size)))
+    assert parsed == {sha1_hash: Version.from_json(version) for sha1_hash, version in ANSWER.items()}
+    assert list(parsed) == list(ANSWER)
+
+
+def test_an_empty_answer_has_no_versions():
+    assert list(iter_version_map([b' { ', b'}'])) == []
+
+
+def test_an_answer_which_is_not_an_object_is_rejected():
+    with pytest.raises(ValueError):
+        list(iter_version_map([b'[]']))
+
+
+def test_a_truncated_answer_is_rejected():
+    with pytest.raises(ValueError):
+        list(iter_version_map(_chunks(BODY[:len(BODY) // 2], 16)))
@@ -0,0 +1,134 @@
+import os
+import hashlib
+import pytest
+from modrinth_updater.transaction import Transaction, recover_transactions, rollback, list_transactions
+from modrinth_updater.backup_store import store_file
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(content)
+    return str(path)
+
+
+def _read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+@pytest.fixture
+def instance(store, file_server):
+    """
+    An instance with one installed mod and a newer version of it on the fake CDN.
+    """
+    cdn_folder, base_url = file_server
+    mods_folder = str(store / 'mods')
+    old_path = _write(os.path.join(mods_folder, 'sodium-1.0.jar'), b'old version')
+    new_content = b'new version'
+    _write(os.path.join(cdn_folder, 'sodium-1.1.jar'), new_content)
+    return {
+        'mods_folder': mods_folder,
+        'old_path': old_path,
+        'new_path': os.path.join(mods_folder, 'sodium-1.1.jar'),
+        'url': f'{base_url}/sodium-1.1.jar',
+        'sha1': hashlib.sha1(new_content).hexdigest(),
+        'wait_path': str(store / 'wait_for_update' / 'sodium-1.0.jar'),
+    }
+
+
+def _stage(transaction, instance, sha1_hash=None):
+    transaction.stage('mods', instance['old_path'], instance['url'], instance['mods_folder'], download_sha1=sha1_hash or instance['sha1'])
+
+
+def test_commit_swaps_the_new_version_in_and_rollback_restores_the_old_one(instance):
+    transaction = Transaction('20250101-000000-1')
+    _stage(transaction, instance)
+    transaction.commit()
+    assert os.listdir(instance['mods_folder']) == ['sodium-1.1.jar']
+    assert transaction.state == 'committed'
+
+    assert rollback().run_id == transaction.run_id
+    assert os.listdir(instance['mods_folder']) == ['sodium-1.0.jar']
+    assert _read(instance['old_path']) == b'old version'
+    # the journal of a rolled back run is removed, so it is not rolled back twice
+    assert list_transactions() == []
+    assert rollback() is None
+
+
+def test_a_download_which_does_not_match_its_hash_keeps_the_old_file(instance, capsys):
+    transaction = Transaction('20250101-000000-1')
+    _stage(transaction, instance, sha1_hash='0' * 40)
+    transaction.commit()
+    assert os.listdir(instance['mods_folder']) == ['sodium-1.0.jar']
+    assert 'does not match its SHA1 hash' in capsys.readouterr().out
+    assert list_transactions() == []
+
+
+def test_recovery_rolls_back_a_run_which_crashed_after_the_swap(instance):
+    transaction = Transaction('20250101-000000-1')
+    _stage(transaction, instance)
+    transaction.state = 'applying'
+    transaction.download()
+    operation = transaction.operations[0]
+    # the process dies after the new file is in place and before the journal records it
+    store_file(operation['old_path'], operation['sha1'])
+    operation['state'] = 'backed_up'
+    transaction._write()
+    os.replace(operation['staged_path'], operation['new_path'])
+
+    assert recover_transactions() == 1
+    assert os.listdir(instance['mods_folder']) == ['sodium-1.0.jar']
+    assert _read(instance['old_path']) == b'old version'
+
+
+def test_recovery_moves_back_a_file_parked_by_a_crashed_run(instance):
+    transaction = Transaction('20250101-000000-1')
+    transaction.move('mods', instance['old_path'], instance['wait_path'])
+    assert not os.path.exists(instance['old_path'])
+
+    assert recover_transactions() == 1
+    assert os.path.exists(instance['old_path'])
+    assert not os.path.exists(instance['wait_path'])
+    assert list_transactions() == []
+
+
+def test_rollback_moves_back_the_files_parked_by_the_run(instance):
+    transaction = Transaction('20250101-000000-1')
+    transaction.move('mods', instance['old_path'], instance['wait_path'])
+    transaction.commit()
+    assert transaction.state == 'committed'
+
+    rollback()
+    assert os.path.exists(instance['old_path'])
+    assert not os.path.exists(instance['wait_path'])
+
+
+def test_only_the_last_committed_run_can_be_rolled_back(instance):
+    first = Transaction('20250101-000000-1')
+    _stage(first, instance)
+    first.commit()
+    second = Transaction('20250101-000001-1')
+    second.move('mods', instance['new_path'], instance['wait_path'])
+    second.commit()
+
+    with pytest.raises(ValueError, match=second.run_id):
+        rollback(first.run_id)
+    assert rollback().run_id == second.run_id
+    assert rollback(first.run_id).run_id == first.run_id
+    assert os.listdir(instance['mods_folder']) == ['sodium-1.0.jar']
+
+
+def test_journals_older_than_the_oldest_backup_generation_are_pruned(instance):
+    parked = Transaction('20240101-000000-1')
+    parked.move('mods', instance['old_path'], instance['wait_path'])
+    parked.commit()
+    parked_back = Transaction('20240101-000001-1')
+    parked_back.move('mods', instance['wait_path'], instance['old_path'])
+    parked_back.commit()
+    assert len(list_transactions()) == 2
+
+    update = Transaction('20250101-000000-1')
+    _stage(update, instance)
+    update.commit()
+    assert [transaction.run_id for transaction in list_transactions()] == [update.run_id]